@@ -1,14 +1,20 @@
-from flask import Flask, jsonify, render_template, request, redirect, url_for, flash
+from flask import Flask, Response, jsonify, make_response, render_template, request, redirect, url_for, flash, stream_with_context
 from flask_login import LoginManager, current_user, login_required
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.security import generate_password_hash, check_password_hash
 # ÖNEMLİ: Veritabanını ve Modelleri models.py'den çekiyoruz
 # ARTIK models.py içindeki Consumption ve Settings'i kullanıyoruz
-from models import db, User, Post, Consumption, Settings
+from models import db, User, Post, Consumption, Settings, upgrade_schema
 from utils import calculate_water_usage, get_activity_label
+import tariffs
+from rollups import apply_consumption, refresh_day, ensure_rollups
+from reports import build_report, summary_totals
+from streaks import current_streak
+from response_cache import cached_response, bump_version, get_cache, user_scope, SETTINGS_SCOPE
 import datetime
-# import pandas as pd # Lazy loaded in report_data
 import random
 import os
+import time
 import requests
 from dotenv import load_dotenv
 
@@ -18,21 +24,52 @@ load_dotenv()
 # import re -> re kalsın, standart kütüphane
 import re
 
-# === KÜTÜPHANELERİ ÖNCEDEN YÜKLE (Cold Start Önlemi) ===
-try:
-    import cv2
-    import pytesseract
-    import numpy as np
-    import pandas as pd
-    # Tesseract yolunu burada tanımlayalım
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-except ImportError as e:
-    print(f"Kütüphane Hatası: {e}")
+# === AĞIR KÜTÜPHANELER (Lazy Loading) ===
+# cv2 / pytesseract / numpy ocr.py içinde ilk fatura analizinde yüklenir; migration ve debug script'leri bu maliyeti ödemez.
+# Sunucu ilk isteği aldıktan sonra arka planda ön yükleme yapılır (WARMUP_HEAVY_IMPORTS=0 ile kapatılır).
+import hashlib
+import json
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+import ocr
+from lazy_imports import warm_up
+from ocr_jobs import get_queue as get_ocr_queue, QueueFull
+import ocr_cache
+from uploads import SpoolingRequest, UploadRejected, read_image
+from ingest import IngestRejected, ingest_entries, parse_ndjson
+import export
 
 # --- Flask uygulamasını oluştur ---
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'dev-key-for-fallback'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///waterwise.db'
+# Rapor kaynağı: 'rollup' (önceden toplanmış) veya 'consumption' (ham tabloda GROUP BY)
+app.config['REPORT_SOURCE'] = os.environ.get('REPORT_SOURCE', 'rollup')
+# Okuma API'leri için yanıt önbelleği (bkz. response_cache.py)
+app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+# OCR kütüphanelerini ilk istekten sonra arka planda yükle
+app.config['WARMUP_HEAVY_IMPORTS'] = os.environ.get('WARMUP_HEAVY_IMPORTS', '1') == '1'
+# Fatura OCR iş kuyruğu (bkz. ocr_jobs.py); OCR_WORKERS=0 analizi istek thread'inde senkron çalıştırır
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', 2))
+app.config['OCR_QUEUE_SIZE'] = int(os.environ.get('OCR_QUEUE_SIZE', 8))
+app.config['OCR_JOB_TIMEOUT'] = int(os.environ.get('OCR_JOB_TIMEOUT', 60))
+app.config['OCR_RESULT_TTL'] = int(os.environ.get('OCR_RESULT_TTL', 300))
+app.config['OCR_ABANDON_AFTER'] = int(os.environ.get('OCR_ABANDON_AFTER', 30))
+# Toplu fatura yüklemede (bkz. /api/analyze_bills) tek istekte kabul edilen en fazla sayfa
+app.config['OCR_BATCH_LIMIT'] = int(os.environ.get('OCR_BATCH_LIMIT', 24))
+# Yükleme sınırları (bkz. uploads.py): istek ve dosya başına boyut, bellekte tutulacak parça boyutu, piksel sayısı
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('UPLOAD_MAX_MB', 64)) * 1024 * 1024
+app.config['UPLOAD_FILE_MAX_MB'] = int(os.environ.get('UPLOAD_FILE_MAX_MB', 20))
+app.config['UPLOAD_SPOOL_KB'] = int(os.environ.get('UPLOAD_SPOOL_KB', 1024))
+app.config['OCR_MAX_PIXELS'] = int(os.environ.get('OCR_MAX_PIXELS', 40_000_000))
+# Toplu kayıt (/api/add_batch): tek istekte eklenebilecek en fazla kayıt
+app.config['INGEST_BATCH_LIMIT'] = int(os.environ.get('INGEST_BATCH_LIMIT', 5000))
+# Aynı fatura fotoğrafı tekrar yüklenince OCR çalışmasın (bkz. ocr_cache.py); OCR_CACHE_SIZE=0 kapatır
+app.config['OCR_CACHE_SIZE'] = int(os.environ.get('OCR_CACHE_SIZE', 500))
+app.config['OCR_CACHE_PHASH'] = os.environ.get('OCR_CACHE_PHASH', '0') == '1'
+app.config['OCR_CACHE_PHASH_DISTANCE'] = int(os.environ.get('OCR_CACHE_PHASH_DISTANCE', 8)) # 256 bitten farklı olabilecek bit sayısı
 
 # === VERİTABANI BAĞLANTISI ===
 db.init_app(app) 
@@ -45,12 +82,30 @@ login_manager.login_view = "community.login"
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+# === Arka Plan Ön Yükleme ===
+# İlk istek geldiğinde sunucu bağlantı kabul ediyor demektir; ağır kütüphaneler o noktadan sonra yüklenir.
+_warmup_started = False
+
+@app.before_request
+def start_heavy_import_warmup():
+    global _warmup_started
+    if _warmup_started or not app.config['WARMUP_HEAVY_IMPORTS']:
+        return
+    _warmup_started = True
+    if app.config['OCR_WORKERS']:
+        # OCR işçi süreçlerde çalışır; kütüphaneleri bu süreçte değil işçilerde yükle
+        threading.Thread(target=get_ocr_queue().warm_up, name='ocr-pool-warmup', daemon=True).start()
+    else:
+        warm_up(*ocr.HEAVY_MODULES)
+
 # === Blueprint ve Tablo Oluşturma ===
 with app.app_context():
     try:
         from community_routes import community
         app.register_blueprint(community, url_prefix='/community')
         db.create_all() # Tabloları veritabanında oluştur (Consumption ve Settings dahil)
+        upgrade_schema() # Eski veritabanlarına eksik sütun/indeksleri ekle
+        ensure_rollups() # Rollup tablosu yeni eklendiyse mevcut verilerden doldur
     except ImportError:
         print("UYARI: community_routes.py bulunamadı, topluluk özellikleri çalışmayabilir.")
     except Exception as e:
@@ -95,6 +150,7 @@ def add_consumption():
             user_id=user_id
         )
         db.session.add(new_record)
+        apply_consumption(new_record) # Rollup aynı transaction içinde güncellenir
         db.session.commit()
         
         return jsonify({
@@ -104,44 +160,99 @@ def add_consumption():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 400
 
+@app.route('/api/add_batch', methods=['POST'])
+def add_consumption_batch():
+    """
+    Toplu kayıt: JSON dizi, {"entries": [...]} veya NDJSON (application/x-ndjson) gövde.
+    Her kayıt /api/add alanlarını ve isteğe bağlı 'date' alanını taşır; hatalı kayıt varsa hiçbiri eklenmez.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        entries = parse_ndjson(request.stream)
+    else:
+        entries = request.get_json(silent=True)
+        if isinstance(entries, dict):
+            entries = entries.get('entries')
+        if not isinstance(entries, list):
+            return jsonify({"success": False, "message": "Kayıt listesi bekleniyor."}), 400
+
+    user_id = current_user.id if current_user.is_authenticated else None
+    try:
+        count, liters = ingest_entries(entries, user_id, limit=app.config['INGEST_BATCH_LIMIT'])
+        db.session.commit()
+    except IngestRejected as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": e.message, "errors": e.errors}), e.status
+    except RequestEntityTooLarge:
+        db.session.rollback()
+        raise # NDJSON gövdesi okunurken MAX_CONTENT_LENGTH aşıldı
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return jsonify({
+        "success": True,
+        "message": f"{count} kayıt eklendi: {liters:.1f} Litre",
+        "inserted": count,
+        "liters": liters
+    })
+
+@app.route('/api/export')
+def export_consumption():
+    """
+    Tüketim geçmişini akış halinde indirir: ?format=csv|ndjson (varsayılan csv), ?after_id=N ile
+    yarım kalan bir indirme son alınan kayıttan devam eder (bkz. export.py).
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({"success": False, "message": "Desteklenen biçimler: csv, ndjson"}), 400
+    after_id = request.args.get('after_id', 0, type=int)
+
+    user_id = current_user.id if current_user.is_authenticated else None
+    response = Response(stream_with_context(export.export_chunks(fmt, user_id, after_id)), mimetype=export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=waterwise_tuketim.{fmt}'
+    return response
+
 @app.route('/api/target', methods=['GET', 'POST'])
 def handle_target():
+    uid = current_user.id if current_user.is_authenticated else None
     if request.method == 'POST':
         data = request.json
         try:
             target = float(data['target'])
-            # Veritabanı Güncelleme (SQLAlchemy)
-            Settings.set_value('daily_target', target)
+            # Giriş yapmış kullanıcı için kendi hedefi, anonim için global hedef güncellenir
+            Settings.set_value('daily_target', target, user_id=uid)
+            bump_version(SETTINGS_SCOPE if uid is None else user_scope(uid))
             return jsonify({"success": True, "new_target": target})
         except Exception as e:
             return jsonify({"success": False, "message": str(e)}), 400
     else:
-        # Veritabanından Oku
-        target = float(Settings.get_value('daily_target', 150))
+        # Önbellekten Oku (bkz. Settings.load_all)
+        target = float(Settings.get_value('daily_target', 150, user_id=uid))
         return jsonify({"daily_target": target})
 
 @app.route('/api/today_status')
+@cached_response(SETTINGS_SCOPE)
 def today_status():
-    today_date = datetime.date.today().isoformat()
+    today = datetime.date.today()
     uid = current_user.id if current_user.is_authenticated else None
     
     # ORM ile Bugünün Toplamı (Faturalar Hariç)
     # activity_type != 'bill'
-    result = db.session.query(db.func.sum(Consumption.liters)).filter_by(date=today_date, user_id=uid).filter(Consumption.activity_type != 'bill').scalar()
+    result = db.session.query(db.func.sum(Consumption.liters)).filter_by(day=today, user_id=uid).filter(Consumption.activity_type != 'bill').scalar()
     today_total = result if result else 0
     
-    target = float(Settings.get_value('daily_target', 150))
-    target = float(Settings.get_value('daily_target', 150))
+    target = float(Settings.get_value('daily_target', 150, user_id=uid))
     return jsonify({"today_total": today_total, "daily_target": target})
 
 @app.route('/api/reset_today', methods=['POST'])
 def reset_today():
     try:
-        today_date = datetime.date.today().isoformat()
+        today = datetime.date.today()
         uid = current_user.id if current_user.is_authenticated else None
         
         # Bugünün verilerini sil
-        Consumption.query.filter_by(date=today_date, user_id=uid).delete()
+        Consumption.query.filter_by(day=today, user_id=uid).delete()
+        refresh_day(uid, today)
         db.session.commit()
         return jsonify({"success": True, "message": "Bugünün verileri sıfırlandı."})
     except Exception as e:
@@ -149,134 +260,14 @@ def reset_today():
         return jsonify({"success": False, "message": str(e)}), 400
 
 @app.route('/api/report_data')
+@cached_response(SETTINGS_SCOPE)
 def report_data():
     period = request.args.get('period', 'daily') # daily, weekly, monthly
-    
-    today = pd.Timestamp.now().normalize()
     uid = current_user.id if current_user.is_authenticated else None
-    
-    # ORM ile Tüm Verileri Çek
-    all_data = Consumption.query.filter_by(user_id=uid).order_by(Consumption.date).all()
-    target = float(Settings.get_value('daily_target', 150))
-    
-    if not all_data:
-        return jsonify({"daily_trend": {}, "category_pie": {}})
-
-    # Pandas DataFrame'e dönüştür
-    # activity_type alanını da eklemeliyiz ki filtreleme yapabilelim
-    data_list = [{'id': d.id, 'date': d.date, 'category': d.category, 'liters': d.liters, 'activity_type': d.activity_type} for d in all_data]
-    df = pd.DataFrame(data_list)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Kategori Toplamları (Her zaman tüm zamanların toplamı veya o periyodun toplamı olabilir, şimdilik tüm zamanlar kalsın veya periyoda göre filtreleyelim)
-    # Basitlik için kategori dağılımını "Seçilen Periyodun Toplamı" olarak yapmak daha mantıklı olurdu ama 
-    # şimdilik tüm zamanlar kalsın, kullanıcı o anki grafiğe odaklansın.
-    
-    # --- Tarih Filtreleme ve Gruplama ---
-    today = pd.Timestamp.now().normalize()
-    filtered_df = df.copy()
-    trend_labels = []
-    trend_data = []
-    trend_target = target
-
-    if period == 'monthly':
-        # Son 12 Ay (Tam Liste)
-        end_date = today
-        start_date = end_date - pd.DateOffset(months=11)
-        full_idx = pd.date_range(start=start_date, end=end_date, freq='MS')
-        
-        # Filtreleme (Geniş tutalım)
-        filtered_df = df[df['date'] >= start_date]
+    target = float(Settings.get_value('daily_target', 150, user_id=uid))
 
-        # Aylık Toplamlar ve Reindex
-        # 'MS' = Month Start (Ayın 1'i)
-        monthly_grp = filtered_df.set_index('date').resample('MS')['liters'].sum()
-        monthly_grp = monthly_grp.reindex(full_idx, fill_value=0)
-        
-        trend_labels = monthly_grp.index.strftime('%Y-%m').tolist()
-        trend_data = monthly_grp.values.tolist()
-        trend_target = target * 30 
-
-    elif period == 'weekly':
-        # Son 12 Hafta
-        end_date = today
-        start_date = end_date - pd.DateOffset(weeks=11) 
-        # Haftalık (Pazartesi başlangıç)
-        full_idx = pd.date_range(start=start_date, end=end_date, freq='W-MON')
-        
-        filtered_df = df[df['date'] >= start_date]
-        
-        weekly_grp = filtered_df.set_index('date').resample('W-MON')['liters'].sum()
-        weekly_grp = weekly_grp.reindex(full_idx, fill_value=0)
-        
-        trend_labels = weekly_grp.index.strftime('Hafta %U').tolist()
-        trend_data = weekly_grp.values.tolist()
-        trend_target = target * 7 
-
-    else: # daily
-        # Son 30 Gün
-        end_date = today
-        start_date = end_date - pd.DateOffset(days=29)
-        full_idx = pd.date_range(start=start_date, end=end_date, freq='D')
-        
-        filtered_df = df[df['date'] >= (start_date - pd.Timedelta(days=1))] # Saat farkı için opsiyonel buffer
-        
-        # Günlük Toplamlar ve Reindex
-        daily_grp = filtered_df.groupby(filtered_df['date'].dt.normalize())['liters'].sum()
-        daily_grp = daily_grp.reindex(full_idx, fill_value=0)
-        
-        trend_labels = daily_grp.index.strftime('%Y-%m-%d').tolist()
-        trend_data = daily_grp.values.tolist()
-        
-    # Kategori Dağılımını sadece bu filtrelenmiş veriye ve Fatura HARİÇ veriye göre yap
-    # Trend Grafiği de Fatura hariç olmalı
-    # activity_type kontrolü yapıyoruz (Eski verilerde None olabilir, o yüzden 'or' kullanıyoruz)
-    
-    # Fatura Hariç DataFrame
-    chart_df = filtered_df[filtered_df['activity_type'] != 'bill']
-    
-    # Eğer activity_type null ise ve category 'Fatura Bildirimi' ise onu da çıkar
-    chart_df = chart_df[chart_df['category'] != 'Fatura Bildirimi']
-
-    # --- Trend Yeniden Hesaplama (Reindex chart_df üzerinden) ---
-    if period == 'monthly':
-        monthly_grp = chart_df.set_index('date').resample('MS')['liters'].sum()
-        monthly_grp = monthly_grp.reindex(full_idx, fill_value=0)
-        trend_data = monthly_grp.values.tolist() # Labels zaten aynı
-        
-    elif period == 'weekly':
-        weekly_grp = chart_df.set_index('date').resample('W-MON')['liters'].sum()
-        weekly_grp = weekly_grp.reindex(full_idx, fill_value=0)
-        trend_data = weekly_grp.values.tolist()
-        
-    else: # daily
-        daily_grp = chart_df.groupby(chart_df['date'].dt.normalize())['liters'].sum()
-        daily_grp = daily_grp.reindex(full_idx, fill_value=0)
-        trend_data = daily_grp.values.tolist()
-
-    category_totals = chart_df.groupby('category')['liters'].sum()
-    
-    # --- Fatura Geçmişi (Ayrı Veri) ---
-    # Tüm zamanlardan son 5 faturayı çek
-    bills_df = df[(df['activity_type'] == 'bill') | (df['category'] == 'Fatura Bildirimi')]
-    bills_data = bills_df.sort_values('date', ascending=False).head(5)[['id', 'date', 'liters']].to_dict('records')
-    # Tarihi string yap
-    for b in bills_data:
-        b['date'] = b['date'].strftime('%Y-%m-%d')
-        b['amount_m3'] = round(b['liters'] / 1000, 2)
-
-    return jsonify({
-        "daily_trend": {
-            "labels": trend_labels,
-            "data": trend_data,
-            "target": trend_target
-        },
-        "category_pie": {
-            "labels": category_totals.index.tolist(),
-            "data": category_totals.values.tolist()
-        },
-        "bill_history": bills_data
-    })
+    # Tüm geçmiş yerine rollup tablosundan sadece seçilen pencere okunur (bkz. reports.py)
+    return jsonify(build_report(uid, period, target))
 
 @app.route('/api/delete_consumption/<int:id>', methods=['DELETE'])
 def delete_consumption(id):
@@ -289,6 +280,7 @@ def delete_consumption(id):
             if record.user_id != uid:
                 return jsonify({'success': False, 'message': 'Bu kaydı silme yetkiniz yok.'}), 403
                 
+            apply_consumption(record, sign=-1)
             db.session.delete(record)
             db.session.commit()
             return jsonify({'success': True, 'message': 'Kayıt silindi.'})
@@ -297,248 +289,393 @@ def delete_consumption(id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def build_summary(totals, today):
+    """summary_totals() sonucundan kullanıcıya gösterilen karşılaştırma metinlerini üretir."""
+    # --- HAFTALIK / AYLIK KARŞILAŞTIRMA (Rollup tablosundan) ---
+    recent_week_total = totals['recent_week']
+    previous_week_total = totals['previous_week']
+    this_month_total = totals['this_month']
+    last_month_total = totals['last_month']
+
+    # Geçen ayın son günü (günlük ortalama için)
+    last_month_end = today.replace(day=1) - datetime.timedelta(days=1)
+
+    # Karşılaştırma Metni Seçimi
+    # Eğer bu ayın verisi yeterliyse aylık konuş, yoksa haftalık.
+    comparison_text = "Veri analizi yapılıyor..."
+    
+    # Öncelik stratejisi:
+    # Eğer son 1 haftada veri varsa haftalık analiz ver.
+    # Eğer ayın ortasındaysak ve veri varsa aylık analiz de ekle.
+    
+    # Şimdilik varsayılan haftalık analiz
+    if previous_week_total > 0:
+        diff = recent_week_total - previous_week_total
+        percent = (diff / previous_week_total) * 100
+        if diff < 0:
+            comparison_text = f"Geçen haftaya göre <span style='color:var(--status-good); font-weight:bold'>%{abs(percent):.0f} daha az</span> su harcadın! 📉"
+        else:
+            comparison_text = f"Geçen haftaya göre <span style='color:var(--status-bad); font-weight:bold'>%{abs(percent):.0f} daha fazla</span> su harcadın. 📈"
+    
+    # Eğer ayın 15'inden sonraysa ve geçen ay veri varsa, aylık analizi de ekle veya değiştir
+    if today.day > 10 and last_month_total > 0:
+         diff_m = this_month_total - last_month_total
+         # Oranlama: Bu ayın şu ana kadarki gün sayısı ile geçen ayın tamamını kıyaslamak adil olmaz.
+         # Bu yüzden basitçe "Geçen ay toplam X harcamışken bu ay şimdiden Y harcadın" gibi gidelim
+         # Veya ortalama üzerinden gidelim.
+         
+         # Günlük ortalama üzerinden kıyas
+         days_in_this_month = today.day
+         # Geçen ayın gün sayısı (yaklaşık 30)
+         days_in_last_month = last_month_end.day
+         
+         avg_this = this_month_total / days_in_this_month
+         avg_last = last_month_total / days_in_last_month
+         
+         if avg_last > 0:
+             diff_avg = avg_this - avg_last
+             percent_avg = (diff_avg / avg_last) * 100
+             
+             extra_msg = ""
+             if diff_avg < 0:
+                 extra_msg = f"<br>Bu ay ortalaman geçen aydan <span style='color:var(--status-good)'>%{abs(percent_avg):.0f} daha iyi</span> gidiyor. 📅"
+             else:
+                 extra_msg = f"<br>Bu ay ortalaman geçen aydan <span style='color:var(--status-bad)'>%{abs(percent_avg):.0f} daha yüksek</span>. 📅"
+             
+             comparison_text += extra_msg
+
+    elif recent_week_total == 0 and previous_week_total == 0:
+         comparison_text = "Henüz yeterli veri yok. Kayıt eklemeye başla! 🚀"
+
+    # En Çok Harcanan Kategori
+    top_cat = totals['top_category']
+        
+    top_category_text = ""
+    if top_cat:
+        top_category_text = f"En çok suyu <strong>{top_cat[0]}</strong> ({top_cat[1]:.0f} L) kategorisinde harcadın."
+
+    return {
+        "week_comparison_text": comparison_text, 
+        "top_category_text": top_category_text
+    }
+
 @app.route('/api/summary')
+@cached_response()
 def get_summary():
     try:
         uid = current_user.id if current_user.is_authenticated else None
         today = datetime.date.today()
-        
-        # --- HAFTALIK KARŞILAŞTIRMA ---
-        seven_days_ago = today - datetime.timedelta(days=7)
-        fourteen_days_ago = today - datetime.timedelta(days=14)
-        
-        recent_week_total = db.session.query(db.func.sum(Consumption.liters))\
-            .filter(Consumption.date > seven_days_ago.isoformat())\
-            .filter(Consumption.activity_type != 'bill')\
-            .filter(Consumption.user_id == uid)\
-            .scalar() or 0
-            
-        previous_week_total = db.session.query(db.func.sum(Consumption.liters))\
-            .filter(Consumption.date <= seven_days_ago.isoformat())\
-            .filter(Consumption.date > fourteen_days_ago.isoformat())\
-            .filter(Consumption.activity_type != 'bill')\
-            .filter(Consumption.user_id == uid)\
-            .scalar() or 0
-            
-        # --- AYLIK KARŞILAŞTIRMA (Basit yaklaşım: Bu ay vs Geçen Ay) ---
-        # Bu ayın başı
-        this_month_start = today.replace(day=1)
-        # Geçen ayın başı
-        last_month_end = this_month_start - datetime.timedelta(days=1)
-        last_month_start = last_month_end.replace(day=1)
-        
-        this_month_total = db.session.query(db.func.sum(Consumption.liters))\
-            .filter(Consumption.date >= this_month_start.isoformat())\
-            .filter(Consumption.activity_type != 'bill')\
-            .filter(Consumption.user_id == uid)\
-            .scalar() or 0
-
-        last_month_total = db.session.query(db.func.sum(Consumption.liters))\
-            .filter(Consumption.date >= last_month_start.isoformat())\
-            .filter(Consumption.date < this_month_start.isoformat())\
-            .filter(Consumption.activity_type != 'bill')\
-            .filter(Consumption.user_id == uid)\
-            .scalar() or 0
-
-        # Karşılaştırma Metni Seçimi
-        # Eğer bu ayın verisi yeterliyse aylık konuş, yoksa haftalık.
-        comparison_text = "Veri analizi yapılıyor..."
-        
-        # Öncelik stratejisi:
-        # Eğer son 1 haftada veri varsa haftalık analiz ver.
-        # Eğer ayın ortasındaysak ve veri varsa aylık analiz de ekle.
-        
-        # Şimdilik varsayılan haftalık analiz
-        if previous_week_total > 0:
-            diff = recent_week_total - previous_week_total
-            percent = (diff / previous_week_total) * 100
-            if diff < 0:
-                comparison_text = f"Geçen haftaya göre <span style='color:var(--status-good); font-weight:bold'>%{abs(percent):.0f} daha az</span> su harcadın! 📉"
-            else:
-                comparison_text = f"Geçen haftaya göre <span style='color:var(--status-bad); font-weight:bold'>%{abs(percent):.0f} daha fazla</span> su harcadın. 📈"
-        
-        # Eğer ayın 15'inden sonraysa ve geçen ay veri varsa, aylık analizi de ekle veya değiştir
-        if today.day > 10 and last_month_total > 0:
-             diff_m = this_month_total - last_month_total
-             # Oranlama: Bu ayın şu ana kadarki gün sayısı ile geçen ayın tamamını kıyaslamak adil olmaz.
-             # Bu yüzden basitçe "Geçen ay toplam X harcamışken bu ay şimdiden Y harcadın" gibi gidelim
-             # Veya ortalama üzerinden gidelim.
-             
-             # Günlük ortalama üzerinden kıyas
-             days_in_this_month = today.day
-             # Geçen ayın gün sayısı (yaklaşık 30)
-             days_in_last_month = last_month_end.day
-             
-             avg_this = this_month_total / days_in_this_month
-             avg_last = last_month_total / days_in_last_month
-             
-             if avg_last > 0:
-                 diff_avg = avg_this - avg_last
-                 percent_avg = (diff_avg / avg_last) * 100
-                 
-                 extra_msg = ""
-                 if diff_avg < 0:
-                     extra_msg = f"<br>Bu ay ortalaman geçen aydan <span style='color:var(--status-good)'>%{abs(percent_avg):.0f} daha iyi</span> gidiyor. 📅"
-                 else:
-                     extra_msg = f"<br>Bu ay ortalaman geçen aydan <span style='color:var(--status-bad)'>%{abs(percent_avg):.0f} daha yüksek</span>. 📅"
-                 
-                 comparison_text += extra_msg
-
-        elif recent_week_total == 0 and previous_week_total == 0:
-             comparison_text = "Henüz yeterli veri yok. Kayıt eklemeye başla! 🚀"
-
-        # En Çok Harcanan Kategori
-        top_cat = db.session.query(Consumption.category, db.func.sum(Consumption.liters))\
-            .filter(Consumption.activity_type != 'bill')\
-            .filter(Consumption.user_id == uid)\
-            .group_by(Consumption.category)\
-            .order_by(db.func.sum(Consumption.liters).desc())\
-            .first()
-            
-        top_category_text = ""
-        if top_cat:
-            top_category_text = f"En çok suyu <strong>{top_cat[0]}</strong> ({top_cat[1]:.0f} L) kategorisinde harcadın."
-
-        return jsonify({
-            "week_comparison_text": comparison_text, 
-            "top_category_text": top_category_text
-        })
+        return jsonify(build_summary(summary_totals(uid, today), today))
     except Exception as e:
         print(f"Summary Error: {e}")
         return jsonify({"week_comparison_text": "Analiz hatası.", "top_category_text": ""}), 500
 
 @app.route('/api/streak')
+@cached_response(SETTINGS_SCOPE)
 def get_streak():
-    return jsonify({"streak": 0})
+    uid = current_user.id if current_user.is_authenticated else None
+    return jsonify({"streak": current_streak(uid)})
+
+# === TOPLU PANO VERİSİ ===
+# Sayfa açılışında ayrı ayrı çağrılan today_status, streak, summary, report_data ve
+# weather_advice yanıtlarını tek istekte, tek DB oturumunda döndürür.
+@app.route('/api/dashboard')
+@cached_response(SETTINGS_SCOPE)
+def dashboard():
+    period = request.args.get('period', 'daily')
+    uid = current_user.id if current_user.is_authenticated else None
+    today = datetime.date.today()
+
+    # Ortak ara sonuçlar: kullanıcının ayarları bir kez (toplu) okunur, özet pencereleri bugünün toplamını da içerir
+    settings = Settings.get_all(uid)
+    target = float(settings.get('daily_target', 150))
+    totals = summary_totals(uid, today)
+
+    try:
+        summary = build_summary(totals, today)
+    except Exception as e:
+        print(f"Summary Error: {e}")
+        summary = {"week_comparison_text": "Analiz hatası.", "top_category_text": ""}
+
+    return jsonify({
+        "today_status": {"today_total": totals['today'], "daily_target": target},
+        "streak": {"streak": current_streak(uid, today)},
+        "summary": summary,
+        "report": build_report(uid, period, target, today),
+        "weather": fetch_weather_advice()
+    })
 
 # ==================================================
 # === FATURA ANALİZİ (OCR) ===
 # ==================================================
+def _bill_target(uid):
+    # db_handler yerine Settings modelini kullanıyoruz
+    try:
+        return float(Settings.get_value('daily_target', 150, user_id=uid))
+    except:
+        return 150
+
+def _ocr_cache_lookup(image_bytes, page=0):
+    """(anahtar, algısal hash, önbellekteki sonuç veya None); önbellek hatası analizi engellemez."""
+    if not app.config['OCR_CACHE_SIZE']:
+        return None, None, None
+    key = ocr_cache.image_key(image_bytes, page)
+    try:
+        # Algısal hash ilk sayfadan hesaplanır; TIFF'in sonraki sayfaları web sürecinde çözülmez
+        phash = ocr_cache.perceptual_hash(image_bytes) if app.config['OCR_CACHE_PHASH'] and not page else None
+        return key, phash, ocr_cache.lookup(key, phash, app.config['OCR_CACHE_PHASH_DISTANCE'])
+    except Exception as e:
+        db.session.rollback()
+        print(f"OCR önbellek hatası: {e}")
+        return key, None, None
+
+def _ocr_cache_store(key, phash, parsed):
+    if key is None:
+        return
+    try:
+        ocr_cache.store(key, phash, parsed, app.config['OCR_CACHE_SIZE'])
+    except Exception as e:
+        db.session.rollback()
+        print(f"OCR önbellek hatası: {e}")
+
+# İstek gövdesi MAX_CONTENT_LENGTH'i aşınca Flask gövdeyi okumadan 413 döner; API istemcisi JSON bekler
+@app.errorhandler(413)
+def request_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'success': False, 'message': f'Yükleme çok büyük. Tek istekte en fazla {limit_mb} MB gönderilebilir.'}), 413
+
 @app.route('/api/analyze_bill', methods=['POST'])
 def analyze_bill():
     if 'file' not in request.files: return jsonify({'success': False, 'message': 'Dosya yok'})
-    file = request.files['file']
-    
     try:
-        # cv2, pytesseract vb. yukarıda yüklendi
-        
-        filestr = file.read()
-        npimg = np.frombuffer(filestr, np.uint8)
-        img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-        img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        text_img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-        
-        text = pytesseract.image_to_string(text_img, lang='eng', config='--oem 3 --psm 6')
+        image_bytes = read_image(request.files['file'])
+    except UploadRejected as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
+    uid = current_user.id if current_user.is_authenticated else None
 
-        # Regex ile veri yakalama
-        found_val = None
-        calculation_method = "Doğrudan Okuma"
-        
-        match_total = re.search(r'(?:Toplam|Topiam|Tuketim).*?(?:m3|mm|m\S).*?(\d+)', text, re.IGNORECASE)
-        match_daily = re.search(r'(?:GUniUk|Gunluk).*?(\d+[.,]\d+)', text, re.IGNORECASE)
-        # Regex Güncellemesi: Multiline, Türkçe ve OCR Hataları (ODENECER vb)
-        # Regex Güncellemesi: Multiline, Türkçe ve OCR Hataları (ODENECER vb)
-        # Kullanıcının "Ödenecek Tutar" uyarısı üzerine düzeltildi:
-        # [ ] yerine (?: ) kullanıldı ve aradaki boşluk/satır atlama esnekleştirildi.
-        match_price = re.search(r'(?:ödenecek\s*tu|odenecek\s*tu|odenecer\s*tu|TUTAR|genel).*?(\d+[.,]?\d*)', text, re.IGNORECASE | re.DOTALL)
-        
-        if match_price:
-            print(f"DEBUG: Price Match Found: {match_price.group(1)}")
-            try:
-                price_str = match_price.group(1).replace(',', '.')
-                found_val = solve_usage_from_price(float(price_str))
-                calculation_method = f"Fatura Tutarından Hesaplama ({price_str} TL)"
-            except: pass
-            
-        # 2.1. Fallback: Eğer spesifik "Ödenecek Tutar" bulunamazsa, sayfadaki EN BÜYÜK TL değerini al
-        if not found_val:
-            print("DEBUG: Specific Price Match Failed - Trying Max TL Heuristic")
-            # Tüm "Sayı TL" formatlarını bul
-            all_prices = re.findall(r'(\d+[.,]\d+)\s*(?:TL|T1|TI)', text, re.IGNORECASE)
-            print(f"DEBUG: Found Prices: {all_prices}")
-            
-            valid_prices = []
-            for p_str in all_prices:
-                try:
-                    # Virgül/Nokta düzeltmesi (Avrupa/TR formatı: 715,00 -> 715.00)
-                    # 1.000,50 gibi durumlar için basit replace yetmez ama basit faturalar için replace(',', '.') yeterli
-                    val = float(p_str.replace(',', '.'))
-                    valid_prices.append(val)
-                except: continue
-            
-            if valid_prices:
-                max_price = max(valid_prices)
-                if max_price > 10: # 10 TL'den küçükse muhtemelen hatalıdır veya küsurattır
-                    print(f"DEBUG: Using Max Price: {max_price}")
-                    from utils import solve_usage_from_price
-                    found_val = solve_usage_from_price(max_price)
-                    calculation_method = f"Fatura Tutarından (Tahmin: {max_price} TL)"
-
-        # 3. Senaryo: Günlük Ortalamadan Tahmin (Düşük Öncelik)
-        if not found_val and match_daily:
-            found_val = round(float(match_daily.group(1).replace(',', '.')) * 30, 2)
-            calculation_method = "Günlük Ortalamadan Tahmin"
-
-        if found_val:
-            liters_total = found_val * 1000
-            daily_avg = liters_total / 30
-            
-            # db_handler yerine Settings modelini kullanıyoruz
-            try:
-                user_target = float(Settings.get_value('daily_target', 150))
-            except:
-                user_target = 150
-            
-            # Durum Değerlendirmesi
-            usage_ratio = (daily_avg / user_target) * 100
-            
-            status, advice_title = "active", "Durum Analizi"
-            advice_text = ""
-
-            if daily_avg > (user_target * 1.5):
-                status = "danger"
-                advice_title = "Yüksek Tüketim"
-                advice_text = f"Günlük ortalama ({daily_avg:.0f} L) belirlenen hedefin çok üzerinde (%{usage_ratio:.0f}). Tasarruf önlemleri almanız önerilir."
-            elif daily_avg > user_target:
-                status = "warning"
-                advice_title = "Hedef Aşımı"
-                advice_text = f"Günlük ortalama ({daily_avg:.0f} L) hedefinizi aşıyor (%{usage_ratio:.0f}). Daha dikkatli kullanım gerekebilir."
-            else:
-                status = "success"
-                advice_title = "İdeal Tüketim"
-                advice_text = f"Günlük tüketim ({daily_avg:.0f} L) hedef sınırları içerisinde (%{usage_ratio:.0f}). Verimli kullanımınız için teşekkürler."
-            
-            # Fiyat bazlı tahmin uyarısı
-            if "Fatura Tutarından" in calculation_method:
-                advice_text += "<br><small><i>*Bu hesaplama fatura tutarından tahmin edilmiştir, gerçek sayaç değeriyle farklılık gösterebilir.</i></small>"
-
-            return jsonify({
-                'success': True, 
-                'liters': liters_total,
-                'daily_avg': daily_avg,
-                'status': status,
-                'advice_title': advice_title,
-                'advice_text': advice_text,
-                'message': f"Fatura: {found_val} m³ ({calculation_method})"
-            })
+    key, phash, parsed = _ocr_cache_lookup(image_bytes)
+    if parsed is not None:
+        return jsonify(dict(ocr.bill_response(parsed, _bill_target(uid)), cached=True))
+
+    if not app.config['OCR_WORKERS']:
+        # Senkron mod: analiz istek thread'inde çalışır
+        try:
+            parsed = ocr.analyze_image(image_bytes, app.config['OCR_JOB_TIMEOUT'])
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Hata: {str(e)}'})
+        _ocr_cache_store(key, phash, parsed)
+        return jsonify(ocr.bill_response(parsed, _bill_target(uid)))
+
+    try:
+        job = get_ocr_queue().submit(image_bytes, uid)
+    except QueueFull:
+        response = jsonify({'success': False, 'message': 'Sunucu şu an çok meşgul, lütfen birkaç saniye sonra tekrar deneyin.'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    job.meta.update(cache_key=key, phash=phash)
+    return jsonify({'success': True, 'job_id': job.id, 'job_status': job.status}), 202
+
+# Analiz işinin durumu / sonucu (istemci sonuç gelene kadar sorgular) ve iptali
+JOB_MESSAGES = {
+    'timeout': 'Analiz zaman aşımına uğradı, lütfen daha net bir fotoğrafla tekrar deneyin.',
+    'cancelled': 'Analiz iptal edildi.',
+}
+
+@app.route('/api/analyze_bill/<job_id>', methods=['GET', 'DELETE'])
+def analyze_bill_job(job_id):
+    uid = current_user.id if current_user.is_authenticated else None
+    queue = get_ocr_queue()
+
+    if request.method == 'DELETE':
+        if not queue.cancel(job_id, uid):
+            return jsonify({'success': False, 'message': 'İş bulunamadı'}), 404
+        return jsonify({'success': True, 'job_status': 'cancelled'})
+
+    job = queue.get(job_id, uid)
+    if job is None:
+        return jsonify({'success': False, 'message': 'İş bulunamadı'}), 404
+
+    status = job.status
+    if status in ('queued', 'running'):
+        return jsonify({'success': True, 'job_status': status})
+    if status == 'done':
+        parsed = job.future.result()
+        if job.meta.get('cache_key') and not job.meta.get('stored'):
+            _ocr_cache_store(job.meta['cache_key'], job.meta['phash'], parsed)
+            job.meta['stored'] = True
+        return jsonify(dict(ocr.bill_response(parsed, _bill_target(uid)), job_status=status))
+    if status == 'failed':
+        return jsonify({'success': False, 'job_status': status, 'message': f'Hata: {job.future.exception()}'})
+    return jsonify({'success': False, 'job_status': status, 'message': JOB_MESSAGES[status]})
+
+# === TOPLU FATURA ANALİZİ ===
+# Birden fazla fotoğraf veya çok sayfalı TIFF tek istekte yüklenir. Sayfalar işçi havuzunda paralel okunur,
+# her sonuç biter bitmez bir JSON satırı olarak akıtılır (application/x-ndjson). Son satır özet içerir (done=true).
+# save=1 ile okunan faturalar tek transaction'da 'bill' kaydı olarak eklenir. Kayıt tarihi faturadaki son ödeme
+# tarihidir (okunamazsa bugün). Önce save=0 ile önizleyip sonra save=1 ile tekrar göndermek ucuzdur:
+# ikinci istekte sayfalar OCR önbelleğinden gelir.
+def _batch_pages(uploads):
+    """
+    [(dosya adı, sayfa no, bayt veya None, TIFF sayfa sırası, hata mesajı veya None), ...]
+    Sayfalar burada çözülmez; TIFF sayfa sayısı başlıktan okunur, sayfa işçide çözülür (bkz. ocr.decode_gray).
+    Toplam sayfa OCR_BATCH_LIMIT'i aşınca kalan dosyalar okunmadan UploadRejected (413).
+    """
+    limit = app.config['OCR_BATCH_LIMIT']
+    pages = []
+    for upload in uploads:
+        if len(pages) >= limit:
+            raise UploadRejected(f"Tek seferde en fazla {limit} sayfa yüklenebilir.", 413)
+        try:
+            data = read_image(upload, max_pages=limit)
+        except UploadRejected as e:
+            pages.append((upload.filename, 1, None, 0, e.message))
+            continue
+        upload.close() # Geçici dosya hemen bırakılsın
+        count = len(ocr.tiff_pages(data)) if ocr.image_format(data) == 'tiff' else 1
+        if len(pages) + count > limit:
+            raise UploadRejected(f"Tek seferde en fazla {limit} sayfa yüklenebilir.", 413)
+        # Her sayfa işine dosyanın tamamı gider; boyutu UPLOAD_FILE_MAX_MB ile sınırlı
+        pages.extend((upload.filename, frame + 1, data, frame, None) for frame in range(count))
+    return pages
+
+def _save_bills(parsed_results, uid):
+    """Okunan faturaları tek transaction'da ekler; eklenen kayıt sayısı."""
+    count = 0
+    for parsed in parsed_results:
+        if not parsed['found_val']:
+            continue
+        due_date = (parsed.get('fields') or {}).get('due_date')
+        liters = parsed['found_val'] * 1000
+        record = Consumption(
+            date=due_date['value'] if due_date else datetime.date.today().isoformat(),
+            category=get_activity_label('bill'),
+            liters=calculate_water_usage('bill', liters),
+            activity_type='bill',
+            amount=liters,
+            user_id=uid
+        )
+        db.session.add(record)
+        apply_consumption(record)
+        count += 1
+    db.session.commit()
+    return count
+
+def _batch_results(pages, uid, save):
+    target = _bill_target(uid)
+    timeout = app.config['OCR_JOB_TIMEOUT']
+    results = {} # sayfa sırası -> ayrıştırma sonucu
+
+    def line(index, parsed=None, **extra):
+        name, number = pages[index][:2]
+        body = ocr.bill_response(parsed, target) if parsed is not None else {'success': False}
+        return json.dumps(dict(body, index=index, file=name, page=number, **extra), ensure_ascii=False) + '\n'
+
+    waiting, keys = [], {}
+    for index, (_, _, data, frame, error) in enumerate(pages):
+        if error:
+            yield line(index, message=error)
+            continue
+        key, phash, parsed = _ocr_cache_lookup(data, frame)
+        if parsed is not None:
+            results[index] = parsed
+            yield line(index, parsed, cached=True)
         else:
-            # DEBUG BİLGİSİ İLE DÖN
-            debug_msg = "Değer okunamadı. "
-            if match_price: debug_msg += f"Fiyat bulundu ancak hesaplanamadı ({match_price.group(1)}). "
-            else: debug_msg += "Fiyat bulunamadı. "
-            
-            debug_msg += f"OCR İlk 50 Karakter: {text[:50]}..."
-            return jsonify({'success': False, 'message': debug_msg})
+            keys[index] = (key, phash)
+            waiting.append(index)
 
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'Hata: {str(e)}'})
+    if not app.config['OCR_WORKERS']:
+        # Senkron mod: sayfalar sırayla, istek thread'inde
+        for index in waiting:
+            try:
+                parsed = ocr.analyze_image(pages[index][2], timeout, page=pages[index][3])
+            except Exception as e:
+                yield line(index, message=f'Hata: {str(e)}')
+                continue
+            _ocr_cache_store(*keys[index], parsed)
+            results[index] = parsed
+            yield line(index, parsed)
+    else:
+        queue = get_ocr_queue()
+        active = {} # iş kimliği -> (sayfa sırası, iş)
+        started = time.monotonic()
+        try:
+            while waiting or active:
+                # Kuyrukta yer oldukça sayfa gönder; kuyruk sınırı toplu yüklemede de geçerlidir
+                while waiting:
+                    try:
+                        job = queue.submit(pages[waiting[0]][2], uid, pages[waiting[0]][3])
+                    except QueueFull:
+                        break
+                    active[job.id] = (waiting.pop(0), job)
+                    started = time.monotonic()
+                if waiting and not active and time.monotonic() - started > timeout:
+                    # Kuyruk uzun süredir başka işlerle dolu
+                    for index in waiting:
+                        yield line(index, message='Sunucu şu an çok meşgul, lütfen daha sonra tekrar deneyin.')
+                    waiting = []
+
+                futures = [job.future for _, job in active.values()]
+                if futures:
+                    wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(0.5)
+
+                for job_id, (index, job) in list(active.items()):
+                    queue.get(job_id, uid) # Süresi dolanları işaretler, işi terk edilmiş saymaz
+                    status = job.status
+                    if status in ('queued', 'running'):
+                        continue
+                    del active[job_id]
+                    if status == 'done':
+                        parsed = job.future.result()
+                        _ocr_cache_store(*keys[index], parsed)
+                        results[index] = parsed
+                        yield line(index, parsed)
+                    elif status == 'failed':
+                        yield line(index, message=f'Hata: {job.future.exception()}')
+                    else:
+                        yield line(index, message=JOB_MESSAGES[status])
+        finally:
+            # İstemci bağlantıyı kestiyse kalan işler boşuna çalışmasın
+            for job_id in active:
+                queue.cancel(job_id, uid)
+
+    read = sum(1 for parsed in results.values() if parsed['found_val'])
+    summary = {'done': True, 'success': True, 'total': len(pages), 'read': read, 'saved': 0}
+    if save:
+        try:
+            summary['saved'] = _save_bills([results[i] for i in sorted(results)], uid)
+        except Exception as e:
+            db.session.rollback()
+            summary.update(success=False, message=f'Kayıt hatası: {str(e)}')
+    summary.setdefault('message', f"{len(pages)} sayfadan {read} fatura okundu" +
+                       (f", {summary['saved']} kayıt eklendi." if save else "."))
+    yield json.dumps(summary, ensure_ascii=False) + '\n'
+
+@app.route('/api/analyze_bills', methods=['POST'])
+def analyze_bills():
+    uploads = request.files.getlist('file')
+    if not uploads: return jsonify({'success': False, 'message': 'Dosya yok'})
+    try:
+        pages = _batch_pages(uploads)
+    except UploadRejected as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
+    uid = current_user.id if current_user.is_authenticated else None
+    save = request.form.get('save') == '1'
+    return Response(stream_with_context(_batch_results(pages, uid, save)), mimetype='application/x-ndjson')
 
 # ==================================================
 # === HAVA DURUMU API ===
 # ==================================================
-@app.route('/api/weather_advice')
-def weather_advice():
+# Hava durumu her istekte dış API'ye gitmesin diye kısa süreli önbellek (sadece başarılı yanıtlar)
+WEATHER_CACHE_TTL = 600 # saniye
+_weather_cache = {'at': 0.0, 'data': None}
+
+def fetch_weather_advice():
+    now = time.monotonic()
+    if _weather_cache['data'] and now - _weather_cache['at'] < WEATHER_CACHE_TTL:
+        return _weather_cache['data']
+
     city = "Istanbul"
     api_key = os.environ.get('WEATHER_API_KEY') 
 
@@ -559,10 +696,26 @@ def weather_advice():
         elif "yağmur" in description.lower(): advice = "Yağmur bekleniyor ☔ Bitkileri sulamana gerek yok!"
         else: advice = "Su tasarrufu için muslukları kısa süreli kullan 💧"
 
-        return jsonify({"city": city, "temp": temp, "advice": advice})
+        _weather_cache.update(at=now, data={"city": city, "temp": temp, "advice": advice})
+        return _weather_cache['data']
 
     except Exception as e:
-        return jsonify({"city": city, "temp": "-", "advice": "Veri alınamadı."})
+        return {"city": city, "temp": "-", "advice": "Veri alınamadı."}
+
+@app.route('/api/weather_advice')
+def weather_advice():
+    return jsonify(fetch_weather_advice())
+
+# İşletme istatistikleri (OCR işçi havuzu, yanıt ve tarife önbellekleri) yalnızca giriş yapmış kullanıcılara
+@app.route('/api/ocr_stats')
+@login_required
+def ocr_stats():
+    return jsonify(get_ocr_queue().stats())
+
+@app.route('/api/cache_stats')
+@login_required
+def cache_stats():
+    return jsonify(dict(get_cache().stats(), tariff_quotes=tariffs.quote_cache_stats()))
 
 # === İPUÇLARI SAYFASI ===
 @app.route('/tips')
@@ -575,20 +728,21 @@ def api_calculate_cost():
     data = request.json
     usage_m3 = float(data.get('usage', 0))
     user_type = data.get('user_type', 'residential')
+    bill_date = data.get('date') # Faturanın tarihi; o tarihte yürürlükteki tarife kullanılır (varsayılan bugün)
     
     manual_rates = None
     if data.get('manual', False):
+        # Gönderilen her kademe fiyatı (water_tier1, waste_tier2, ...) ve vergi oranı tarifenin üzerine yazılır
         try:
-            manual_rates = {
-                'water_tier1': float(data.get('water_tier1')),
-                'waste_tier1': float(data.get('waste_tier1'))
-                # Diğer tier'ları da isterse ekleyebiliriz, şimdilik en temeli bu
-            }
-        except:
-            pass # Hatalı giriş varsa varsayılanı kullan
+            manual_rates = {key: float(value) for key, value in data.items()
+                            if tariffs.MANUAL_RATE_KEY.match(key) or key in ('ctv_rate', 'kdv_rate')}
+        except (TypeError, ValueError):
+            manual_rates = None # Hatalı giriş varsa varsayılanı kullan
             
-    from utils import calculate_iski_bill
-    result = calculate_iski_bill(usage_m3, user_type, manual_rates)
+    try:
+        result = tariffs.quote_bill(usage_m3, user_type, manual_rates, on=bill_date)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     return jsonify({'success': True, 'data': result})
 
@@ -598,11 +752,48 @@ def api_estimate_usage():
     price = float(data.get('price', 0))
     user_type = data.get('user_type', 'residential')
     
-    from utils import solve_usage_from_price
-    usage_m3 = solve_usage_from_price(price, user_type)
+    try:
+        usage_m3 = tariffs.quote_usage(price, user_type, on=data.get('date'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     return jsonify({'success': True, 'usage_m3': usage_m3, 'liters': usage_m3 * 1000})
 
+# Tarife eğrisi: hesaplayıcılar fiyat <-> tüketimi tarayıcıda hesaplar (bkz. static/app.js, TariffSchedule.curve).
+# Gövde tarife başına bir kez üretilir; içerikten türetilen ETag süreçler arasında aynıdır. Yanıt bir sonraki tarifenin
+# yürürlüğe gireceği güne kadar (en fazla TARIFF_CURVE_MAX_AGE) önbellekte tutulabilir, sonra 304 ile doğrulanır.
+TARIFF_CURVE_MAX_AGE = 7 * 24 * 3600 # saniye
+_tariff_curve_bodies = {}
+
+@app.route('/api/tariff_curve')
+def tariff_curve():
+    try:
+        schedule = tariffs.get_schedule(request.args.get('utility', tariffs.DEFAULT_UTILITY), request.args.get('date'))
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'message': 'Tarife bulunamadı'}), 404
+
+    valid_until = tariffs.next_effective_date(schedule)
+    if schedule not in _tariff_curve_bodies:
+        curve = dict(schedule.curve(), success=True, valid_until=valid_until.isoformat() if valid_until else None)
+        body = json.dumps(curve, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        _tariff_curve_bodies[schedule] = (body, hashlib.sha1(body).hexdigest()[:20])
+    body, etag = _tariff_curve_bodies[schedule]
+
+    max_age = TARIFF_CURVE_MAX_AGE
+    if valid_until and 'date' not in request.args:
+        # Yeni tarife yürürlüğe girince istemci eski eğriyi kullanmaya devam etmesin
+        now = datetime.datetime.now()
+        max_age = min(max_age, int((datetime.datetime.combine(valid_until, datetime.time()) - now).total_seconds()))
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.mimetype = 'application/json'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={max(max_age, 0)}'
+    return response
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
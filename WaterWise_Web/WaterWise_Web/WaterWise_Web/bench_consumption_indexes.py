@@ -0,0 +1,117 @@
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from flask import Flask
+from models import db, upgrade_schema
+
+# Consumption tablosundaki sıcak sorguların indeks/tipli tarih öncesi ve sonrası
+# sorgu planlarını ve gecikmelerini karşılaştırır.
+# Kullanım: python bench_consumption_indexes.py [satir_sayisi] [kullanici_sayisi]
+
+TODAY = datetime.date(2025, 12, 20)
+
+# (isim, eski sorgu [metin date], yeni sorgu [tipli day])
+QUERIES = [
+    ('today_status',
+     "SELECT SUM(liters) FROM consumption WHERE date = :today AND user_id = :uid AND activity_type != 'bill'",
+     "SELECT SUM(liters) FROM consumption WHERE day = :today AND user_id = :uid AND activity_type != 'bill'"),
+    ('reset_today',
+     "SELECT COUNT(*) FROM consumption WHERE date = :today AND user_id = :uid",
+     "SELECT COUNT(*) FROM consumption WHERE day = :today AND user_id = :uid"),
+    ('summary_week',
+     "SELECT SUM(liters) FROM consumption WHERE date > :week_ago AND activity_type != 'bill' AND user_id = :uid",
+     "SELECT SUM(liters) FROM consumption WHERE day > :week_ago AND activity_type != 'bill' AND user_id = :uid"),
+    ('report_weekly',
+     "SELECT date(substr(date, 1, 10), 'weekday 1') AS b, SUM(liters) FROM consumption "
+     "WHERE user_id = :uid AND date >= :start AND date <= :today "
+     "AND (activity_type IS NULL OR activity_type != 'bill') AND category != 'Fatura Bildirimi' GROUP BY b",
+     "SELECT date(day, 'weekday 1') AS b, SUM(liters) FROM consumption "
+     "WHERE user_id = :uid AND day >= :start AND day <= :today "
+     "AND (activity_type IS NULL OR activity_type != 'bill') AND category != 'Fatura Bildirimi' GROUP BY b"),
+]
+
+ACTIVITIES = [('shower', 'Duş'), ('tap', 'Musluk Kullanımı'), ('garden', 'Bahçe Sulama'), ('bill', 'Fatura Bildirimi')]
+
+
+def create_legacy_table(path, rows, users):
+    """Eski şemada (indekssiz, metin tarih) rastgele veriyle dolu bir tablo oluşturur."""
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE consumption (
+        id INTEGER NOT NULL PRIMARY KEY, date VARCHAR(20) NOT NULL, category VARCHAR(50) NOT NULL,
+        liters FLOAT NOT NULL, activity_type VARCHAR(50), amount FLOAT, user_id INTEGER)""")
+    rng = random.Random(42)
+
+    def generate():
+        for _ in range(rows):
+            activity, category = rng.choice(ACTIVITIES)
+            day = TODAY - datetime.timedelta(days=rng.randint(0, 1500))
+            yield (day.isoformat(), category, rng.uniform(1, 300), activity, 1.0, rng.randint(1, users))
+
+    conn.executemany("INSERT INTO consumption (date, category, liters, activity_type, amount, user_id) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", generate())
+    conn.commit()
+    conn.close()
+
+
+def run_queries(path, column_index, users, repeat=30):
+    conn = sqlite3.connect(path)
+    rng = random.Random(7)
+    results = {}
+    for query in QUERIES:
+        name, sql = query[0], query[column_index]
+        params = {
+            'uid': 1, 'today': TODAY.isoformat(),
+            'week_ago': (TODAY - datetime.timedelta(days=7)).isoformat(),
+            'start': (TODAY - datetime.timedelta(weeks=11)).isoformat(),
+        }
+        plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        timings = []
+        for _ in range(repeat):
+            params['uid'] = rng.randint(1, users)
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    conn.close()
+    return results
+
+
+def upgrade(path):
+    """Uygulamanın kullandığı upgrade_schema() ile day sütununu ve indeksleri ekler."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    db.init_app(app)
+    t0 = time.perf_counter()
+    with app.app_context():
+        upgrade_schema()
+        db.engine.dispose()
+    return time.perf_counter() - t0
+
+
+def main(rows=2_000_000, users=1000):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_consumption.db')
+    print(f"{rows:,} satır / {users} kullanıcı oluşturuluyor: {path}")
+    create_legacy_table(path, rows, users)
+
+    before = run_queries(path, 1, users, repeat=5)
+    print(f"Migration (day sütunu + backfill + indeksler): {upgrade(path):.1f} sn")
+    after = run_queries(path, 2, users)
+
+    for name, *_ in QUERIES:
+        (plan_b, ms_b), (plan_a, ms_a) = before[name], after[name]
+        print(f"\n=== {name} ===")
+        print(f"  önce : {ms_b:9.2f} ms  | {' / '.join(plan_b)}")
+        print(f"  sonra: {ms_a:9.2f} ms  | {' / '.join(plan_a)}")
+        print(f"  hızlanma: x{ms_b / max(ms_a, 1e-6):.0f}")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,101 @@
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from flask import Flask
+from models import db, Consumption, DailyRollup, upgrade_schema
+from utils import calculate_water_usage, get_activity_label
+from rollups import apply_consumption, rebuild_rollups
+from ingest import ingest_entries
+import streaks # seri dinleyicisi (commit öncesi)
+import response_cache # önbellek dinleyicisi (commit sonrası)
+
+# Tek tek kayıt (/api/add yolu: kayıt başına INSERT + rollup sorgusu + commit) ile toplu kaydın
+# (/api/add_batch yolu: executemany + tek rollup sorgusu + tek commit) geçen sürelerini ve
+# sonuçta oluşan rollup tablolarının aynı olduğunu karşılaştırır.
+# Kullanım: python bench_ingest.py [kayit_sayisi] [parti_boyutu]
+
+TODAY = datetime.date(2025, 12, 20)
+ACTIVITIES = ['shower', 'tap', 'dishwasher_eco', 'washing_machine', 'garden', 'custom', 'bill']
+USER_ID = 1
+
+
+def make_entries(count):
+    rng = random.Random(42)
+    return [{
+        'date': (TODAY - datetime.timedelta(days=rng.randrange(90))).isoformat(),
+        'activity': rng.choice(ACTIVITIES),
+        'amount': round(rng.uniform(0.5, 20), 1),
+    } for _ in range(count)]
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+    return app
+
+
+def single(entries, batch_size):
+    for entry in entries:
+        record = Consumption(
+            date=entry['date'],
+            category=get_activity_label(entry['activity']),
+            liters=calculate_water_usage(entry['activity'], entry['amount']),
+            activity_type=entry['activity'],
+            amount=entry['amount'],
+            user_id=USER_ID
+        )
+        db.session.add(record)
+        apply_consumption(record)
+        db.session.commit()
+
+
+def batched(entries, batch_size):
+    for start in range(0, len(entries), batch_size):
+        ingest_entries(entries[start:start + batch_size], USER_ID)
+        db.session.commit()
+
+
+def rollup_snapshot(digits=None):
+    return sorted((r.user_id, r.day, r.category, r.is_bill,
+                   r.liters if digits is None else round(r.liters, digits), r.entries)
+                  for r in DailyRollup.query)
+
+
+def run(name, fn, entries, batch_size):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = make_app(path)
+        with app.app_context():
+            start = time.perf_counter()
+            fn(entries, batch_size)
+            elapsed = time.perf_counter() - start
+            snapshot = rollup_snapshot()
+            rebuild_rollups() # SQL SUM toplama sırası farklı olabilir; yuvarlanmış karşılaştırılır
+            consistent = rollup_snapshot(6) == sorted(row[:4] + (round(row[4], 6), row[5]) for row in snapshot)
+            count = Consumption.query.count()
+            db.session.remove()
+        print(f"{name:6s}: {elapsed:8.2f} sn  {len(entries) / elapsed:10,.0f} kayıt/sn  "
+              f"({count} kayıt, rollup yeniden hesapla {'aynı' if consistent else 'FARKLI'})")
+        return elapsed, snapshot
+    finally:
+        os.remove(path)
+
+
+def main(count=5000, batch_size=1000):
+    entries = make_entries(count)
+    print(f"{count} kayıt, parti boyutu {batch_size}")
+    single_time, single_rollups = run('tek', single, entries, batch_size)
+    batch_time, batch_rollups = run('toplu', batched, entries, batch_size)
+    print(f"hızlanma: x{single_time / batch_time:.0f}, rollup tabloları {'aynı' if single_rollups == batch_rollups else 'FARKLI'}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,335 @@
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import bill_parser
+import ocr
+import ocr_jobs
+from utils import calculate_iski_bill
+
+# Fatura OCR'ı için çevrimdışı hız ve doğruluk ölçümü.
+#   1. Metin derlemi: bilinen OCR hatalı metinlerde bill_parser doğruluğu (Tesseract gerekmez)
+#   2. Görüntü derlemi: değerleri bilinen sentetik ISKI faturaları (OpenCV ile yazılır; gürültü, bulanıklık,
+#      döndürme, perspektif) uygulamadaki hattan (ocr.analyze_image) geçirilir. Aşama gecikmeleri
+#      (çözme, ön işleme, Tesseract, ayrıştırma), sıralı ve işçi havuzlu verim ve alan bazında doğruluk raporlanır.
+# Sonuçlar bench_ocr_results.json'a yazılır; dosya zaten varsa (veya ikinci argüman verilirse) önceki
+# sonuçla karşılaştırılır. Okunamayan görüntüler debug_ocr.py ile incelenmek üzere bench_ocr_failures/ altına kaydedilir.
+# Kullanım: python bench_ocr.py [görüntü_sayısı] [önceki_sonuç.json]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(HERE, 'bench_ocr_results.json')
+FAILURES_DIR = os.path.join(HERE, 'bench_ocr_failures')
+POOL_WORKERS = int(os.environ.get('OCR_WORKERS', 2)) or 2
+FIELDS = ('amount', 'consumption', 'days', 'daily', 'due_date')
+
+# (metin, beklenen alanlar); None = alan bulunmamalı
+TEXT_CORPUS = [
+    ("ODENECER TU\n715,00 TL 18:1272025", {'amount': 715.0}),
+    ("OGDENECEK TUTAR SON ODEME TARIH!\n715,00TL = 18/12/2025", {'amount': 715.0, 'due_date': '2025-12-18'}),
+    ("Ödenecek Tutar: 3.270,04 TL", {'amount': 3270.04}),
+    ("ODENECEK TUTAR\n1.016,56 T1", {'amount': 1016.56}),
+    ("ÖDENECEK TUTAR 224,72 TI\nSON ÖDEME TARİHİ 18/12/2025", {'amount': 224.72}),
+    ("TOPLAM TUTAR 715,00 TL", {'amount': 715.0, 'consumption': None}),
+    ("Su Bedeli 47,36 TL\nAtiksu 320,84 TL\nKDV 3,20 TL", {'amount': 320.84}),
+    ("Gun Sayis: 28\nTeplamm' 19\nGiniukin 0 68", {'days': 28, 'consumption': 19.0, 'daily': 0.68}),
+    ("TÜKETİM BİLGİLERİ\nGün Sayısı: 30\nToplam Tüketim m³ 23\nGünlük Ortalama 0,77", {'days': 30, 'consumption': 23.0, 'daily': 0.77}),
+    ("Topiam 12 m3 GUniUk 0,41", {'consumption': 12.0, 'daily': 0.41}),
+    ("ISKI SU FATURASI\nAbone No 1-23940611-9", {'amount': None, 'consumption': None}),
+    # ROI geçişi: bölgeler ayrı ayrı okunup alt alta birleştirilir
+    ("ODENECEK TUTAR\n715,00 TL\nToplam Tüketim 19 m3\nSON ODEME TARIHI: 18/12/2025",
+     {'amount': 715.0, 'consumption': 19.0, 'due_date': '2025-12-18'}),
+    # Tek ayraçlı sayılar: virgül ondalıktır, nokta yalnızca tam kısım sıfır değilse binliktir
+    ("GUNLUK ORTALAMA 0,680 m3", {'daily': 0.68}),
+    ("Günlük Ortalama 0.125", {'daily': 0.125}),
+    ("Günlük Ortalama 12,345", {'daily': 12.345}),
+    ("Ödenecek Tutar: 1.250 TL", {'amount': 1250.0}),
+    ("TOPLAM TUKETIM 0,680 m3", {'consumption': 0.68}),
+    ("Toplam Tüketim m³ 12,345\nÖdenecek Tutar 1.016,56 TL", {'consumption': 12.345, 'amount': 1016.56}),
+]
+
+PROFILES = ('clean', 'noise', 'blur', 'rotate', 'perspective', 'combined')
+
+
+# === Sentetik fatura ===
+def tr_money(value):
+    """1016.56 -> '1.016,56'"""
+    return f"{value:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def make_truth(rng):
+    consumption = rng.randint(3, 45)
+    days = rng.randint(27, 33)
+    return {
+        'amount': calculate_iski_bill(consumption)['total'],
+        'consumption': float(consumption),
+        'days': days,
+        'daily': round(consumption / days, 2),
+        'due_date': datetime.date(2025, 12, rng.randint(1, 28)).isoformat(),
+    }
+
+
+def render_bill(truth, rng):
+    """ISKI fatura düzenine benzeyen düz (bozulmamış) sayfa; gri tonlamalı."""
+    page = np.full((2400, 1700), 245, np.uint8)
+    font, ink = cv2.FONT_HERSHEY_SIMPLEX, 25
+
+    def line(text, x, y, scale=1.1, thickness=2):
+        cv2.putText(page, text, (x, y), font, scale, ink, thickness, cv2.LINE_AA)
+
+    line("ISKI", 100, 170, 3.0, 6)
+    line("SU FATURASI OKUMALI", 520, 160, 1.4, 3)
+    line(f"Sozlesme Numarasi 1-{rng.randint(10000000, 99999999)}-{rng.randint(1, 9)}", 100, 300)
+    line(f"Fatura Numarasi {rng.randint(1000000000, 9999999999)}", 100, 360)
+    line(f"{rng.choice(('YILDIZ', 'KARA', 'DEMIR', 'ASLAN'))} MAH {rng.randint(100, 3000)}. SK No. {rng.randint(1, 90)}", 100, 420)
+    cv2.rectangle(page, (80, 500), (1620, 720), ink, 3)
+    line("ODENECEK TUTAR", 120, 570, 1.3, 3)
+    line(f"{tr_money(truth['amount'])} TL", 120, 670, 1.6, 4)
+
+    line("TUKETIM BILGILERI", 100, 830, 1.3, 3)
+    rows = [
+        (f"Su Birim Fiyati {tr_money(rng.uniform(30, 80))} TL", f"Gun Sayisi: {truth['days']}"),
+        (f"Atiksu Bedeli {tr_money(rng.uniform(100, 900))} TL", f"Toplam: {int(truth['consumption'])} m3"),
+        (f"CTV {tr_money(rng.uniform(0.1, 2))} TL", f"Gunluk Ortalama: {tr_money(truth['daily'])}"),
+        (f"KDV {tr_money(rng.uniform(5, 90))} TL", f"Ilk Endeks {rng.randint(1000, 9999)}"),
+    ]
+    y = 920
+    for left, right in rows:
+        line(left, 100, y)
+        line(right, 950, y)
+        y += 80
+    # Son ödeme tarihi tutar kutusunun dışında, ayrı satırda (ROI geçişinin ayrı bölge bulması gerekir)
+    due = datetime.date.fromisoformat(truth['due_date'])
+    line(f"SON ODEME TARIHI: {due:%d/%m/%Y}", 100, y + 60, 1.3, 3)
+    for i in range(8):
+        line(f"Bilgilendirme satiri {i + 1}: faturanizi zamaninda odeyiniz.", 100, 1400 + i * 70, 0.9, 2)
+    return page
+
+
+def photograph(page, profile, rng):
+    """Sayfayı 12 MP fotoğraf gibi çeker: koyu zemin, döndürme / perspektif, bulanıklık, gürültü, JPEG."""
+    w, h = 4000, 3000
+    ph, pw = page.shape
+    scale = 2600 / ph
+    cx, cy = w / 2 + rng.uniform(-150, 150), h / 2 + rng.uniform(-100, 100)
+    corners = np.array([[-pw / 2, -ph / 2], [pw / 2, -ph / 2], [pw / 2, ph / 2], [-pw / 2, ph / 2]]) * scale
+
+    angle = rng.uniform(-8, 8) if profile in ('rotate', 'combined') else rng.uniform(-1, 1)
+    rad = np.deg2rad(angle)
+    rotation = np.array([[np.cos(rad), -np.sin(rad)], [np.sin(rad), np.cos(rad)]])
+    target = corners @ rotation.T + (cx, cy)
+    if profile in ('perspective', 'combined'):
+        target += np.array([[rng.uniform(-120, 120), rng.uniform(-80, 80)] for _ in range(4)])
+    source = np.float32([[0, 0], [pw, 0], [pw, ph], [0, ph]])
+    matrix = cv2.getPerspectiveTransform(source, np.float32(target))
+    photo = cv2.warpPerspective(page, matrix, (w, h), flags=cv2.INTER_LINEAR, borderValue=45)
+
+    if profile in ('blur', 'combined'):
+        photo = cv2.GaussianBlur(photo, (0, 0), rng.uniform(1.5, 3.0))
+    if profile in ('noise', 'combined'):
+        noise = np.random.default_rng(rng.randint(0, 2 ** 32 - 1)).normal(0, rng.uniform(8, 18), photo.shape)
+        photo = np.clip(photo + noise, 0, 255).astype(np.uint8)
+    quality = rng.randint(70, 92)
+    return cv2.imencode('.jpg', cv2.cvtColor(photo, cv2.COLOR_GRAY2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def make_corpus(count, seed=2025):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        profile = PROFILES[i % len(PROFILES)]
+        truth = make_truth(rng)
+        corpus.append({'id': i, 'profile': profile, 'truth': truth,
+                       'image': photograph(render_bill(truth, rng), profile, rng)})
+    return corpus
+
+
+# === Ölçüm ===
+def field_correct(name, expected, field):
+    if expected is None:
+        return field is None
+    if isinstance(expected, str):
+        return field is not None and field['value'] == expected
+    return field is not None and abs(field['value'] - expected) <= 0.011
+
+
+def run_text_corpus():
+    correct, total, timings = 0, 0, []
+    failures = []
+    for text, expected in TEXT_CORPUS:
+        t0 = time.perf_counter()
+        fields = bill_parser.extract(text)
+        timings.append((time.perf_counter() - t0) * 1e6)
+        for name, value in expected.items():
+            total += 1
+            if field_correct(name, value, fields[name]):
+                correct += 1
+            else:
+                failures.append({'text': text, 'field': name, 'expected': value, 'found': fields[name]})
+    return {'fields': total, 'accuracy': round(correct / total, 4),
+            'median_us': round(statistics.median(timings), 1), 'failures': failures}
+
+
+def stage_times(timings, parse_ms):
+    return {
+        'decode': timings.get('decode', 0),
+        'preprocess': sum(timings.get(k, 0) for k in ('crop', 'deskew', 'scale', 'threshold')),
+        'tesseract': sum(timings.get(k, 0) for k in ('locate', 'roi_ocr', 'ocr')),
+        'parse': parse_ms,
+    }
+
+
+def run_case(case):
+    t0 = time.perf_counter()
+    parsed = ocr.analyze_image(case['image'])
+    total = (time.perf_counter() - t0) * 1000
+    # Ayrıştırma süresi ayrıca ölçülür (çoklu stratejide her varyant ayrıştırılır, kazananınki raporlanır)
+    t1 = time.perf_counter()
+    ocr.parse_bill_text(parsed['text'])
+    parse_ms = (time.perf_counter() - t1) * 1000
+    truth, fields = case['truth'], parsed['fields']
+    return {
+        'id': case['id'],
+        'profile': case['profile'],
+        'truth': truth,
+        'found': {name: fields[name]['value'] if fields[name] else None for name in FIELDS},
+        'correct': {name: field_correct(name, truth[name], fields[name]) for name in FIELDS},
+        'found_val': parsed['found_val'],
+        'usage_correct': parsed['found_val'] is not None and abs(parsed['found_val'] - truth['consumption']) <= 0.5,
+        'mode': parsed.get('mode'),
+        'strategy': parsed.get('strategy'),
+        'confidence': parsed.get('confidence'),
+        'stages_ms': {k: round(v, 1) for k, v in stage_times(parsed['timings'], parse_ms).items()},
+        'total_ms': round(total, 1),
+    }
+
+
+def _pool_case(image):
+    return ocr.analyze_image(image)['found_val']
+
+
+def pool_throughput(corpus):
+    """ocr_jobs ile aynı ayarlarla (spawn, işçi başlatıcısı) havuz verimi; ısınma süresi hariç."""
+    with ProcessPoolExecutor(POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=ocr_jobs._init_worker) as pool:
+        for future in [pool.submit(ocr_jobs._ping) for _ in range(POOL_WORKERS)]:
+            future.result()
+        t0 = time.perf_counter()
+        list(pool.map(_pool_case, [case['image'] for case in corpus]))
+        return len(corpus) / (time.perf_counter() - t0)
+
+
+def summarize(cases, sequential_s, pool_per_s):
+    stages = {}
+    for stage in ('decode', 'preprocess', 'tesseract', 'parse'):
+        values = [c['stages_ms'][stage] for c in cases]
+        stages[stage] = {'median_ms': round(statistics.median(values), 2),
+                         'p90_ms': round(statistics.quantiles(values, n=10)[-1], 2) if len(values) > 1 else values[0]}
+    totals = [c['total_ms'] for c in cases]
+    stages['total'] = {'median_ms': round(statistics.median(totals), 1),
+                       'p90_ms': round(statistics.quantiles(totals, n=10)[-1], 1) if len(totals) > 1 else totals[0]}
+
+    accuracy = {name: round(sum(c['correct'][name] for c in cases) / len(cases), 4) for name in FIELDS}
+    accuracy['usage'] = round(sum(c['usage_correct'] for c in cases) / len(cases), 4)
+    by_profile = {}
+    for profile in PROFILES:
+        group = [c for c in cases if c['profile'] == profile]
+        if group:
+            by_profile[profile] = round(sum(c['usage_correct'] for c in group) / len(group), 4)
+    return {
+        'stages': stages,
+        'throughput': {'sequential_per_s': round(len(cases) / sequential_s, 3),
+                       'pool_per_s': round(pool_per_s, 3), 'pool_workers': POOL_WORKERS},
+        'accuracy': accuracy,
+        'usage_accuracy_by_profile': by_profile,
+    }
+
+
+def compare(old, new):
+    print("\n=== önceki sonuçla karşılaştırma ===")
+    print(f"  önceki: {old.get('created')}  OCR v{old.get('ocr_version')} / ayrıştırıcı v{old.get('parser_version')}")
+    rows = [('metin derlemi doğruluk', ('text_corpus', 'accuracy'))]
+    if 'images' in old and 'images' in new:
+        rows += [(f"{name} doğruluk", ('images', 'accuracy', name)) for name in FIELDS + ('usage',)]
+        rows += [(f"{stage} medyan ms", ('images', 'stages', stage, 'median_ms'))
+                 for stage in ('decode', 'preprocess', 'tesseract', 'parse', 'total')]
+        rows += [("sıralı verim /sn", ('images', 'throughput', 'sequential_per_s')),
+                 ("havuz verimi /sn", ('images', 'throughput', 'pool_per_s'))]
+    for label, path in rows:
+        a, b = old, new
+        for key in path:
+            a, b = (a or {}).get(key), (b or {}).get(key)
+        if a is None or b is None:
+            continue
+        print(f"  {label:28s} {a:10.3f} -> {b:10.3f}  ({b - a:+.3f})")
+
+
+def main(count=24, baseline_path=None):
+    baseline_path = baseline_path or (RESULTS_PATH if os.path.exists(RESULTS_PATH) else None)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+               'ocr_version': ocr.OCR_VERSION, 'parser_version': ocr.PARSER_VERSION}
+
+    print("=== metin derlemi (bill_parser) ===")
+    results['text_corpus'] = text = run_text_corpus()
+    print(f"  {text['fields']} alan, doğruluk %{text['accuracy'] * 100:.1f}, medyan {text['median_us']:.0f} µs / metin")
+    for failure in text['failures']:
+        print(f"  HATA {failure['field']}: beklenen {failure['expected']}, bulunan {failure['found']}  <- {failure['text']!r}")
+
+    try:
+        results['tesseract'] = str(ocr.pytesseract.get_tesseract_version())
+    except Exception as e:
+        print(f"\nTesseract bulunamadı, görüntü derlemi atlandı ({e})")
+        results['tesseract'] = None
+
+    if results['tesseract']:
+        print(f"\n=== görüntü derlemi: {count} sentetik fatura (Tesseract {results['tesseract']}) ===")
+        t0 = time.perf_counter()
+        corpus = make_corpus(count)
+        print(f"  derlem üretimi {time.perf_counter() - t0:.1f} sn")
+        ocr.load_libraries()
+
+        cases = []
+        t0 = time.perf_counter()
+        for case in corpus:
+            cases.append(run_case(case))
+        sequential_s = time.perf_counter() - t0
+        pool_per_s = pool_throughput(corpus)
+
+        results['images'] = summary = summarize(cases, sequential_s, pool_per_s)
+        results['images']['cases'] = cases
+        for stage, values in summary['stages'].items():
+            print(f"  {stage:10s} medyan {values['median_ms']:8.1f} ms   p90 {values['p90_ms']:8.1f} ms")
+        throughput = summary['throughput']
+        print(f"  verim: sıralı {throughput['sequential_per_s']:.2f} /sn, "
+              f"{throughput['pool_workers']} işçi {throughput['pool_per_s']:.2f} /sn")
+        print("  doğruluk: " + ", ".join(f"{k} %{v * 100:.0f}" for k, v in summary['accuracy'].items()))
+        print("  profil bazında (m³): " + ", ".join(f"{k} %{v * 100:.0f}" for k, v in summary['usage_accuracy_by_profile'].items()))
+
+        failed = [case for case, result in zip(corpus, cases) if not result['usage_correct']]
+        if failed:
+            os.makedirs(FAILURES_DIR, exist_ok=True)
+            for case in failed:
+                with open(os.path.join(FAILURES_DIR, f"{case['id']:03d}_{case['profile']}.jpg"), 'wb') as f:
+                    f.write(case['image'])
+            print(f"  {len(failed)} okunamayan görüntü -> {FAILURES_DIR}")
+
+    if baseline:
+        compare(baseline, results)
+    with open(RESULTS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    print(f"\nSonuçlar: {RESULTS_PATH}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]], *sys.argv[2:3])
@@ -0,0 +1,68 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# app.py içe aktarma süresini ve bellek kullanımını (tepe RSS) ölçer:
+#   lazy  : ağır kütüphaneler yüklenmeden (şu anki davranış)
+#   eager : eski "Cold Start" bloğu gibi cv2/pytesseract/numpy/pandas önceden içe aktarılarak
+#   warm  : lazy başlangıç + ağır kütüphanelerin sonradan yüklenmesi (ilk fatura analizi / ön yükleme)
+# Her senaryo ayrı bir Python sürecinde çalışır; ölçümler soğuk import'u yansıtsın diye tekrar edilir.
+# Kullanım: python bench_startup.py [tekrar]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = r"""
+import json, resource, sys, time
+def peak_rss_mb():
+    # ru_maxrss fork sırasında üst süreçten miras kalır; Linux'ta süreç kendi tepe değerini VmHWM'de tutar
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+mode = sys.argv[1]
+t0 = time.perf_counter()
+if mode == 'eager':
+    import cv2, pytesseract, numpy, pandas
+import app
+startup = time.perf_counter() - t0
+rss_startup = peak_rss_mb()
+t1 = time.perf_counter()
+if mode == 'warm':
+    app.ocr.load_libraries()
+heavy = time.perf_counter() - t1
+print(json.dumps({
+    'startup': startup,
+    'heavy_load': heavy,
+    'rss_mb': peak_rss_mb(),
+    'rss_startup_mb': rss_startup,
+    'heavy_in_sys_modules': sorted(m for m in ('cv2', 'pytesseract', 'numpy', 'pandas') if m in sys.modules),
+}))
+"""
+
+
+def run(mode):
+    env = dict(os.environ, WARMUP_HEAVY_IMPORTS='0')
+    out = subprocess.run([sys.executable, '-c', PROBE, mode], cwd=HERE, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(repeat=5):
+    for mode in ('lazy', 'eager', 'warm'):
+        runs = [run(mode) for _ in range(repeat)]
+        startup = statistics.median(r['startup'] for r in runs) * 1000
+        heavy = statistics.median(r['heavy_load'] for r in runs) * 1000
+        rss_startup = statistics.median(r['rss_startup_mb'] for r in runs)
+        rss = statistics.median(r['rss_mb'] for r in runs)
+        print(f"=== {mode} ===")
+        print(f"  import app       : {startup:8.1f} ms   (RSS {rss_startup:6.1f} MB)")
+        if mode == 'warm':
+            print(f"  ağır kütüphaneler: {heavy:8.1f} ms   (RSS {rss:6.1f} MB)")
+        print(f"  yüklü modüller   : {', '.join(runs[0]['heavy_in_sys_modules']) or '-'}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
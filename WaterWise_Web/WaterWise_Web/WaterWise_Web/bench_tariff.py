@@ -0,0 +1,86 @@
+import random
+import statistics
+import sys
+import time
+import numpy as np
+from utils import calculate_iski_bill, solve_usage_from_price
+from tariff_batch import calculate_iski_bills
+
+# ISKI tarife hesaplarının hızı:
+#   1. Tutardan tüketim çözümü (solve_usage_from_price): eski ikili arama implementasyonuna göre. Aynı rastgele
+#      tutar listesi iki yöntemle çözülür; eski yöntemin 0.5 TL toleransı tutturamayıp 0 döndürdüğü tutarlar da sayılır.
+#   2. Toplu fatura (tariff_batch.calculate_iski_bills): karışık kullanıcı tipli hane listesi (varsayılan 10^6)
+#      skaler calculate_iski_bill döngüsüne göre; saniyede fatura sayısı raporlanır.
+# Kullanım: python bench_tariff.py [tutar_sayısı] [tekrar] [hane_sayısı]
+
+
+def legacy_solve_usage_from_price(target_price_tl, user_type='residential'):
+    """Eski ikili arama implementasyonu (referans): her adımda calculate_iski_bill çağrılır."""
+    target = float(target_price_tl)
+    low = 0.0
+    high = 500.0
+    tolerance = 0.5
+    found_m3 = 0
+    for _ in range(50):
+        mid = (low + high) / 2
+        mid_price = calculate_iski_bill(mid, user_type)['total']
+        if abs(mid_price - target) < tolerance:
+            found_m3 = mid
+            break
+        if mid_price < target:
+            low = mid
+        else:
+            high = mid
+    return round(found_m3, 2)
+
+
+def timed(solve, prices, user_type, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [solve(price, user_type) for price in prices]
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), results
+
+
+def bench_batch(accounts, repeat, rng):
+    usages = np.round(rng.gamma(2.0, 6.0, accounts), 2) # Çoğu hane 5-20 m3, uzun kuyruk
+    user_types = rng.choice(np.array(['residential', 'student', 'disabled']), accounts, p=[0.9, 0.07, 0.03])
+    usage_list, type_list = usages.tolist(), user_types.tolist()
+
+    start = time.perf_counter()
+    scalar_totals = [calculate_iski_bill(usage, user_type)['total'] for usage, user_type in zip(usage_list, type_list)]
+    scalar_time = time.perf_counter() - start
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        batch = calculate_iski_bills(usages, user_types)
+        samples.append(time.perf_counter() - start)
+    batch_time = statistics.median(samples)
+    identical = scalar_totals == batch['total'].tolist()
+
+    print(f"toplu fatura: {accounts} hane, toplu hesap medyan / {repeat} tekrar")
+    print(f"    skaler döngü: {scalar_time * 1000:8.1f} ms  ({accounts / scalar_time:12,.0f} fatura/sn)")
+    print(f"    NumPy       : {batch_time * 1000:8.1f} ms  ({accounts / batch_time:12,.0f} fatura/sn)")
+    print(f"    hızlanma    : {scalar_time / batch_time:8.1f}x  (toplamlar {'aynı' if identical else 'FARKLI'})")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    accounts = int(sys.argv[3]) if len(sys.argv) > 3 else 1_000_000
+    rng = random.Random(42)
+    # Gerçekçi faturalar: 0-60 m3 tüketim, kuruşa yuvarlı tutar
+    prices = [calculate_iski_bill(round(rng.uniform(0, 60), 2))['total'] for _ in range(count)]
+
+    for user_type in ('residential', 'student'):
+        legacy_time, legacy = timed(legacy_solve_usage_from_price, prices, user_type, repeat)
+        new_time, new = timed(solve_usage_from_price, prices, user_type, repeat)
+        misses = sum(1 for price, usage in zip(prices, legacy) if usage == 0 and price > 0)
+        print(f"{user_type}: {count} tutar, medyan / {repeat} tekrar")
+        print(f"    ikili arama : {legacy_time * 1000:8.1f} ms  ({legacy_time / count * 1e6:6.2f} µs/çağrı, {misses} tutar 0 döndü)")
+        print(f"    tablo       : {new_time * 1000:8.1f} ms  ({new_time / count * 1e6:6.2f} µs/çağrı)")
+        print(f"    hızlanma    : {legacy_time / new_time:8.1f}x")
+
+    bench_batch(accounts, repeat, np.random.default_rng(42))
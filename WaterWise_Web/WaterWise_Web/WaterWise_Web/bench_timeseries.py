@@ -0,0 +1,97 @@
+import datetime
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import timeseries
+from check_report_parity import legacy_report, compare
+
+# Eski pandas rapor yolu ile timeseries (NumPy) modülünü 1k / 100k / 1M satırda karşılaştırır:
+# medyan gecikme, tracemalloc ile tepe bellek ve modül içe aktarma maliyeti (ayrı süreçte, tepe RSS).
+# pandas sadece referans için gerekir: pip install -r requirements-dev.txt
+# Kullanım: python bench_timeseries.py [tekrar]
+
+TODAY = datetime.date(2025, 12, 20)
+SIZES = (1_000, 100_000, 1_000_000)
+PERIODS = ('daily', 'weekly', 'monthly')
+CATEGORIES = [('shower', 'Duş'), ('tap', 'Musluk Kullanımı'), ('garden', 'Bahçe Sulama'),
+              ('custom', 'Diğer (Manuel)'), ('bill', 'Fatura Bildirimi')]
+
+IMPORT_PROBE = r"""
+import json, resource, sys, time
+def peak_rss_mb():
+    # ru_maxrss fork sırasında üst süreçten miras kalır; Linux'ta süreç kendi tepe değerini VmHWM'de tutar
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+t0 = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({'ms': (time.perf_counter() - t0) * 1000,
+                  'rss_mb': peak_rss_mb()}))
+"""
+
+
+def make_columns(rows):
+    rng = random.Random(rows)
+    dates, categories, liters, activities = [], [], [], []
+    for _ in range(rows):
+        activity, category = rng.choice(CATEGORIES)
+        dates.append((TODAY - datetime.timedelta(days=rng.randint(0, 400))).isoformat())
+        categories.append(category)
+        liters.append(round(rng.uniform(0.5, 400), 2))
+        activities.append(activity)
+    return {'date': dates, 'category': categories, 'liters': liters, 'activity_type': activities}
+
+
+def run_pandas(columns, period):
+    return legacy_report(columns, period, 150.0, TODAY)
+
+
+def run_numpy(columns, period):
+    return timeseries.build_report(columns['date'], columns['category'], columns['liters'],
+                                   columns['activity_type'], period, 150.0, TODAY)
+
+
+def measure(func, columns, period, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(columns, period)
+        timings.append((time.perf_counter() - t0) * 1000)
+    tracemalloc.start()
+    func(columns, period)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, statistics.median(timings), peak
+
+
+def import_cost(module):
+    out = subprocess.run([sys.executable, '-c', IMPORT_PROBE, module],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def main(repeat=5):
+    print("=== içe aktarma (soğuk süreç) ===")
+    for module in ('numpy', 'pandas'):
+        cost = import_cost(module)
+        print(f"  {module:7s}: {cost['ms']:7.1f} ms   tepe RSS {cost['rss_mb']:6.1f} MB")
+
+    for rows in SIZES:
+        columns = make_columns(rows)
+        print(f"\n=== {rows:,} satır ===")
+        for period in PERIODS:
+            expected, ms_pd, mem_pd = measure(run_pandas, columns, period, repeat)
+            actual, ms_np, mem_np = measure(run_numpy, columns, period, repeat)
+            same = 'aynı' if compare(expected, actual) else 'FARKLI'
+            print(f"  {period:8s} pandas {ms_pd:8.2f} ms {mem_pd:7.1f} MB | "
+                  f"numpy {ms_np:8.2f} ms {mem_np:7.1f} MB | x{ms_pd / max(ms_np, 1e-6):.1f} | {same}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
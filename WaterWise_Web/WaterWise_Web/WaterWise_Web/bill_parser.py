@@ -0,0 +1,179 @@
+import datetime
+import re
+
+# Fatura OCR metninden alan çıkarma: ödenecek tutar (TL), m³ tüketim, gün sayısı, günlük ortalama (m³) ve son ödeme tarihi.
+# Metin önce normalize edilir (Türkçe harfler katlanır, bilinen OCR karışıklıkları düzeltilir), sonra modül
+# yüklenirken derlenen desenlerle alanlar aranır. Her alan {'value', 'raw', 'confidence'} sözlüğüdür (bulunamazsa None);
+# confidence 0-1 arasıdır. Tüketim ile günlük ortalama x gün sayısı tutarlıysa üçünün de güveni artar.
+# Flask'a bağımlı değildir; OCR işçi süreçleri, önbellek ve debug betikleri aynı ayrıştırıcıyı kullanır.
+#
+# Desenler, puanlama veya tutardan tüketim çözümü (utils.solve_usage_from_price) değişince PARSER_VERSION
+# artırılır: OCR önbelleğindeki metinler yeniden ayrıştırılır (bkz. ocr_cache.py).
+# Sürüm 1-2 ocr.py içindeki eski satır içi regex ayrıştırıcısıydı.
+PARSER_VERSION = '7'
+
+TR_FOLD = str.maketrans('ÇĞİIÖŞÜçğıiöşü', 'CGIIOSUCGIIOSU')
+
+# Bilinen OCR karışıklıkları -> standart kelime (katlanmış, büyük harfli metin üzerinde, sırayla uygulanır)
+OCR_CONFUSIONS = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'\b[O0Q][GC]?D[EF]NE?C[EF][KR]\b', 'ODENECEK'), # ODENECER, OGDENECEK, 0DENECEK
+    (r'\bODENECEK\s+T[UV](?:T[A4]R)?\b', 'ODENECEK TUTAR'), # "ODENECER TU" (satır sonunda kesilmiş)
+    (r'\bT[UV]T[A4]R\b', 'TUTAR'),
+    (r'\bT[OE0]P[L1I][A4]?M+\b', 'TOPLAM'), # TOPIAM, TEPLAMM
+    (r'\bT[UOV]KET[I1L]M\b', 'TUKETIM'), # TOKETIM
+    (r'\bG[UI]N[LI1][UI]K(?:IN)?\b', 'GUNLUK'), # GUNIUK, GINIUKIN
+    (r'\bG[UI]N\s*SAY[I1]S[I1!]?', 'GUN SAYISI'),
+    (r'\bSON\s+[O0]DEME\s+TAR[I1]H[I1!]?', 'SON ODEME TARIHI'),
+    (r'(?<=\d)\s*T[L1I]\b', ' TL'), # 715,00TL, 715,00 T1, 715,00 TI
+    (r'\bM\s*[3³]\b', 'M3'),
+)]
+
+# Sayılar: Türkçe binlik ayraçlı (3.270,04) veya düz (3270.04, 715,00, 19)
+_NUMBER = r'(?<![\d.,])(?P<value>\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?![.,]?\d)'
+# m³ miktarları 3 ondalıklı basılabilir (0,680 m3); para tutarları 2 ondalıkla sınırlı kalır
+_QUANTITY = r'(?<![\d.,])(?P<value>\d{1,3}(?:\.\d{3})+(?:,\d{1,3})?|\d+(?:[.,]\d{1,3})?)(?![.,]?\d)'
+# Yalnızca noktalı binlik gösterim (1.250, 1.250.000); tam kısmı 0 olan 0.125 ondalıktır
+THOUSANDS_DOT = re.compile(r'^[1-9]\d{0,2}(?:\.\d{3})+$')
+
+AMOUNT_LABELS = [re.compile(p) for p in (r'\bODENECEK\s+TUTAR\b', r'\b(?:GENEL\s+TOPLAM|TOPLAM\s+TUTAR)\b', r'\bTUTAR\b')]
+AMOUNT_WINDOW = 80 # Etiketten sonra değerin aranacağı karakter sayısı ("SON ODEME TARIHI" gibi araya girenler için)
+MONEY_TL = re.compile(_NUMBER + r'\s*TL\b')
+MONEY = re.compile(r'(?<![\d.,])(?P<value>\d+(?:\.\d{3})*[.,]\d{2})(?![\d])')
+MIN_GUESS_AMOUNT = 10 # Etiketsiz en büyük TL tahmininde bunun altı büyük ihtimalle küsurattır
+
+CONSUMPTION = re.compile(r'(?<!GENEL )\b(?:TOPLAM|TUKETIM)\b(?P<gap>(?:M3|[^\d\n]){0,25}?)(?<!M)' + _QUANTITY
+                         + r'(?P<unit>\s*M3)?(?!\s*TL\b)')
+DAYS = re.compile(r'\bGUN SAYISI\W{0,3}(?P<value>\d{1,3})\b')
+# "0 68": OCR'ın yuttuğu ondalık ayraç; ancak çapraz kontrolle doğrulanırsa güvenilir sayılır
+DAILY = re.compile(r'\bGUNLUK(?:\s+ORTALAMA)?[^\d\n]{0,20}?(?:(?P<value>\d+[.,]\d+)|(?P<spaced>\d+ \d{2})\b)')
+DUE_DATE_LABEL = re.compile(r'\bSON ODEME TARIHI\b')
+DATE = re.compile(r'(?<!\d)(?P<day>\d{1,2})[./-](?P<month>\d{1,2})[./-](?P<year>20\d{2})(?!\d)')
+
+
+def fold(text):
+    """Türkçe harfleri ASCII'ye katlayıp büyük harfe çevirir (İ/ı sorunsuz)."""
+    return text.translate(TR_FOLD).upper()
+
+
+def normalize(text):
+    text = fold(text)
+    for pattern, replacement in OCR_CONFUSIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def parse_number(raw):
+    """
+    Yerel ayardan bağımsız sayı çözümleme.
+    '3.270,04' -> 3270.04, '715,00' -> 715.0, '0,680' -> 0.68, '3270.04' -> 3270.04, '1.250' -> 1250.0 (binlik),
+    '0.125' -> 0.125, '0 68' -> 0.68
+    """
+    raw = raw.strip().replace(' ', '.')
+    if ',' in raw and '.' in raw:
+        # İki ayraç da varsa sondaki ondalık, diğeri binlik ayraçtır
+        decimal, thousands = (',', '.') if raw.rfind(',') > raw.rfind('.') else ('.', ',')
+        return float(raw.replace(thousands, '').replace(decimal, '.'))
+    if ',' in raw:
+        # Türkçe faturada tek başına virgül her zaman ondalık ayraçtır (0,680 m3)
+        return float(raw.replace(',', '.'))
+    if THOUSANDS_DOT.match(raw):
+        return float(raw.replace('.', '')) # Binlik ayraç: 1.250, 1.250.000 (0.125 ondalıktır)
+    return float(raw)
+
+
+def _field(value, raw, confidence, **extra):
+    return dict(value=value, raw=raw.strip(), confidence=round(min(confidence, 1.0), 2), **extra)
+
+
+def _amount(text):
+    for label_pattern in AMOUNT_LABELS:
+        for label in label_pattern.finditer(text):
+            window = text[label.end():label.end() + AMOUNT_WINDOW]
+            match = MONEY_TL.search(window) or MONEY.search(window)
+            if not match:
+                continue
+            confidence = 0.6 if label_pattern is AMOUNT_LABELS[0] else 0.5
+            if match.re is MONEY_TL:
+                confidence += 0.2
+            if re.search(r'[.,]\d{2}$', match.group('value')):
+                confidence += 0.1
+            return _field(parse_number(match.group('value')), match.group(0), confidence, labelled=True)
+
+    # Etiket bulunamadı: sayfadaki en büyük TL değeri (eski sezgisel yöntem, düşük güven)
+    prices = [(parse_number(m.group('value')), m.group(0)) for m in MONEY_TL.finditer(text)]
+    prices = [p for p in prices if p[0] > MIN_GUESS_AMOUNT]
+    if prices:
+        value, raw = max(prices)
+        return _field(value, raw, 0.4, labelled=False)
+    return None
+
+
+def _consumption(text):
+    match = CONSUMPTION.search(text)
+    if not match:
+        return None
+    confidence = 0.5
+    if match.group('unit') or 'M3' in match.group('gap'):
+        confidence += 0.1
+    return _field(parse_number(match.group('value')), match.group(0), confidence)
+
+
+def _days(text):
+    match = DAYS.search(text)
+    if not match:
+        return None
+    value = int(match.group('value'))
+    return _field(value, match.group(0), 0.7 if 1 <= value <= 62 else 0.2)
+
+
+def _daily(text):
+    match = DAILY.search(text)
+    if not match:
+        return None
+    if match.group('value'):
+        return _field(parse_number(match.group('value')), match.group(0), 0.5)
+    return _field(parse_number(match.group('spaced')), match.group(0), 0.3)
+
+
+def _due_date(text):
+    # Tarih etiketle aynı satırda veya altındaki satırda (tutarın yanında) olabilir
+    for label in DUE_DATE_LABEL.finditer(text):
+        for match in DATE.finditer(text[label.end():label.end() + AMOUNT_WINDOW]):
+            try:
+                value = datetime.date(int(match.group('year')), int(match.group('month')), int(match.group('day')))
+            except ValueError:
+                continue # 18/13/2025 gibi OCR hataları
+            return _field(value.isoformat(), match.group(0), 0.8)
+    return None
+
+
+def _cross_check(fields):
+    """Tüketim ≈ günlük ortalama x gün sayısı ise üç alan da birbirini doğrular."""
+    consumption, daily, days = fields['consumption'], fields['daily'], fields['days']
+    if not (consumption and daily and days):
+        return
+    expected = daily['value'] * days['value']
+    if abs(expected - consumption['value']) <= max(0.1 * consumption['value'], 1):
+        consumption['confidence'] = 0.95
+        daily['confidence'] = days['confidence'] = 0.9
+
+
+def extract(text):
+    """
+    OCR metninden fatura alanlarını çıkarır.
+
+    Returns:
+        dict: amount (TL), consumption (m³), days, daily (m³/gün), due_date (ISO tarih metni); her biri
+              {'value', 'raw', 'confidence'} veya None. amount ayrıca 'labelled' içerir
+              (False: etiket bulunamadı, en büyük TL değeri tahmin edildi).
+    """
+    text = normalize(text or '')
+    fields = {
+        'amount': _amount(text),
+        'consumption': _consumption(text),
+        'days': _days(text),
+        'daily': _daily(text),
+        'due_date': _due_date(text),
+    }
+    _cross_check(fields)
+    return fields
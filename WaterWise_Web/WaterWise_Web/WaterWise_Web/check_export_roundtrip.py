@@ -0,0 +1,90 @@
+import datetime
+import os
+import random
+import sys
+import tempfile
+from flask import Flask
+from models import db, Consumption, DailyRollup
+from utils import calculate_water_usage, get_activity_label
+from rollups import apply_consumption, is_bill_record
+import export
+import import_history
+
+# Dışa aktarılan geçmişin (export.py) import_history.py ile boş bir veritabanına geri yüklendiğinde
+# aynı kayıtları ve aynı fatura / tüketim ayrımını verdiğini doğrular. Aktivitesi boş eski kayıtlar
+# (fatura bildirimi dahil) da veriye katılır.
+# Kullanım: python check_export_roundtrip.py [kayit_sayisi]
+
+TODAY = datetime.date(2025, 12, 20)
+ACTIVITIES = ['shower', 'tap', 'dishwasher_eco', 'garden', 'custom', 'bill']
+LEGACY = [('Fatura Bildirimi', 15000.0), ('Duş', 40.0)] # activity_type / amount boş eski kayıtlar
+
+
+def make_records(count):
+    rng = random.Random(25)
+    records = []
+    for _ in range(count):
+        day = (TODAY - datetime.timedelta(days=rng.randrange(60))).isoformat()
+        uid = rng.choice([None, 1, 2])
+        if rng.random() < 0.1:
+            category, liters = rng.choice(LEGACY)
+            records.append(Consumption(date=day, category=category, liters=liters, user_id=uid))
+            continue
+        activity = rng.choice(ACTIVITIES)
+        amount = round(rng.uniform(0.5, 20), 1)
+        records.append(Consumption(date=day, category=get_activity_label(activity), activity_type=activity,
+                                   amount=amount, liters=calculate_water_usage(activity, amount), user_id=uid))
+    return records
+
+
+def snapshot():
+    """Kayıtlar (kullanıcı, gün, fatura mı, litre) ve rollup'lar (kullanıcı, gün, fatura mı) -> (litre, kayıt)"""
+    records = sorted((str(r.user_id), r.day, is_bill_record(r.activity_type, r.category), round(r.liters, 6))
+                     for r in Consumption.query)
+    rollups = {}
+    for r in DailyRollup.query:
+        key = (str(r.user_id), r.day, r.is_bill)
+        liters, entries = rollups.get(key, (0.0, 0))
+        rollups[key] = (round(liters + r.liters, 6), entries + r.entries)
+    return records, rollups
+
+
+def main(count=2000):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        with app.app_context():
+            db.create_all()
+            for record in make_records(count):
+                db.session.add(record)
+                apply_consumption(record)
+            db.session.commit()
+            before = snapshot()
+
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(export.export_chunks('csv', export.ALL_USERS))
+            Consumption.query.delete()
+            DailyRollup.query.delete()
+            db.session.commit()
+
+            import_history.main(path)
+            after = snapshot()
+    finally:
+        os.remove(path)
+
+    failures = 0
+    for name, old, new in (('kayıt', before[0], after[0]), ('rollup', before[1], after[1])):
+        if old != new:
+            failures += 1
+            print(f"FARK ({name}): önce {len(old)}, sonra {len(new)}")
+    legacy_bills = sum(1 for r in before[0] if r[2] and r[3] == LEGACY[0][1])
+    print(f"{count} kayıt ({legacy_bills} eski fatura kaydı) dışa / içe aktarıldı, {failures} uyumsuzluk.")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000) else 0)
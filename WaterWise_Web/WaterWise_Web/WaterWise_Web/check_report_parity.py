@@ -0,0 +1,142 @@
+import datetime
+import math
+import random
+import sys
+try:
+    import pandas as pd
+except ImportError:
+    sys.exit("Bu kontrol referans için pandas gerektirir: pip install -r requirements-dev.txt")
+from flask import Flask
+from models import db, Consumption
+from rollups import rebuild_rollups
+from reports import build_report, get_source
+import timeseries
+
+# Rapor motorlarının (rollup ve ham Consumption GROUP BY) ve pandas'sız timeseries modülünün
+# eski pandas implementasyonuyla aynı grafik verisini ürettiğini rastgele veri üzerinde doğrular.
+# pandas sadece referans için gerekir: pip install -r requirements-dev.txt
+# Kullanım: python check_report_parity.py [tur_sayisi]
+
+CATEGORIES = [
+    ('shower', 'Duş'), ('tap', 'Musluk Kullanımı'), ('garden', 'Bahçe Sulama'),
+    ('custom', 'Diğer (Manuel)'), ('bill', 'Fatura Bildirimi'), (None, 'Fatura Bildirimi'), (None, 'Duş'),
+]
+
+
+def legacy_report(records, period, target, today):
+    """Eski /api/report_data pandas implementasyonu (referans)."""
+    df = pd.DataFrame(records)
+    df['date'] = pd.to_datetime(df['date'])
+    today = pd.Timestamp(today)
+
+    if period == 'monthly':
+        start_date = today - pd.DateOffset(months=11)
+        full_idx = pd.date_range(start=start_date, end=today, freq='MS')
+        filtered_df = df[df['date'] >= start_date]
+        trend_labels = full_idx.strftime('%Y-%m').tolist()
+        trend_target = target * 30
+    elif period == 'weekly':
+        start_date = today - pd.DateOffset(weeks=11)
+        full_idx = pd.date_range(start=start_date, end=today, freq='W-MON')
+        filtered_df = df[df['date'] >= start_date]
+        trend_labels = full_idx.strftime('Hafta %U').tolist()
+        trend_target = target * 7
+    else:
+        start_date = today - pd.DateOffset(days=29)
+        full_idx = pd.date_range(start=start_date, end=today, freq='D')
+        filtered_df = df[df['date'] >= (start_date - pd.Timedelta(days=1))]
+        trend_labels = full_idx.strftime('%Y-%m-%d').tolist()
+        trend_target = target
+
+    chart_df = filtered_df[filtered_df['activity_type'] != 'bill']
+    chart_df = chart_df[chart_df['category'] != 'Fatura Bildirimi']
+
+    if period == 'monthly':
+        grp = chart_df.set_index('date').resample('MS')['liters'].sum()
+    elif period == 'weekly':
+        grp = chart_df.set_index('date').resample('W-MON')['liters'].sum()
+    else:
+        grp = chart_df.groupby(chart_df['date'].dt.normalize())['liters'].sum()
+    trend_data = grp.reindex(full_idx, fill_value=0).values.tolist()
+
+    category_totals = chart_df.groupby('category')['liters'].sum()
+    return {
+        "daily_trend": {"labels": trend_labels, "data": trend_data, "target": trend_target},
+        "category_pie": {"labels": category_totals.index.tolist(), "data": category_totals.values.tolist()},
+    }
+
+
+def _close(a, b):
+    return len(a) == len(b) and all(math.isclose(x, y, rel_tol=1e-9, abs_tol=1e-6) for x, y in zip(a, b))
+
+
+def compare(expected, actual):
+    e_trend, a_trend = expected['daily_trend'], actual['daily_trend']
+    e_pie, a_pie = expected['category_pie'], actual['category_pie']
+    return (e_trend['labels'] == a_trend['labels']
+            and _close(e_trend['data'], a_trend['data'])
+            and e_trend['target'] == a_trend['target']
+            and e_pie['labels'] == a_pie['labels']
+            and _close(e_pie['data'], a_pie['data']))
+
+
+def random_records(rng, today, count):
+    records = []
+    for _ in range(count):
+        activity, category = rng.choice(CATEGORIES)
+        day = today + datetime.timedelta(days=rng.randint(-500, 3))
+        records.append({
+            'date': day.isoformat(),
+            'category': category,
+            'liters': round(rng.uniform(0.5, 400), 2),
+            'activity_type': activity,
+            'user_id': rng.choice([None, 1, 2]),
+        })
+    return records
+
+
+def main(rounds=25):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    rng = random.Random(2025)
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        for i in range(rounds):
+            # Ay sonu kırpmalarını ve hafta başlarını da yakalamak için rastgele bir "bugün"
+            today = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 730))
+            records = random_records(rng, today, rng.randint(1, 400))
+
+            Consumption.query.delete()
+            db.session.add_all(Consumption(**r) for r in records)
+            db.session.commit()
+            rebuild_rollups()
+
+            for uid in (None, 1, 2):
+                user_records = [r for r in records if r['user_id'] == uid]
+                for period in ('daily', 'weekly', 'monthly'):
+                    for source in ('rollup', 'consumption'):
+                        actual = build_report(uid, period, 150.0, today, get_source(source))
+                        if not user_records:
+                            ok = actual == {"daily_trend": {}, "category_pie": {}}
+                        else:
+                            ok = compare(legacy_report(user_records, period, 150.0, today), actual)
+                        if not ok:
+                            failures += 1
+                            print(f"FARK: tur={i} today={today} uid={uid} period={period} source={source}")
+
+                    if user_records:
+                        columns = [[r[k] for r in user_records] for k in ('date', 'category', 'liters', 'activity_type')]
+                        actual = timeseries.build_report(*columns, period, 150.0, today)
+                        if not compare(legacy_report(user_records, period, 150.0, today), actual):
+                            failures += 1
+                            print(f"FARK: tur={i} today={today} uid={uid} period={period} source=timeseries")
+
+    print(f"{rounds} tur tamamlandı, {failures} uyumsuzluk.")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 25) else 0)
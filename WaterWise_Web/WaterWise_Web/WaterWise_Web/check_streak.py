@@ -0,0 +1,93 @@
+import datetime
+import random
+import sys
+from flask import Flask
+from models import db, Consumption, Settings
+from rollups import apply_consumption, refresh_day, is_bill_record
+from streaks import current_streak, _get_state
+
+# Artımlı seri durumunun, ham Consumption kayıtlarından kaba kuvvetle hesaplanan
+# seriyle her yazma işleminden sonra aynı kaldığını rastgele işlem dizileriyle doğrular.
+# Kullanım: python check_streak.py [islem_sayisi]
+
+TODAY = datetime.date(2025, 12, 20)
+ACTIVITIES = [('shower', 'Duş'), ('tap', 'Musluk Kullanımı'), ('bill', 'Fatura Bildirimi')]
+
+
+def reference_streak(uid, target, today):
+    """Tüm kayıtları Python'da günlere toplayıp bugünden geriye sayar."""
+    totals = {}
+    for r in Consumption.query.filter_by(user_id=uid):
+        if not is_bill_record(r.activity_type, r.category):
+            totals[r.day] = totals.get(r.day, 0.0) + r.liters
+
+    day = today
+    if day in totals:
+        if totals[day] > target:
+            return 0
+    else:
+        day -= datetime.timedelta(days=1)
+
+    count = 0
+    while day in totals and totals[day] <= target:
+        count += 1
+        day -= datetime.timedelta(days=1)
+    return count
+
+
+def random_operation(rng, uid):
+    op = rng.random()
+    if op < 0.6:
+        activity, category = rng.choice(ACTIVITIES)
+        day = TODAY - datetime.timedelta(days=rng.choice([0, 0, 1, 2, 3] + list(range(60))))
+        record = Consumption(date=day.isoformat(), category=category, activity_type=activity,
+                             liters=rng.choice([5, 10, 20, 30, 400]), amount=1, user_id=uid)
+        db.session.add(record)
+        apply_consumption(record)
+        return f"ekle {day} {record.liters}"
+    if op < 0.9:
+        record = Consumption.query.filter_by(user_id=uid).order_by(db.func.random()).first()
+        if record is None:
+            return "sil (boş)"
+        apply_consumption(record, sign=-1)
+        db.session.delete(record)
+        return f"sil {record.day}"
+    if op < 0.97:
+        day = TODAY - datetime.timedelta(days=rng.randint(0, 10))
+        Consumption.query.filter_by(user_id=uid, day=day).delete()
+        refresh_day(uid, day)
+        return f"sıfırla {day}"
+    Settings.set_value('daily_target', rng.choice([100, 150, 250]), user_id=uid)
+    return "hedef değişti"
+
+
+def main(operations=2000):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    rng = random.Random(8)
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        for i in range(operations):
+            uid = rng.choice([None, 1, 2])
+            description = random_operation(rng, uid)
+            db.session.commit()
+
+            for check_uid in (None, 1, 2):
+                state = _get_state(check_uid)
+                target = float(Settings.get_value('daily_target', 150, user_id=check_uid))
+                expected = reference_streak(check_uid, target, TODAY)
+                actual = current_streak(check_uid, TODAY)
+                if actual != expected:
+                    failures += 1
+                    print(f"FARK: adım={i} ({description}) uid={check_uid} beklenen={expected} "
+                          f"artımlı={actual} durum={state and (state.anchor_day, state.length)}")
+
+    print(f"{operations} işlem tamamlandı, {failures} uyumsuzluk.")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000) else 0)
@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import tariffs
+from utils import calculate_iski_bill, solve_usage_from_price
+from tariff_batch import calculate_iski_bills
+
+# 1. tariff_batch.calculate_iski_bills'in calculate_iski_bill ile her alanda birebir aynı sonucu verdiğini
+#    (0.01 m3 ızgarası ve rastgele tüketimler, karışık kullanıcı tipleri, manuel fiyatlar) doğrular.
+# 2. solve_usage_from_price'ın calculate_iski_bill'in tam tersi olduğunu doğrular:
+# 0.01 m3 aralıklı her tüketim için fatura tutarı hesaplanır, tutardan tüketim çözülür ve çözülen tüketimin
+#    faturası aynı tutarı vermelidir. İndirim bloklarında tutar iki tüketime denk gelebildiği için tüketimin
+#    kendisi değil tutar karşılaştırılır; tam m3 tüketimler ayrıca birebir geri bulunmalıdır.
+#    Rastgele (faturada görülmemiş) tutarlarda çözüm, 0.01 m3 yuvarlamasının getirdiği fark kadar yakın olmalıdır.
+# 3. static/app.js'teki tarayıcı hesabının (/api/tariff_curve verisiyle) sunucuyla aynı fatura ve tüketimi verdiğini
+#    doğrular; Node.js gerekir, yoksa atlanır.
+# Kullanım: python check_tariff.py [en_fazla_m3]
+
+USER_TYPES = ('residential', 'student')
+RANDOM_PRICES = 20000
+BATCH_USER_TYPES = ('residential', 'student', 'disabled', 'martyr', 'unknown')
+MANUAL_RATES = (None, {'water_tier1': 40.0, 'waste_tier1': 20.5})
+
+
+def check_batch(max_m3, rng, manual_rates):
+    """Toplu ve skaler hesap arasında farklı çıkan (tüketim, tip, alan) listesi."""
+    usages = [hundredths / 100 for hundredths in range(int(max_m3 * 100) + 1)]
+    usages += [rng.uniform(0, max_m3) for _ in range(RANDOM_PRICES)]
+    user_types = [rng.choice(BATCH_USER_TYPES) for _ in usages]
+    batch = calculate_iski_bills(usages, user_types, manual_rates)
+    mismatches = []
+    for index, (usage, user_type) in enumerate(zip(usages, user_types)):
+        scalar = calculate_iski_bill(usage, user_type, manual_rates)
+        mismatches.extend((usage, user_type, field) for field in batch if batch[field][index] != scalar[field])
+    return mismatches
+
+
+def check(user_type, max_m3):
+    mismatches = []
+    for hundredths in range(int(max_m3 * 100) + 1):
+        usage = hundredths / 100
+        price = calculate_iski_bill(usage, user_type)['total']
+        solved = solve_usage_from_price(price, user_type)
+        if calculate_iski_bill(solved, user_type)['total'] != price:
+            mismatches.append((usage, price, solved))
+        elif usage.is_integer() and solved != usage:
+            mismatches.append((usage, price, solved))
+    return mismatches
+
+
+def check_random(user_type, max_m3, rng):
+    """Rastgele tutar -> tüketim -> tutar farkı, en pahalı kademede 0.005 m3'ün fiyatını aşmamalı."""
+    max_price = calculate_iski_bill(max_m3, user_type)['total']
+    slope = calculate_iski_bill(max_m3 + 1, user_type)['total'] - max_price
+    mismatches = []
+    for _ in range(RANDOM_PRICES):
+        price = round(rng.uniform(0, max_price), 2)
+        solved = solve_usage_from_price(price, user_type)
+        if abs(calculate_iski_bill(solved, user_type)['total'] - price) > slope * 0.005 + 0.01:
+            mismatches.append((None, price, solved))
+    return mismatches
+
+
+# app.js'ten tarife fonksiyonlarını alıp verilen durumlarda çalıştırır; farklı çıkanları yazdırır
+JS_HARNESS = """
+const fs = require('fs');
+const src = fs.readFileSync(process.argv[2], 'utf8');
+eval(src.slice(src.indexOf('function yuvarla2'), src.indexOf('// === Fatura Tutarından Tüketim Bul')));
+const data = JSON.parse(fs.readFileSync(process.argv[3], 'utf8'));
+const mismatches = [];
+for (const c of data.cases) {
+    c.usages.forEach((u, i) => {
+        const bill = tarifeFatura(data.curve, u, c.user_type);
+        for (const key of Object.keys(c.bills[i])) if (bill[key] !== c.bills[i][key]) mismatches.push([u, c.user_type, key]);
+    });
+    c.prices.forEach((p, i) => {
+        if (tarifeTuketim(data.curve, p, c.user_type) !== c.solved[i]) mismatches.push([p, c.user_type, 'usage']);
+    });
+}
+console.log(JSON.stringify(mismatches));
+"""
+
+
+def check_client(max_m3, rng):
+    """app.js tarife hesabı ile sunucu arasında farklı çıkan (değer, tip, alan) listesi; Node yoksa None."""
+    node = shutil.which('node')
+    if node is None:
+        return None
+    usages = [hundredths / 100 for hundredths in range(int(max_m3 * 100) + 1)]
+    max_price = calculate_iski_bill(max_m3)['total']
+    prices = [round(rng.uniform(0, max_price), 2) for _ in range(RANDOM_PRICES)]
+    cases = [{'user_type': user_type, 'usages': usages, 'bills': [calculate_iski_bill(u, user_type) for u in usages],
+              'prices': prices, 'solved': [solve_usage_from_price(p, user_type) for p in prices]}
+             for user_type in BATCH_USER_TYPES]
+    app_js = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'app.js')
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path, harness_path = os.path.join(tmp, 'cases.json'), os.path.join(tmp, 'harness.js')
+        with open(data_path, 'w', encoding='utf-8') as f:
+            json.dump({'curve': tariffs.get_schedule().curve(), 'cases': cases}, f)
+        with open(harness_path, 'w', encoding='utf-8') as f:
+            f.write(JS_HARNESS)
+        output = subprocess.run([node, harness_path, app_js, data_path], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+if __name__ == '__main__':
+    max_m3 = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    failed = False
+    for manual_rates in MANUAL_RATES:
+        mismatches = check_batch(max_m3, random.Random(0), manual_rates)
+        print(f"toplu hesap  0-{max_m3:g} m3{' (manuel fiyat)' if manual_rates else ''}: {len(mismatches)} uyuşmazlık")
+        for usage, user_type, field in mismatches[:10]:
+            print(f"    {usage} m3 {user_type} {field}")
+        failed = failed or bool(mismatches)
+    for user_type in USER_TYPES:
+        mismatches = check(user_type, max_m3) + check_random(user_type, max_m3, random.Random(user_type))
+        print(f"{user_type:12s} 0-{max_m3:g} m3: {len(mismatches)} uyuşmazlık")
+        for usage, price, solved in mismatches[:10]:
+            print(f"    {usage} m3 -> {price} TL -> {solved} m3")
+        failed = failed or bool(mismatches)
+    mismatches = check_client(max_m3, random.Random(1))
+    if mismatches is None:
+        print("tarayıcı hesabı: Node.js bulunamadı, atlandı")
+    else:
+        print(f"tarayıcı hesabı 0-{max_m3:g} m3: {len(mismatches)} uyuşmazlık")
+        for value, user_type, field in mismatches[:10]:
+            print(f"    {value} {user_type} {field}")
+        failed = failed or bool(mismatches)
+    sys.exit(1 if failed else 0)
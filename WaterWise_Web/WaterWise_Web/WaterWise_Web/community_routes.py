@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User, Post 
+from response_cache import cached_response, bump_version, user_scope, COMMUNITY_SCOPE
 import datetime
 
 # --- Blueprint tanımı ---
@@ -10,6 +11,7 @@ community = Blueprint("community", __name__, template_folder="templates")
 # === Topluluk ana sayfası (feed) ===
 @community.route('/feed')
 @login_required
+@cached_response(COMMUNITY_SCOPE)
 def feed():
     posts = Post.query.order_by(Post.timestamp.desc()).all()
     return render_template('feed.html', posts=posts)
@@ -31,6 +33,7 @@ def create_post():
     )
     db.session.add(new_post)
     db.session.commit()
+    bump_version(COMMUNITY_SCOPE, user_scope(current_user.id))
     flash("Gönderi paylaşıldı!", "success")
     return redirect(url_for('community.feed'))
 
@@ -51,6 +54,7 @@ def post_tip():
     )
     db.session.add(new_post)
     db.session.commit()
+    bump_version(COMMUNITY_SCOPE, user_scope(current_user.id))
     flash("İpucu paylaşıldı!", "success")
     return redirect(url_for('community.feed'))
 
@@ -62,6 +66,7 @@ def like_post(post_id):
     if post:
         post.likes = (post.likes or 0) + 1
         db.session.commit()
+        bump_version(COMMUNITY_SCOPE, user_scope(current_user.id))
     return redirect(url_for('community.feed'))
 
 # === Profil sayfası ===
@@ -95,6 +100,8 @@ def profile():
             flash("Profil bilgileri güncellendi!", "success")
 
         db.session.commit()
+        # Kullanıcı adı akıştaki gönderilerde de görünür
+        bump_version(COMMUNITY_SCOPE, user_scope(current_user.id))
         return redirect(url_for('community.profile'))
 
     posts = Post.query.filter_by(user_id=current_user.id).order_by(Post.timestamp.desc()).all()
@@ -120,6 +127,7 @@ def register():
         new_user = User(username=username, email=email, password=hashed_pw)
         db.session.add(new_user)
         db.session.commit()
+        bump_version(user_scope(new_user.id))
         flash("Kayıt başarılı! Giriş yapabilirsin.", "success")
         return redirect(url_for('community.login'))
 
@@ -1,12 +1,11 @@
-
 import cv2
-import pytesseract
-import numpy as np
 import os
-import re
+import sys
+import ocr
 
-# Set Tesseract path as in app.py
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Uygulamanın kullandığı ön işleme hattını (ocr.preprocess) bir görüntü üzerinde çalıştırır;
+# aşama sürelerini yazdırır, ön işlenmiş görüntüyü ve OCR / ayrıştırma sonucunu dosyaya kaydeder.
+# Kullanım: python debug_ocr.py <görüntü_yolu>
 
 def debug_ocr(image_path):
     if not os.path.exists(image_path):
@@ -14,37 +13,41 @@ def debug_ocr(image_path):
         return
 
     print(f"Processing: {image_path}")
-    
-    # Load image
-    img = cv2.imread(image_path)
-    if img is None:
-        print("Error: Could not read image.")
-        return
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+
+    print(f"Header size: {ocr.image_size(image_bytes)}")
+
+    # Preprocessing (same pipeline as app.py)
+    timings = {}
+    text_img = ocr.preprocess(image_bytes, timings)
+    cv2.imwrite('ocr_preprocessed.png', text_img)
+    print(f"Preprocessed size: {text_img.shape[1]}x{text_img.shape[0]} -> ocr_preprocessed.png")
+
+    # Run Tesseract + bill_parser
+    text = ocr.recognize(text_img, timings=timings)
+    parsed = ocr.parse_bill_text(text)
+
+    print("--- Stage timings (ms) ---")
+    for stage, ms in timings.items():
+        print(f"  {stage:10s} {ms:8.1f}")
 
-    # Preprocessing (Match app.py logic)
-    img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    text_img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-    
-    # Run Tesseract
-    text = pytesseract.image_to_string(text_img, lang='eng', config='--oem 3 --psm 6')
-    
     with open('ocr_result.txt', 'w', encoding='utf-8') as f:
         f.write("--- RAW OCR OUTPUT ---\n")
         f.write(text)
         f.write("\n----------------------\n")
-        
-        # Test Final Regex (Match app.py)
-        pattern_price = r'(?:[OÖoö]denece[kr]|[Tt]oplam|[Gg]enel).*?(?:Tu|Tutar)?.*?(\d+[.,]?\d*)'
-        match = re.search(pattern_price, text, re.IGNORECASE | re.DOTALL)
-        
-        if match:
-            f.write(f"SUCCESS: Regex matched Price: {match.group(1)}\n")
-        else:
-            f.write("FAILURE: Regex did NOT match Price.\n")
+
+        for name, field in parsed['fields'].items():
+            if field:
+                f.write(f"{name:12s} {field['value']!s:>10}  conf={field['confidence']:.2f}  raw={field['raw']!r}\n")
+            else:
+                f.write(f"{name:12s} {'-':>10}\n")
+        f.write(f"Result: {parsed['found_val']} m3 ({parsed['calculation_method']}, conf={parsed['confidence']:.2f})\n")
 
     print("OCR finished. Output saved to ocr_result.txt")
 
-# Path to the user uploaded image
-img_path = r'C:\Users\Mehmet\.gemini\antigravity\brain\99365229-8d25-4315-9ad4-ea11c90c43a2\uploaded_image_0_1766266419607.jpg'
-debug_ocr(img_path)
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Kullanım: python debug_ocr.py <görüntü_yolu>")
+        sys.exit(1)
+    debug_ocr(sys.argv[1])
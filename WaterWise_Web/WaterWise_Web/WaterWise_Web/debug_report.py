@@ -1,55 +1,52 @@
-
 from app import app, db, Consumption
-import pandas as pd
+import datetime
+import numpy as np
+import timeseries
 
 with app.app_context():
     all_data = Consumption.query.order_by(Consumption.date).all()
     print(f"Total Records: {len(all_data)}")
-    
+
     if not all_data:
         print("No data found.")
         exit()
 
-    data_list = [{'date': d.date, 'category': d.category, 'liters': d.liters} for d in all_data]
-    df = pd.DataFrame(data_list)
-    df['date'] = pd.to_datetime(df['date'])
-    
+    dates = [d.date for d in all_data]
+    categories = [d.category for d in all_data]
+    liters = np.array([d.liters for d in all_data], dtype=np.float64)
+    # Old data may have no activity_type; treat it as custom
+    activity_types = [d.activity_type or 'custom' for d in all_data]
+    days = timeseries.to_day_numbers(dates)
+
     print("\n--- Raw Data Head ---")
-    print(df.head())
-    print("\n--- Data Types ---")
-    print(df.dtypes)
-    
-    today = pd.Timestamp.now().normalize()
-    print(f"\nToday (Normalized): {today}")
-    
+    for row in all_data[:5]:
+        print(f"{row.date[:10]}  {row.category:25s} {row.liters:10.2f}  {row.activity_type}")
+
+    today = datetime.date.today()
+    print(f"\nToday: {today}")
+
     # Test Bill Filtering Logic
     print("\n--- Filtering Bills ---")
     # Simulate app.py logic
-    # Ensure activity_type column exists and handle NaNs if necessary (though pandas usually handles it)
-    if 'activity_type' not in df.columns:
-        df['activity_type'] = 'custom' # Default for old data
-        
-    chart_df = df[df['activity_type'] != 'bill']
-    chart_df = chart_df[chart_df['category'] != 'Fatura Bildirimi']
-    
-    print(f"Chart Data Rows (No Bills): {len(chart_df)}")
-    if not chart_df.empty:
-        print(chart_df.head())
+    codes, labels = timeseries.factorize(categories)
+    is_bill = (np.asarray(activity_types, dtype=object) == 'bill') | (np.asarray(categories, dtype=object) == timeseries.BILL_CATEGORY)
+
+    print(f"Chart Data Rows (No Bills): {int((~is_bill).sum())}")
+    if not is_bill.all():
+        chart_labels, chart_totals = timeseries.category_sums(codes[~is_bill], labels, liters[~is_bill])
+        for label, total in zip(chart_labels, chart_totals):
+            print(f"  {label:25s} {total:10.2f}")
     else:
-        print("Chart DataFrame is EMPTY! This explains why graphs are zero.")
-        
-    bills_df = df[(df['activity_type'] == 'bill') | (df['category'] == 'Fatura Bildirimi')]
-    print(f"Bill Data Rows: {len(bills_df)}")
-    if not bills_df.empty:
-        print(bills_df.head())
+        print("Chart data is EMPTY! This explains why graphs are zero.")
+
+    print(f"Bill Data Rows: {int(is_bill.sum())}")
+    for row in [r for r, bill in zip(all_data, is_bill) if bill][:5]:
+        print(f"  {row.date[:10]}  {row.liters:10.2f}")
 
     # Test Reindexing (Daily)
-    end_date = today
-    start_date = end_date - pd.DateOffset(days=29)
-    full_idx = pd.date_range(start=start_date, end=end_date, freq='D')
-    
-    daily_grp = chart_df.groupby(chart_df['date'].dt.normalize())['liters'].sum()
-    daily_grp = daily_grp.reindex(full_idx, fill_value=0)
-    
+    buckets = [today - datetime.timedelta(days=i) for i in range(29, -1, -1)]
+    daily = timeseries.bucket_sums(days[~is_bill], liters[~is_bill], buckets, 'daily')
+
     print("\n--- Processed Trend Data (Last 5 days) ---")
-    print(daily_grp.tail())
+    for day, total in list(zip(buckets, daily))[-5:]:
+        print(f"{day}  {total:10.2f}")
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from models import db, Consumption
+
+# Tüketim geçmişinin akış halinde dışa aktarımı (CSV / NDJSON).
+# Tablo id üzerinden keyset sayfalamayla okunur (id > son id, LIMIT sayfa); OFFSET kullanılmadığı için her sayfa
+# indeksten doğrudan bulunur ve bellek kullanımı toplam kayıt sayısından bağımsızdır. Satırlar id sırasıyla
+# yazıldığı için yarım kalan bir aktarım son alınan id'den (after_id) devam ettirilebilir; devam eden CSV aktarımı
+# mevcut dosyanın sonuna eklenebilsin diye başlık satırı tekrar yazılmaz.
+# Çıktı import_history.py ile tekrar içe aktarılabilir.
+
+EXPORT_FIELDS = ('id', 'date', 'activity_type', 'amount', 'liters', 'category')
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+PAGE_SIZE = 1000
+ALL_USERS = object() # user_id yerine verilirse tüm kullanıcılar (user_id sütunuyla) aktarılır
+
+
+def export_fields(user_id):
+    return EXPORT_FIELDS + ('user_id',) if user_id is ALL_USERS else EXPORT_FIELDS
+
+
+def iter_rows(user_id, after_id=0, page_size=PAGE_SIZE):
+    """Kullanıcının (None = anonim) kayıtlarını id sırasıyla sayfa sayfa üretir; her satır export_fields sırasındadır."""
+    columns = [getattr(Consumption, field) for field in export_fields(user_id)]
+    query = db.session.query(*columns)
+    if user_id is not ALL_USERS:
+        query = query.filter(Consumption.user_id.is_(None) if user_id is None else Consumption.user_id == user_id)
+
+    while True:
+        page = query.filter(Consumption.id > after_id).order_by(Consumption.id).limit(page_size).all()
+        if not page:
+            return
+        yield from page
+        after_id = page[-1][0]
+
+
+def csv_chunks(rows, fields, rows_per_chunk=PAGE_SIZE, header=True):
+    """Satırları CSV metin parçaları olarak üretir."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(fields)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, fields, rows_per_chunk=PAGE_SIZE):
+    """Satırları NDJSON (satır başına bir JSON nesnesi) metin parçaları olarak üretir."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(fields, row)), ensure_ascii=False))
+        if len(lines) == rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_chunks(fmt, user_id, after_id=0):
+    """fmt ('csv' / 'ndjson') biçiminde dışa aktarım parçaları."""
+    fields = export_fields(user_id)
+    rows = iter_rows(user_id, after_id)
+    if fmt == 'csv':
+        return csv_chunks(rows, fields, header=not after_id)
+    return ndjson_chunks(rows, fields)
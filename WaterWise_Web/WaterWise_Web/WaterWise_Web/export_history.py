@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+from app import app
+import export
+
+# Tüketim geçmişini (varsayılan tüm kullanıcılar, user_id sütunuyla) CSV / NDJSON dosyasına akış halinde yazar.
+# Bellek kullanımı kayıt sayısından bağımsızdır (bkz. export.py). Dosya zaten varsa içindeki son id'den devam edilir
+# ve yeni kayıtlar sona eklenir; yarım kalan veya eskiyen bir aktarım aynı komutla tamamlanır.
+# Çıktı import_history.py ile başka bir veritabanına aktarılabilir.
+# Kullanım: python export_history.py dosya.csv|dosya.ndjson [--user-id N]
+
+
+def last_exported_id(path):
+    """Var olan çıktı dosyasındaki son kaydın id'si (dosya sonundan okunur); dosya yok / boşsa 0, okunamazsa None."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    with open(path, 'rb') as f:
+        f.seek(max(0, os.path.getsize(path) - 64 * 1024))
+        tail = f.read()
+    if not tail.endswith(b'\n'):
+        return None # son satır yarım yazılmış (aktarım kesildi)
+    last = tail.splitlines()[-1].decode('utf-8', 'replace')
+    if path.lower().endswith('.csv'):
+        value = last.split(',', 1)[0]
+        if value == 'id':
+            return 0 # yalnızca başlık satırı
+    else:
+        try:
+            value = str(json.loads(last)['id'])
+        except (ValueError, KeyError, TypeError):
+            return None
+    return int(value) if value.isdigit() else None
+
+
+def main(path, user_id=export.ALL_USERS):
+    fmt = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    after_id = last_exported_id(path)
+    if after_id is None:
+        print(f"HATA: {path} son satırı okunamadı (yarım kalmış olabilir); son satırı silip tekrar çalıştırın.")
+        return False
+    if after_id:
+        print(f"{path} içinde son id {after_id}, devam ediliyor.")
+
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        for chunk in export.export_chunks(fmt, user_id, after_id):
+            f.write(chunk)
+    print(f"Tamamlandı: {path} (son id: {last_exported_id(path)})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tüketim geçmişini CSV / NDJSON olarak dışa aktarır.")
+    parser.add_argument('path')
+    parser.add_argument('--user-id', type=int, default=None,
+                        help="Yalnızca bu kullanıcının kayıtları (varsayılan: tüm kullanıcılar)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        ok = main(args.path, export.ALL_USERS if args.user_id is None else args.user_id)
+    raise SystemExit(0 if ok else 1)
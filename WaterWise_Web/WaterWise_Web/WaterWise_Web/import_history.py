@@ -0,0 +1,142 @@
+import argparse
+import csv
+import hashlib
+import itertools
+from models import db, ImportProgress
+from ingest import IngestRejected, ingest_entries, parse_ndjson
+from rollups import BILL_CATEGORY
+
+# CSV / NDJSON tüketim geçmişini (/api/export, export_history.py veya başka bir uygulamanın çıktısı)
+# parça parça içe aktarır. Dosya satır satır okunur; bellek kullanımı dosya boyutundan bağımsızdır.
+# Her parça (varsayılan 1000 kayıt) tek transaction'da eklenir (bkz. ingest.py) ve commit edilir; dosyada ne kadar
+# ilerlendiği aynı transaction'da import_progress tablosuna yazılır. Kesilen bir aktarım aynı komutla tekrar
+# çalıştırılınca commit edilmiş kayıtları atlayıp kaldığı yerden devam eder, kayıtlar iki kez eklenmez.
+# Aktarım tamamlanınca ilerleme kaydı silinir; aynı dosyayı tekrar çalıştırmak kayıtları yeniden ekler.
+# Hatalı kayıt bulunan parça eklenmez; hatalar satır numarasıyla yazılır, düzeltip tekrar çalıştırın.
+# Litreler aktivite ve miktardan güncel katsayılarla yeniden hesaplanır. Aktivitesi boş eski kayıtlar litreyle
+# eklenir; kategorisi 'Fatura Bildirimi' olanlar fatura kaydı olarak kalır.
+# Kullanım: python import_history.py dosya.csv|dosya.ndjson [--user-id N] [--batch 1000] [--restart]
+
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def read_records(path):
+    """Dosyadaki kayıtları sırayla üretir (uzantı .csv ise CSV, değilse NDJSON)."""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, 'rb') as f:
+            yield from parse_ndjson(f)
+
+
+def to_entry(record):
+    """Dışa aktarım satırını (activity_type, amount, liters, date) ingest kaydına çevirir."""
+    if not isinstance(record, dict):
+        return record # doğrulamada hatalı kayıt olarak raporlanır
+    activity = record.get('activity') or record.get('activity_type')
+    amount = record.get('amount')
+    entry = {'date': record.get('date') or None}
+    if activity and amount not in (None, ''):
+        entry.update(activity=activity, amount=amount)
+    elif not activity and record.get('category') == BILL_CATEGORY:
+        # Eski fatura kayıtlarında activity_type boş; 'bill' katsayısı 1 olduğundan litre miktar olarak verilir
+        entry.update(activity='bill', amount=record.get('liters'))
+    else:
+        # Eski kayıtlarda aktivite / miktar olmayabilir; litre doğrudan alınır
+        entry['liters'] = record.get('liters')
+    return entry
+
+
+def record_user(record, default):
+    """Tüm kullanıcıların aktarımında (user_id sütunu) kaydın kullanıcısı, yoksa default."""
+    value = record.get('user_id') if isinstance(record, dict) else None
+    return default if value in (None, '') else int(value)
+
+
+def progress_key(path, user_id):
+    """Dosyanın başından (ve hedef kullanıcıdan) türetilen anahtar; dosya taşınsa da sonuna ekleme yapılsa da aynı kalır."""
+    digest = hashlib.sha1(str(user_id).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+def save_progress(key, path, done):
+    """İlerlemeyi commit ETMEDEN yazar; parçayla aynı transaction'da commit edilir."""
+    progress = db.session.get(ImportProgress, key)
+    if progress is None:
+        db.session.add(ImportProgress(key=key, path=path, done=done))
+    else:
+        progress.done = done
+
+
+def import_chunk(chunk, user_id, keep_users):
+    """Parçayı kullanıcılara göre gruplayıp ekler; hatalar dosyadaki kayıt sırasına (0'dan) göre döner."""
+    groups, errors, inserted = {}, [], 0
+    for position, record in chunk:
+        try:
+            uid = record_user(record, user_id) if keep_users else user_id
+        except ValueError:
+            errors.append((position, "Geçersiz user_id."))
+            continue
+        groups.setdefault(uid, []).append((position, to_entry(record)))
+
+    for uid, items in groups.items():
+        try:
+            count, _ = ingest_entries([entry for _, entry in items], uid)
+            inserted += count
+        except IngestRejected as e:
+            errors.extend((items[error['index']][0], error['message']) for error in e.errors)
+    return inserted, sorted(errors)
+
+
+def main(path, user_id=None, batch=1000, restart=False):
+    key = progress_key(path, user_id)
+    progress = db.session.get(ImportProgress, key)
+    done = progress.done if progress and not restart else 0
+    if done:
+        print(f"{done} kayıt daha önce aktarılmış, kaldığı yerden devam ediliyor.")
+
+    keep_users = user_id is None
+    records = itertools.islice(enumerate(read_records(path)), done, None)
+    total = 0
+    while True:
+        chunk = list(itertools.islice(records, batch))
+        if not chunk:
+            break
+        inserted, errors = import_chunk(chunk, user_id, keep_users)
+        if errors:
+            db.session.rollback()
+            for position, message in errors:
+                print(f"  kayıt {position + 1}: {message}")
+            print(f"HATA: {len(errors)} hatalı kayıt, {chunk[0][0] + 1}. kayıttan itibaren aktarım durdu "
+                  f"({total} kayıt eklendi). Düzeltip tekrar çalıştırın.")
+            return False
+        done = chunk[-1][0] + 1
+        save_progress(key, path, done)
+        db.session.commit()
+        total += inserted
+        print(f"{done} kayıt işlendi ({total} eklendi)")
+
+    progress = db.session.get(ImportProgress, key)
+    if progress is not None:
+        db.session.delete(progress)
+        db.session.commit()
+    print(f"Tamamlandı: {total} kayıt eklendi.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV / NDJSON tüketim geçmişini parça parça içe aktarır.")
+    parser.add_argument('path')
+    parser.add_argument('--user-id', type=int, default=None,
+                        help="Kayıtların ekleneceği kullanıcı (varsayılan: dosyadaki user_id sütunu, yoksa anonim)")
+    parser.add_argument('--batch', type=int, default=1000, help="Parça başına kayıt (her parça ayrı commit)")
+    parser.add_argument('--restart', action='store_true', help="Kayıtlı ilerlemeyi yok sayıp baştan aktar")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        ok = main(args.path, args.user_id, args.batch, args.restart)
+    raise SystemExit(0 if ok else 1)
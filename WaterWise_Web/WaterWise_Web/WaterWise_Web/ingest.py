@@ -0,0 +1,123 @@
+import datetime
+import json
+import math
+from models import db, Consumption
+from utils import calculate_water_usage, get_activity_label
+from rollups import apply_consumption_rows, parse_day
+
+# Toplu tüketim kaydı (akıllı sayaç, içe aktarma vb.).
+#   - Girdi: kayıt listesi veya NDJSON (satır başına bir JSON kaydı); kayıt /api/add ile aynı alanları taşır,
+#     ek olarak isteğe bağlı 'date' (YYYY-MM-DD, varsayılan bugün)
+#   - Doğrulama önce tüm kayıtlar için yapılır; tek bir hatalı kayıt varsa hiçbiri eklenmez
+#   - Litre katsayısı ve kategori etiketi her farklı aktivite için bir kez hesaplanır
+#   - Kayıtlar tek executemany INSERT ile, rollup'lar tek sorguyla (bkz. rollups.apply_consumption_rows) aynı
+#     transaction içinde güncellenir; seri ve önbellek dinleyicileri tek tek eklemedeki gibi commit'te çalışır
+
+MAX_REPORTED_ERRORS = 50
+ACTIVITY_MAX_LENGTH = Consumption.__table__.c.activity_type.type.length
+
+
+class IngestRejected(Exception):
+    """Toplu kayıt reddedildi; errors [{'index': i, 'message': ...}] listesidir, hiçbir kayıt eklenmez."""
+
+    def __init__(self, message, errors=(), status=400):
+        super().__init__(message)
+        self.message = message
+        self.errors = list(errors)[:MAX_REPORTED_ERRORS]
+        self.status = status
+
+
+def parse_ndjson(lines):
+    """NDJSON satırlarını (bytes veya str) kayıtlara çevirir; boş satırlar atlanır, bozuk satır None olur."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _normalize(entry, today):
+    """Tek kaydı (tarih, aktivite, miktar) üçlüsüne çevirir; geçersizse ValueError."""
+    if not isinstance(entry, dict):
+        raise ValueError("Kayıt bir JSON nesnesi olmalı.")
+
+    activity = entry.get('activity', 'custom')
+    amount = entry.get('amount', 0)
+    # Eski arayüz uyumluluğu: sadece "liters" geliyorsa
+    if 'liters' in entry and 'activity' not in entry:
+        activity, amount = 'custom', entry['liters']
+
+    if not isinstance(activity, str) or not activity or len(activity) > ACTIVITY_MAX_LENGTH:
+        raise ValueError("Geçersiz aktivite.")
+    if isinstance(amount, bool):
+        raise ValueError("Geçersiz miktar.")
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise ValueError("Geçersiz miktar.")
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError("Miktar sıfır veya pozitif bir sayı olmalı.")
+
+    day = today
+    if entry.get('date') is not None:
+        try:
+            day = parse_day(entry['date'])
+        except ValueError:
+            raise ValueError("Geçersiz tarih (YYYY-MM-DD bekleniyor).")
+    return day, activity, amount
+
+
+def validate_entries(entries, limit=None):
+    """
+    Tüm kayıtları doğrular ve normalleştirir.
+
+    Returns:
+        list: [(gün, aktivite, miktar), ...]
+    Raises:
+        IngestRejected: kayıt sayısı sınırı aşıldıysa (413) veya hatalı kayıt varsa (400)
+    """
+    today = datetime.date.today()
+    normalized, errors = [], []
+    for index, entry in enumerate(entries):
+        if limit is not None and index >= limit:
+            raise IngestRejected(f"Tek seferde en fazla {limit} kayıt eklenebilir.", status=413)
+        try:
+            normalized.append(_normalize(entry, today))
+        except ValueError as e:
+            errors.append({'index': index, 'message': str(e)})
+
+    if errors:
+        raise IngestRejected(f"{len(errors)} kayıt hatalı, hiçbir kayıt eklenmedi.", errors)
+    return normalized
+
+
+def ingest_entries(entries, user_id, limit=None):
+    """
+    Kayıtları doğrulayıp tek transaction'da ekler. Commit ETMEZ; çağıran commit eder.
+
+    Returns:
+        tuple: (eklenen kayıt sayısı, toplam litre)
+    """
+    normalized = validate_entries(entries, limit)
+    rates, labels = {}, {}
+    rows = []
+    for day, activity, amount in normalized:
+        if activity not in rates:
+            rates[activity] = calculate_water_usage(activity, 1)
+            labels[activity] = get_activity_label(activity)
+        rows.append({
+            'date': day.isoformat(),
+            'day': day,
+            'category': labels[activity],
+            'liters': amount * rates[activity],
+            'activity_type': activity,
+            'amount': amount,
+            'user_id': user_id,
+        })
+
+    if rows:
+        db.session.execute(db.insert(Consumption), rows)
+        apply_consumption_rows(rows)
+    return len(rows), sum(row['liters'] for row in rows)
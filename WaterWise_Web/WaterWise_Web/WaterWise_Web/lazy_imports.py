@@ -0,0 +1,62 @@
+import importlib
+import threading
+import time
+import types
+
+# Ağır kütüphaneler (cv2, pytesseract, numpy) modül içe aktarılırken değil, ilk kullanıldıklarında yüklenir.
+# Böylece migration / debug script'leri ve OCR yapmayan worker'lar bu maliyeti hiç ödemez.
+# warm_up() ile sunucu istek almaya başladıktan sonra arka planda önceden yüklenebilirler.
+
+
+class LazyModule(types.ModuleType):
+    """İlk attribute erişiminde gerçek modülü içe aktaran vekil modül."""
+
+    def __init__(self, name, on_load=None):
+        super().__init__(name)
+        self._lazy_name = name
+        self._lazy_on_load = on_load
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+
+    def _load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    module = importlib.import_module(self._lazy_name)
+                    if self._lazy_on_load:
+                        self._lazy_on_load(module)
+                    self._lazy_module = module
+        return self._lazy_module
+
+    @property
+    def is_loaded(self):
+        return self._lazy_module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    return LazyModule(name, on_load)
+
+
+def warm_up(*modules, delay=0.0):
+    """Verilen lazy modülleri daemon bir thread'de sırayla yükler; thread'i döndürür."""
+    def run():
+        if delay:
+            time.sleep(delay)
+        for module in modules:
+            t0 = time.perf_counter()
+            try:
+                module._load()
+                print(f"Ön yükleme: {module._lazy_name} ({time.perf_counter() - t0:.2f} sn)")
+            except ImportError as e:
+                print(f"Kütüphane Hatası: {e}")
+
+    thread = threading.Thread(target=run, name='heavy-import-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 import datetime
+import time
 
 # Veritabanı nesnesini burada oluşturuyoruz (Henüz app'e bağlı değil)
 db = SQLAlchemy()
@@ -23,10 +24,16 @@ class Post(db.Model):
     # Foreign Key
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
+def _day_from_date(context):
+    """day verilmemişse ISO metin tarihten (YYYY-MM-DD...) türetilir; toplu insert'lerde de çalışır."""
+    return datetime.date.fromisoformat(context.get_current_parameters()['date'][:10])
+
 # --- Su Tüketim Modeli (YENİ) ---
 class Consumption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.String(20), nullable=False) # ISO Format YYYY-MM-DD
+    # Tipli tarih: sorgular ve indeksler bunu kullanır (date metni geriye dönük uyumluluk için duruyor)
+    day = db.Column(db.Date, nullable=True, default=_day_from_date)
     category = db.Column(db.String(50), nullable=False)
     liters = db.Column(db.Float, nullable=False)
     # Yeni eklenen alanlar (Opsiyonel, geriye dönük uyumluluk için nullable)
@@ -36,22 +43,184 @@ class Consumption(db.Model):
     # İleride User ile ilişkilendirilebilir:
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
 
+    __table_args__ = (
+        # today_status, reset_today, summary ve rapor sorguları: kullanıcı + gün aralığı (+ fatura filtresi)
+        db.Index('ix_consumption_user_day_activity', 'user_id', 'day', 'activity_type'),
+        # Fatura geçmişi: kullanıcı + activity_type='bill', güne göre sıralı
+        db.Index('ix_consumption_user_activity_day', 'user_id', 'activity_type', 'day'),
+        # Dışa aktarma: kullanıcı + id > son id (keyset sayfalama, sıralama için geçici tablo gerekmez)
+        db.Index('ix_consumption_user_id', 'user_id', 'id'),
+    )
+
+# --- Günlük Özet (Rollup) Modeli ---
+# Kullanıcı / gün / kategori bazında önceden toplanmış tüketim.
+# Consumption'a yazan her endpoint aynı transaction içinde burayı da günceller (bkz. rollups.py).
+class DailyRollup(db.Model):
+    __tablename__ = 'daily_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    day = db.Column(db.Date, nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    is_bill = db.Column(db.Boolean, nullable=False, default=False)
+    liters = db.Column(db.Float, nullable=False, default=0.0)
+    entries = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_daily_rollup_user_day', 'user_id', 'day'),
+        # Anahtar başına tek satır; eşzamanlı ilk kayıtlar INSERT ... ON CONFLICT ile aynı satırda birleşir
+        # (bkz. rollups.py). SQLite'ta NULL'lar benzersizlikte birbirinden farklı sayıldığı için anonim kullanıcı
+        # (user_id NULL) 0 olarak indekslenir.
+        db.Index('ux_daily_rollup_key', db.func.coalesce(user_id, db.literal_column('0')), day, category, is_bill,
+                 unique=True),
+    )
+
+# --- Tasarruf Serisi Durumu ---
+# Kullanıcının en son aktif günü (anchor_day) ve o güne kadar kesintisiz hedef altında kalınan gün sayısı.
+# Tüketim değiştikçe streaks.py tarafından artımlı olarak güncellenir.
+class StreakState(db.Model):
+    __tablename__ = 'streak_state'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True, index=True)
+    anchor_day = db.Column(db.Date, nullable=True)
+    length = db.Column(db.Integer, nullable=False, default=0)
+    # Durumun hesaplandığı hedef; hedef değişirse durum yeniden oluşturulur
+    target = db.Column(db.Float, nullable=False)
+
 # --- Ayarlar Modeli (YENİ) ---
+# Ayar okumaları sıcak yolda (her istekte) yapıldığı için süreç içi önbellekten gelir.
+# Önbellek kullanıcı başına tüm ayarları tek sorguda yükler; set_value yazarken günceller (write-through).
+# TTL, başka bir worker'da yapılan değişikliklerin bu süreçte ne kadar gecikmeyle görüneceğini sınırlar.
+SETTINGS_CACHE_TTL = 60 # saniye
+_settings_cache = {} # {user_id (None = global): (yüklenme zamanı, {key: value})}
+
 class Settings(db.Model):
     key = db.Column(db.String(50), primary_key=True)
     value = db.Column(db.String(200), nullable=False)
 
     @staticmethod
-    def get_value(key, default=None):
-        setting = Settings.query.get(key)
-        return setting.value if setting else default
+    def load_all(user_id=None):
+        """Bir kullanıcının (veya user_id=None ise global) tüm ayarlarını tek sorguda önbelleğe alır."""
+        cached = _settings_cache.get(user_id)
+        if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL:
+            return cached[1]
+
+        if user_id is None:
+            rows = db.session.query(Settings.key, Settings.value).all()
+        else:
+            rows = db.session.query(UserSetting.key, UserSetting.value).filter_by(user_id=user_id).all()
+        values = dict(rows)
+        _settings_cache[user_id] = (time.monotonic(), values)
+        return values
+
+    @staticmethod
+    def get_all(user_id=None):
+        """Global ayarların üzerine kullanıcının kendi ayarları yazılmış birleşik sözlük."""
+        values = dict(Settings.load_all(None))
+        if user_id is not None:
+            values.update(Settings.load_all(user_id))
+        return values
 
     @staticmethod
-    def set_value(key, value):
-        setting = Settings.query.get(key)
+    def get_value(key, default=None, user_id=None):
+        # Önce kullanıcının kendi ayarı, yoksa global ayar, o da yoksa varsayılan
+        if user_id is not None:
+            user_values = Settings.load_all(user_id)
+            if key in user_values:
+                return user_values[key]
+        return Settings.load_all(None).get(key, default)
+
+    @staticmethod
+    def set_value(key, value, user_id=None):
+        model = Settings if user_id is None else UserSetting
+        ident = key if user_id is None else (user_id, key)
+        setting = db.session.get(model, ident)
         if not setting:
-            setting = Settings(key=key, value=str(value))
+            setting = Settings(key=key, value=str(value)) if user_id is None \
+                else UserSetting(user_id=user_id, key=key, value=str(value))
             db.session.add(setting)
         else:
             setting.value = str(value)
         db.session.commit()
+
+        # Write-through: önbellekteki kopya da güncellenir (yeni sözlük, okuyanlar etkilenmez)
+        values = dict(Settings.load_all(user_id))
+        values[key] = str(value)
+        _settings_cache[user_id] = (time.monotonic(), values)
+
+# --- Kullanıcıya Özel Ayarlar ---
+# Hedef gibi tercihler kullanıcı bazında saklanır; olmayan anahtarlar global Settings'ten okunur.
+class UserSetting(db.Model):
+    __tablename__ = 'user_setting'
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(200), nullable=False)
+
+# --- OCR Sonuç Önbelleği ---
+# Yüklenen görüntünün SHA-256 özetiyle adreslenir; aynı fotoğraf tekrar yüklendiğinde OCR çalışmaz (bkz. ocr_cache.py).
+class OcrCache(db.Model):
+    __tablename__ = 'ocr_cache'
+    key = db.Column(db.String(64), primary_key=True)
+    # Yakın kopyalar için algısal hash (opsiyonel)
+    phash = db.Column(db.String(64), nullable=True)
+    # Ön işleme / ayrıştırıcı sürümleri; ocr.py'deki sürümlerden farklıysa kayıt eskimiştir
+    ocr_version = db.Column(db.String(20), nullable=False)
+    parser_version = db.Column(db.String(20), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text, nullable=False) # parse_bill_text sonucu (JSON, metin hariç)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    last_used = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+
+# --- İçe Aktarma İlerlemesi ---
+# import_history.py'nin yarım kalan aktarımları: dosyada commit edilmiş kayıt sayısı, her parçayla aynı
+# transaction'da güncellenir; aktarım tamamlanınca satır silinir.
+class ImportProgress(db.Model):
+    __tablename__ = 'import_progress'
+    key = db.Column(db.String(64), primary_key=True) # dosyanın başından ve hedef kullanıcıdan türetilir
+    path = db.Column(db.String(500), nullable=False)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+def upgrade_schema():
+    """
+    create_all() var olan tablolara sütun/indeks eklemez; eski veritabanlarını
+    güncel modele getirir. Tekrar tekrar çalıştırılabilir.
+    """
+    columns = {c['name'] for c in db.inspect(db.engine).get_columns('consumption')}
+    if 'day' not in columns:
+        db.session.execute(db.text("ALTER TABLE consumption ADD COLUMN day DATE"))
+        print("Sütun eklendi: consumption.day")
+
+    backfilled = db.session.execute(
+        db.text("UPDATE consumption SET day = substr(date, 1, 10) WHERE day IS NULL")
+    ).rowcount
+    if backfilled:
+        print(f"consumption.day dolduruldu: {backfilled} satır")
+    db.session.commit()
+
+    for index in Consumption.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    # Benzersiz rollup anahtarından önce yinelenen satırlar (eşzamanlı ilk kayıtlar) tek satırda birleştirilir
+    key = "coalesce(user_id, 0), day, category, is_bill"
+    duplicates = db.session.execute(db.text(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM daily_rollup GROUP BY {key} HAVING COUNT(*) > 1)"
+    )).scalar()
+    if duplicates:
+        db.session.execute(db.text(f"""
+            UPDATE daily_rollup SET
+                liters = (SELECT SUM(d.liters) FROM daily_rollup d WHERE coalesce(d.user_id, 0) = coalesce(daily_rollup.user_id, 0)
+                          AND d.day = daily_rollup.day AND d.category = daily_rollup.category AND d.is_bill = daily_rollup.is_bill),
+                entries = (SELECT SUM(d.entries) FROM daily_rollup d WHERE coalesce(d.user_id, 0) = coalesce(daily_rollup.user_id, 0)
+                           AND d.day = daily_rollup.day AND d.category = daily_rollup.category AND d.is_bill = daily_rollup.is_bill)
+            WHERE id IN (SELECT MIN(id) FROM daily_rollup GROUP BY {key} HAVING COUNT(*) > 1)
+        """))
+        db.session.execute(db.text(f"DELETE FROM daily_rollup WHERE id NOT IN (SELECT MIN(id) FROM daily_rollup GROUP BY {key})"))
+        db.session.commit()
+        print(f"daily_rollup: {duplicates} yinelenen anahtar birleştirildi")
+    # checkfirst ifade indekslerini (coalesce) görmez; mevcut indeksler sqlite_master'dan okunur
+    existing = {name for (name,) in db.session.execute(
+        db.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'daily_rollup'"))}
+    for index in DailyRollup.__table__.indexes:
+        if index.name not in existing:
+            index.create(db.engine)
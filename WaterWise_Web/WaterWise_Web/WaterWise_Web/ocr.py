@@ -0,0 +1,663 @@
+import difflib
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import bill_parser
+import tariffs
+from lazy_imports import lazy_import
+from utils import solve_usage_from_price
+
+# Fatura OCR hattı: görüntü -> ön işleme -> Tesseract -> regex ile değer yakalama -> tavsiye.
+# read_text / analyze_image hem Flask sürecinde (senkron mod) hem de ocr_jobs'un işçi süreçlerinde çalışır;
+# bu yüzden modül Flask'a ve veritabanına bağımlı değildir.
+
+# Sürümler OCR önbelleğini geçersiz kılar (bkz. ocr_cache.py):
+#   OCR_VERSION: ön işleme veya Tesseract ayarı değişince artırılır (önbellekteki metin geçersiz olur)
+#   PARSER_VERSION: bill_parser desenleri değişince artırılır (saklanan metin yeniden ayrıştırılır); tutardan
+#                   çözülen tüketim tarifeye bağlı olduğu için tariffs.json özeti de eklenir
+OCR_VERSION = '3'
+PARSER_VERSION = f'{bill_parser.PARSER_VERSION}.{tariffs.SCHEDULES_VERSION}'
+
+DEFAULT_TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+def _configure_tesseract(module):
+    # Tesseract yolu: TESSERACT_CMD ortam değişkeni, yoksa Windows varsayılanı (varsa), yoksa PATH
+    cmd = os.environ.get('TESSERACT_CMD')
+    if not cmd and os.path.exists(DEFAULT_TESSERACT_CMD):
+        cmd = DEFAULT_TESSERACT_CMD
+    if cmd:
+        module.pytesseract.tesseract_cmd = cmd
+
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+pytesseract = lazy_import('pytesseract', on_load=_configure_tesseract)
+HEAVY_MODULES = (np, cv2, pytesseract)
+
+
+def load_libraries():
+    """Ağır kütüphaneleri hemen yükler (işçi süreç başlangıcı / ön yükleme)."""
+    for module in HEAVY_MODULES:
+        module._load()
+
+
+# === Ön İşleme ===
+# Telefon fotoğrafları çok büyük olabilir (12 MP+). Görüntü gerekirse düşük çözünürlükte çözülür,
+# kağıt sınırına kırpılır, eğiklik düzeltilir ve karakter yüksekliği Tesseract'ın en iyi okuduğu
+# aralığa gelecek şekilde ölçeklenir. Her aşamanın süresi (ms) timings sözlüğüne yazılır.
+
+TARGET_TEXT_HEIGHT = 30 # px; Tesseract ~20-40 px karakter yüksekliğinde en iyi sonucu verir
+MIN_WORKING_PIXELS = 2_500_000 # Düşük çözünürlüklü çözme bu piksel sayısının altına inmez
+MIN_SCALE, MAX_SCALE = 0.4, 3.0
+MAX_WORKING_PIXELS = 12_000_000 # Küçük yazılı büyük görüntü büyütülürken Tesseract'a giden görüntünün üst sınırı
+MAX_DESKEW_ANGLE = 15 # derece; daha büyük açılar büyük ihtimalle yanlış tahmindir
+ANALYSIS_SIDE = 1000 # kırpma / eğiklik tahmini bu uzun kenara küçültülmüş kopyada yapılır
+
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_format(data):
+    """Baştaki imza baytlarından biçim: 'png' | 'jpeg' | 'tiff' | None (desteklenmiyor)."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if data[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    return None
+
+
+def tiff_pages(data):
+    """
+    TIFF IFD zincirinden sayfa boyutları [(genişlik, yükseklik), ...]; sayfalar çözülmez.
+    Zincir verilen baytların dışına çıkıyorsa (kesik başlık) o ana kadar okunanlar döner.
+    """
+    endian = '<' if data[:2] == b'II' else '>'
+    offset = struct.unpack(endian + 'I', data[4:8])[0]
+    pages, seen = [], set()
+    while offset and offset + 2 <= len(data) and offset not in seen:
+        seen.add(offset) # Döngüsel zincir koruması
+        count = struct.unpack(endian + 'H', data[offset:offset + 2])[0]
+        end = offset + 2 + count * 12
+        if end + 4 > len(data):
+            break
+        size = {}
+        for entry in range(offset + 2, end, 12):
+            tag, kind = struct.unpack(endian + 'HH', data[entry:entry + 4])
+            if tag in (256, 257): # ImageWidth, ImageLength
+                fmt = 'H' if kind == 3 else 'I'
+                size[tag] = struct.unpack(endian + fmt, data[entry + 8:entry + 8 + struct.calcsize(fmt)])[0]
+        pages.append((size.get(256, 0), size.get(257, 0)))
+        offset = struct.unpack(endian + 'I', data[end:end + 4])[0]
+    return pages
+
+
+def image_size(data):
+    """PNG / JPEG / TIFF (ilk sayfa) başlığından (genişlik, yükseklik); görüntüyü çözmeden. Bulunamazsa None."""
+    kind = image_format(data)
+    if kind == 'png' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if kind == 'tiff':
+        pages = tiff_pages(data)
+        return pages[0] if pages else None
+    if kind != 'jpeg':
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF: # Dolgu baytı
+            i += 1
+            continue
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7: # Uzunluksuz işaretçiler
+            i += 2
+            continue
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+
+def decode_gray(image_bytes, page=0):
+    """
+    Gri tonlamalı çözme; büyük görüntüler IMREAD_REDUCED_GRAYSCALE_{2,4,8} ile küçültülerek çözülür.
+    page: çok sayfalı TIFF'te çözülecek sayfa (0'dan); yalnızca o sayfa çözülür
+    """
+    if page:
+        pages = tiff_pages(image_bytes) if image_format(image_bytes) == 'tiff' else []
+        if page >= len(pages):
+            raise ValueError('Sayfa bulunamadı')
+        size = pages[page]
+    else:
+        size = image_size(image_bytes)
+    factor, flag = 1, cv2.IMREAD_GRAYSCALE
+    if size:
+        pixels = size[0] * size[1]
+        for reduce_by, reduced in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                                   (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+            if pixels / (reduce_by * reduce_by) >= MIN_WORKING_PIXELS:
+                factor, flag = reduce_by, reduced
+                break
+    buffer = np.frombuffer(image_bytes, np.uint8)
+    if not page:
+        gray = cv2.imdecode(buffer, flag)
+    else:
+        # imdecodemulti küçültme bayraklarını uygulamıyor; sayfa tam çözülüp aynı oranda küçültülür
+        ok, frames = cv2.imdecodemulti(buffer, cv2.IMREAD_GRAYSCALE, range=(page, page + 1))
+        gray = frames[0] if ok and frames else None
+        if gray is not None and factor > 1:
+            gray = cv2.resize(gray, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+    if gray is None:
+        raise ValueError('Görüntü okunamadı')
+    return gray
+
+
+def _analysis_copy(gray):
+    ratio = ANALYSIS_SIDE / max(gray.shape)
+    if ratio >= 1:
+        return gray, 1.0
+    return cv2.resize(gray, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA), ratio
+
+
+def _rect_angle(rect):
+    """minAreaRect açısını [-45, 45] aralığına getirir; (açı, genişlik, yükseklik)"""
+    (w, h), angle = rect[1], rect[2]
+    if angle > 45:
+        angle -= 90
+        w, h = h, w
+    elif angle < -45:
+        angle += 90
+        w, h = h, w
+    return angle, w, h
+
+
+def _rotate(gray, center, angle):
+    matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (gray.shape[1], gray.shape[0]),
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def crop_document(gray):
+    """
+    Fotoğraftaki en büyük açık renkli bölgeyi (kağıt) bulur, kenarlarına göre düzeltip kırpar.
+    Returns: (görüntü, kağıt bulundu mu) — kağıt tüm kareyi kaplıyorsa görüntüye dokunulmaz.
+    """
+    small, ratio = _analysis_copy(gray)
+    mask = cv2.threshold(cv2.GaussianBlur(small, (5, 5), 0), 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+    if not contours:
+        return gray, False
+    page = max(contours, key=cv2.contourArea)
+    coverage = cv2.contourArea(page) / (small.shape[0] * small.shape[1])
+    if coverage < 0.2 or coverage > 0.9:
+        return gray, False
+
+    (cx, cy), _, _ = rect = cv2.minAreaRect(page)
+    angle, w, h = _rect_angle(rect)
+    # Kağıdın koyu kenar çizgisi Tesseract'a gürültü olarak gitmesin diye biraz içeriden kırpılır
+    cx, cy, w, h = cx / ratio, cy / ratio, w / ratio * 0.99, h / ratio * 0.99
+    if 0.3 <= abs(angle) <= MAX_DESKEW_ANGLE:
+        gray = _rotate(gray, (cx, cy), angle)
+    x0, y0 = max(int(cx - w / 2), 0), max(int(cy - h / 2), 0)
+    return gray[y0:int(cy + h / 2), x0:int(cx + w / 2)], True
+
+
+def deskew(gray):
+    """Kağıt kenarı bulunamadığında (tarama vb.) koyu piksellerin en küçük dikdörtgeninin açısıyla düzeltir."""
+    small, _ = _analysis_copy(gray)
+    ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    coords = cv2.findNonZero(ink)
+    if coords is None or len(coords) < 100:
+        return gray
+    angle = _rect_angle(cv2.minAreaRect(coords))[0]
+    if abs(angle) < 0.3 or abs(angle) > MAX_DESKEW_ANGLE:
+        return gray
+    return _rotate(gray, (gray.shape[1] / 2, gray.shape[0] / 2), angle)
+
+
+def estimate_text_height(gray):
+    """Bağlı bileşenlerden medyan karakter yüksekliği (px); yeterli karakter bulunamazsa None."""
+    ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    stats = cv2.connectedComponentsWithStats(ink, connectivity=8)[2][1:]
+    widths, heights = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+    # Karakter boyutlu bileşenler: gürültü, çizgi ve çerçeveler elenir
+    chars = heights[(heights >= 4) & (heights <= gray.shape[0] / 10) & (widths <= heights * 3) & (widths >= 1)]
+    if len(chars) < 20:
+        return None
+    return float(np.median(chars))
+
+
+def prepare_gray(image_bytes, timings=None, page=0):
+    """
+    Çözme, kırpma, eğiklik düzeltme ve ölçekleme; eşiklenmemiş gri görüntü (stratejiler farklı eşikler dener).
+    timings: verilirse aşama süreleri (ms) bu sözlüğe yazılır
+    page: çok sayfalı TIFF'te okunacak sayfa (0'dan)
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+
+    def mark(stage):
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage] = round((now - start) * 1000, 1)
+        start = now
+
+    gray = decode_gray(image_bytes, page)
+    mark('decode')
+    gray, found_page = crop_document(gray)
+    mark('crop')
+    if not found_page:
+        gray = deskew(gray)
+    mark('deskew')
+
+    text_height = estimate_text_height(gray)
+    if text_height:
+        scale = min(max(TARGET_TEXT_HEIGHT / text_height, MIN_SCALE), MAX_SCALE)
+    else:
+        # Karakter bulunamadı: eski davranış gibi küçük görüntüleri büyüt, büyükleri olduğu gibi bırak
+        scale = 2.0 if max(gray.shape) < 2000 else 1.0
+    # Büyütme bellek ve Tesseract süresini karesiyle artırır; sonuç MAX_WORKING_PIXELS'i aşmasın
+    scale = min(scale, (MAX_WORKING_PIXELS / (gray.shape[0] * gray.shape[1])) ** 0.5)
+    if abs(scale - 1) > 0.1:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+    mark('scale')
+    return gray
+
+
+def binarize(gray, method='otsu'):
+    """
+    Gri görüntüyü ikili görüntüye çevirir.
+    method: 'otsu' (tek global eşik), 'adaptive' (gölgeli / eşit aydınlatılmamış fotoğraflar için yerel eşik),
+            'denoise' (medyan filtre + Otsu; JPEG artefaktları ve noktasal gürültü için)
+    """
+    if method == 'adaptive':
+        # Blok yaklaşık iki karakter yüksekliği: harf içleri arka plana karışmaz
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                     2 * TARGET_TEXT_HEIGHT + 1, 15)
+    if method == 'denoise':
+        gray = cv2.medianBlur(gray, 3)
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+
+
+def preprocess(image_bytes, timings=None):
+    """
+    Görüntü baytlarını Tesseract'a hazır ikili görüntüye çevirir (Otsu eşiği).
+    timings: verilirse aşama süreleri (ms) bu sözlüğe yazılır
+    """
+    timings = {} if timings is None else timings
+    gray = prepare_gray(image_bytes, timings)
+    start = time.perf_counter()
+    binary = binarize(gray)
+    timings['threshold'] = round((time.perf_counter() - start) * 1000, 1)
+    return binary
+
+
+# === OCR ===
+def recognize(text_img, timeout=0, timings=None):
+    """Ön işlenmiş görüntüyü Tesseract ile metne çevirir (timeout: saniye, 0 = sınırsız)."""
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(text_img, lang='eng', config='--oem 3 --psm 6', timeout=timeout)
+    if timings is not None:
+        timings['ocr'] = round((time.perf_counter() - start) * 1000, 1)
+    return text
+
+
+def read_text(image_bytes, timeout=0, timings=None):
+    """
+    Görüntü baytlarını ön işleyip Tesseract ile metne çevirir (tam sayfa).
+    timeout: Tesseract alt sürecinin en fazla çalışma süresi (saniye, 0 = sınırsız)
+    timings: verilirse aşama süreleri (ms) bu sözlüğe yazılır
+    """
+    return recognize(preprocess(image_bytes, timings), timeout, timings)
+
+
+# === İlgi Bölgesi (ROI) OCR ===
+# Faturadan sadece ödenecek tutar, m³ tüketim ve günlük ortalama gerekir; tüm sayfayı okumak yerine
+# önce yarım çözünürlükte seyrek metin taramasıyla (psm 11) etiketler bulunur, sonra sadece etiketlerin
+# çevresi tam çözünürlükte okunur. Etiket bulunamazsa veya bölgelerden değer çıkmazsa tam sayfa okunur.
+# OCR_ROI=0 ortam değişkeni iki geçişli modu kapatır.
+ROI_OCR = os.environ.get('OCR_ROI', '1') == '1'
+LOCATE_SCALE = 0.5
+ROI_MAX_COVERAGE = 0.6 # Bölgeler sayfanın bu kadarını kaplıyorsa doğrudan tam sayfa okunur
+ROI_PADDING = 12 # px; Tesseract kenara yapışık metni kötü okur
+
+# (alan, etiket kelimeleri, etiketin altında taranacak satır sayısı)
+ROI_FIELDS = (
+    ('amount', ('ODENECEK', 'TUTAR'), 3),
+    ('consumption', ('TOPLAM', 'TUKETIM'), 1),
+    ('daily', ('GUNLUK', 'ORTALAMA'), 1),
+    # Son ödeme tarihi tarifenin seçimini ve kaydın tarihini belirler; genelde tutar kutusunun dışındadır.
+    # "SON" 4 harften kısa olduğu için etiket olarak aranmaz (bkz. _is_label)
+    ('due_date', ('ODEME', 'TARIHI'), 1),
+)
+
+def _fold(word):
+    return re.sub(r'[^A-Z0-9]', '', bill_parser.fold(word))
+
+
+def _is_label(word, keywords):
+    # OCR hataları (OGDENECEK, Teplam vb.) için benzerlik eşiği
+    return len(word) >= 4 and any(difflib.SequenceMatcher(None, word, k).ratio() >= 0.75 for k in keywords)
+
+
+def _merge_regions(regions):
+    regions = sorted(regions)
+    merged = []
+    for region in regions:
+        for i, other in enumerate(merged):
+            if region[0] <= other[2] and other[0] <= region[2] and region[1] <= other[3] and other[1] <= region[3]:
+                merged[i] = (min(region[0], other[0]), min(region[1], other[1]),
+                             max(region[2], other[2]), max(region[3], other[3]))
+                break
+        else:
+            merged.append(region)
+    # Birleşen bölgeler yeni çakışmalar oluşturmuş olabilir
+    return merged if len(merged) == len(regions) else _merge_regions(merged)
+
+
+def locate_regions(text_img, timeout=0, timings=None):
+    """
+    Düşük çözünürlüklü geçişte etiketleri bulur; tam çözünürlükte okunacak bölgeler [(x0, y0, x1, y1), ...]
+    (yukarıdan aşağıya sıralı). Etiket bulunamazsa veya bölgeler sayfanın çoğunu kaplıyorsa boş liste.
+    """
+    start = time.perf_counter()
+    small = cv2.resize(text_img, None, fx=LOCATE_SCALE, fy=LOCATE_SCALE, interpolation=cv2.INTER_AREA)
+    data = pytesseract.image_to_data(small, lang='eng', config='--oem 3 --psm 11',
+                                     output_type=pytesseract.Output.DICT, timeout=timeout)
+    height, width = text_img.shape[:2]
+    regions = []
+    for word, x, y, w, h in zip(data['text'], data['left'], data['top'], data['width'], data['height']):
+        word = _fold(word)
+        for _, keywords, lines_below in ROI_FIELDS:
+            if _is_label(word, keywords):
+                x, y, w, h = (int(v / LOCATE_SCALE) for v in (x, y, w, h))
+                # Etiketin solundan sayfanın sağ kenarına, etiket satırı + altındaki satırlar
+                regions.append((max(x - 2 * h, 0), max(y - h // 2, 0),
+                                width, min(y + h + int(lines_below * 2.2 * h), height)))
+                break
+    regions = sorted(_merge_regions(regions), key=lambda r: r[1])
+    if timings is not None:
+        timings['locate'] = round((time.perf_counter() - start) * 1000, 1)
+
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if area > ROI_MAX_COVERAGE * width * height:
+        return []
+    return regions
+
+
+def read_regions(text_img, regions, timeout=0, timings=None):
+    """Bölgeleri tam çözünürlükte okur; metinler yukarıdan aşağıya birleştirilir."""
+    start = time.perf_counter()
+    texts = []
+    for x0, y0, x1, y1 in regions:
+        crop = cv2.copyMakeBorder(text_img[y0:y1, x0:x1], ROI_PADDING, ROI_PADDING, ROI_PADDING, ROI_PADDING,
+                                  cv2.BORDER_CONSTANT, value=255)
+        texts.append(recognize(crop, timeout))
+    if timings is not None:
+        timings['roi_ocr'] = round((time.perf_counter() - start) * 1000, 1)
+    return '\n'.join(texts)
+
+
+# === Fatura alanlarından tüketim ===
+def parse_bill_text(text):
+    """
+    OCR metninden fatura tüketimini (m³) bulur; alanlar bill_parser.extract ile çıkarılır.
+    Adaylar (okunan m³, tutardan hesaplanan m³, günlük ortalamadan tahmin) arasından en güvenilir olanı seçilir.
+
+    Returns:
+        dict: found_val (m³ veya None), calculation_method, source, confidence (0-1), fields (bill_parser alanları),
+              price_match (etiketle yakalanan tutar metni veya None), text
+    """
+    fields = bill_parser.extract(text)
+    amount, consumption, daily = fields['amount'], fields['consumption'], fields['daily']
+    # Tutar, faturanın döneminde yürürlükteki tarifeyle çözülür (son ödeme tarihi okunamadıysa bugünkü tarife)
+    bill_date = fields['due_date']['value'] if fields['due_date'] else None
+
+    # (güven, kaynak, m³, hesaplama yöntemi); eşit güvende listede önce gelen kazanır
+    candidates = []
+    if amount:
+        usage = solve_usage_from_price(amount['value'], on=bill_date)
+        if amount['labelled']:
+            candidates.append((amount['confidence'], 'price', usage,
+                               f"Fatura Tutarından Hesaplama ({amount['value']:.2f} TL)"))
+        else:
+            candidates.append((amount['confidence'], 'max_price', usage,
+                               f"Fatura Tutarından (Tahmin: {amount['value']} TL)"))
+    if consumption:
+        candidates.append((consumption['confidence'], 'consumption', consumption['value'], "Doğrudan Okuma"))
+    if daily:
+        # Aylık tüketime 30 günle genellenir; gün sayısı doğrulansa bile tahmindir
+        candidates.append((daily['confidence'] * 0.7, 'daily', round(daily['value'] * 30, 2), "Günlük Ortalamadan Tahmin"))
+
+    # Tutar tarifeyle çözülemediyse (0 m³) aday sayılmaz
+    candidates = [c for c in candidates if c[2]]
+    confidence, source, found_val, calculation_method = max(
+        candidates, key=lambda c: c[0], default=(0.0, None, None, "Doğrudan Okuma"))
+
+    return {
+        'found_val': found_val,
+        'calculation_method': calculation_method,
+        'source': source,
+        'confidence': confidence,
+        'fields': fields,
+        'price_match': amount['raw'] if amount and amount['labelled'] else None,
+        'text': text,
+    }
+
+
+# === Çoklu Strateji OCR ===
+# Tek bir eşik / sayfa bölütleme modu her faturada işe yaramaz (gölgeli fotoğraf, tablo düzeni vb.).
+# Tam sayfa okumada birkaç ön işleme + psm varyantı aynı anda çalıştırılır; her sonuç puanlanır ve
+# biri CONFIDENCE_THRESHOLD'u geçer geçmez kalan varyantlar iptal edilir (çalışan Tesseract süreçleri öldürülür).
+# Tesseract ayrı bir süreç olduğundan thread'ler gerçekten paralel çalışır; duvar saati süresi tek geçişe yakın kalır.
+# OCR_STRATEGY_WORKERS: aynı anda çalışan varyant sayısı (1 = sırayla, ilk güvenilir sonuçta durur)
+STRATEGY_WORKERS = max(int(os.environ.get('OCR_STRATEGY_WORKERS', '3')), 1)
+CONFIDENCE_THRESHOLD = 0.8
+
+# (ad, eşikleme yöntemi, psm); sıra önceliktir: ilk varyant eski tek geçişli okumayla aynıdır
+STRATEGIES = (
+    ('otsu_psm6', 'otsu', 6), # Tek düzgün metin bloğu
+    ('adaptive_psm6', 'adaptive', 6),
+    ('otsu_psm4', 'otsu', 4), # Değişken boyutlu sütunlar (tablo düzenli faturalar)
+    ('denoise_psm6', 'denoise', 6),
+    ('otsu_psm11', 'otsu', 11), # Seyrek metin: etiket ve değerler dağınıksa
+)
+
+PLAUSIBLE_M3 = (1, 150) # Konut için makul aylık tüketim aralığı
+
+
+class Cancelled(Exception):
+    """Başka bir strateji yeterince güvenilir sonuç bulduğu için durduruldu."""
+
+
+def score_parse(parsed):
+    """Ayrıştırma sonucu için 0-1 arası güven puanı (bill_parser alan güveni + makullük kontrolü)."""
+    if not parsed['found_val']:
+        return 0.0
+    score = parsed['confidence']
+    if not PLAUSIBLE_M3[0] <= parsed['found_val'] <= PLAUSIBLE_M3[1]:
+        score *= 0.5 # Büyük ihtimalle yanlış okunan bir rakam
+    return score
+
+
+def _tesseract(img, psm, timeout=0, cancel=None):
+    """
+    Tesseract'ı doğrudan alt süreç olarak çalıştırır (pytesseract çalışan süreci dışarıdan durdurmaya izin vermez).
+    cancel (threading.Event) kurulursa süreç öldürülür ve Cancelled fırlatılır.
+    """
+    with tempfile.TemporaryDirectory(prefix='waterwise_ocr_') as tmp:
+        image_path, output_base = os.path.join(tmp, 'input.png'), os.path.join(tmp, 'output')
+        cv2.imwrite(image_path, img)
+        proc = subprocess.Popen([pytesseract.pytesseract.tesseract_cmd, image_path, output_base,
+                                 '-l', 'eng', '--oem', '3', '--psm', str(psm)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            try:
+                proc.wait(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    proc.kill()
+                    proc.wait()
+                    raise Cancelled()
+                if deadline and time.monotonic() > deadline:
+                    proc.kill()
+                    proc.wait()
+                    raise RuntimeError('Tesseract process timeout')
+        if proc.returncode != 0:
+            raise RuntimeError(f'Tesseract hata kodu {proc.returncode}')
+        with open(output_base + '.txt', encoding='utf-8', errors='replace') as f:
+            return f.read()
+
+
+def _run_strategy(strategy, gray, text_img, deadline, cancel):
+    name, method, psm = strategy
+    if cancel.is_set():
+        raise Cancelled()
+    timeout = 0
+    if deadline:
+        # Süre tüm stratejiler için ortaktır; sıradan sonra başlayan varyant kalan süreyi kullanır
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            raise RuntimeError('Tesseract process timeout')
+    img = text_img if method == 'otsu' else binarize(gray, method)
+    parsed = parse_bill_text(_tesseract(img, psm, timeout, cancel))
+    parsed['strategy'] = name
+    parsed['score'] = score_parse(parsed)
+    if parsed['score'] >= CONFIDENCE_THRESHOLD:
+        # Boşalan thread sıradaki varyantı almadan önce diğerleri durdurulur
+        cancel.set()
+    return parsed
+
+
+def run_strategies(gray, text_img, timeout=0, timings=None, workers=None, best=None):
+    """
+    STRATEGIES varyantlarını paralel çalıştırır; en yüksek puanlı ayrıştırma sonucunu döndürür.
+    text_img: Otsu ile eşiklenmiş görüntü (zaten hesaplandığı için tekrar eşiklenmez)
+    best: önceki bir geçişin (ör. ROI) sonucu; daha iyisi bulunamazsa o döner
+    """
+    start = time.perf_counter()
+    workers = workers or STRATEGY_WORKERS
+    cancel = threading.Event()
+    deadline = time.monotonic() + timeout if timeout else None
+    attempts, errors = 0, []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-strategy') as executor:
+        futures = [executor.submit(_run_strategy, strategy, gray, text_img, deadline, cancel) for strategy in STRATEGIES]
+        try:
+            for future in as_completed(futures):
+                try:
+                    parsed = future.result()
+                except Cancelled:
+                    continue
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                attempts += 1
+                if best is None or parsed['score'] > best.get('score', 0):
+                    best = parsed
+                if best['score'] >= CONFIDENCE_THRESHOLD:
+                    break
+        finally:
+            # Erken çıkış (veya hata): sıradakiler hiç başlamaz, çalışanların Tesseract süreçleri öldürülür
+            cancel.set()
+            for future in futures:
+                future.cancel()
+
+    if best is None:
+        # Hiçbir varyant tamamlanamadı (Tesseract yok, zaman aşımı vb.): ilk hatayı ilet
+        raise errors[0]
+    if timings is not None:
+        timings['ocr'] = round((time.perf_counter() - start) * 1000, 1)
+    best['attempts'] = attempts
+    return best
+
+
+def analyze_image(image_bytes, timeout=0, roi=None, page=0):
+    """
+    OCR + regex; işçi süreçte çalışan iş birimi (sonuç picklable bir dict, aşama süreleri dahil).
+    roi: iki geçişli bölge OCR'ı (varsayılan ROI_OCR); sonuç 'mode' alanında: 'roi' veya 'full'
+    page: çok sayfalı TIFF'te okunacak sayfa (0'dan); sayfa işçi süreçte çözülür
+    Tam sayfa okumada çoklu strateji çalışır; kazanan varyant 'strategy', güven puanı 'score' alanındadır.
+    """
+    roi = ROI_OCR if roi is None else roi
+    timings = {}
+    gray = prepare_gray(image_bytes, timings, page)
+    start = time.perf_counter()
+    text_img = binarize(gray)
+    timings['threshold'] = round((time.perf_counter() - start) * 1000, 1)
+
+    parsed = None
+    if roi:
+        regions = locate_regions(text_img, timeout, timings)
+        if regions:
+            parsed = parse_bill_text(read_regions(text_img, regions, timeout, timings))
+            parsed.update(mode='roi', strategy='roi', score=score_parse(parsed))
+    if parsed is None or parsed['score'] < CONFIDENCE_THRESHOLD:
+        # Etiket bulunamadı veya bölgelerden güvenilir değer çıkmadı: tam sayfa, çoklu strateji
+        full = run_strategies(gray, text_img, timeout, timings, best=parsed)
+        if full is not parsed:
+            parsed = dict(full, mode='full')
+
+    parsed['timings'] = timings
+    return parsed
+
+
+# === Durum Değerlendirmesi ===
+def bill_response(parsed, user_target):
+    """parse_bill_text sonucundan /api/analyze_bill yanıt gövdesini üretir."""
+    found_val = parsed['found_val']
+    calculation_method = parsed['calculation_method']
+
+    if not found_val:
+        # DEBUG BİLGİSİ İLE DÖN
+        debug_msg = "Değer okunamadı. "
+        if parsed['price_match']: debug_msg += f"Fiyat bulundu ancak hesaplanamadı ({parsed['price_match']}). "
+        else: debug_msg += "Fiyat bulunamadı. "
+
+        debug_msg += f"OCR İlk 50 Karakter: {parsed['text'][:50]}..."
+        return {'success': False, 'message': debug_msg, 'timings': parsed.get('timings')}
+
+    liters_total = found_val * 1000
+    daily_avg = liters_total / 30
+    usage_ratio = (daily_avg / user_target) * 100
+
+    status, advice_title = "active", "Durum Analizi"
+    advice_text = ""
+
+    if daily_avg > (user_target * 1.5):
+        status = "danger"
+        advice_title = "Yüksek Tüketim"
+        advice_text = f"Günlük ortalama ({daily_avg:.0f} L) belirlenen hedefin çok üzerinde (%{usage_ratio:.0f}). Tasarruf önlemleri almanız önerilir."
+    elif daily_avg > user_target:
+        status = "warning"
+        advice_title = "Hedef Aşımı"
+        advice_text = f"Günlük ortalama ({daily_avg:.0f} L) hedefinizi aşıyor (%{usage_ratio:.0f}). Daha dikkatli kullanım gerekebilir."
+    else:
+        status = "success"
+        advice_title = "İdeal Tüketim"
+        advice_text = f"Günlük tüketim ({daily_avg:.0f} L) hedef sınırları içerisinde (%{usage_ratio:.0f}). Verimli kullanımınız için teşekkürler."
+
+    # Fiyat bazlı tahmin uyarısı
+    if "Fatura Tutarından" in calculation_method:
+        advice_text += "<br><small><i>*Bu hesaplama fatura tutarından tahmin edilmiştir, gerçek sayaç değeriyle farklılık gösterebilir.</i></small>"
+
+    return {
+        'success': True,
+        'liters': liters_total,
+        'daily_avg': daily_avg,
+        'status': status,
+        'advice_title': advice_title,
+        'advice_text': advice_text,
+        'message': f"Fatura: {found_val} m³ ({calculation_method})",
+        'timings': parsed.get('timings') # Aşama süreleri (ms); önbellekten gelen sonuçta None
+    }
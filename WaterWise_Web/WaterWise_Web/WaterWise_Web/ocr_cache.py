@@ -0,0 +1,104 @@
+import datetime
+import hashlib
+import json
+from sqlalchemy.exc import IntegrityError
+from models import db, OcrCache
+import ocr
+
+# İçerik adresli OCR sonuç önbelleği (SQLite, OcrCache tablosu).
+# Anahtar, yüklenen baytların SHA-256 özetidir; aynı fotoğraf tekrar yüklendiğinde OCR hiç çalışmaz.
+# İsteğe bağlı algısal hash (dHash) ile yeniden kodlanmış / küçültülmüş kopyalar da yakalanabilir;
+# aynı şablondaki farklı faturalar birbirine benzeyebileceği için varsayılan olarak kapalıdır.
+#
+# Geçersiz kılma: OCR_VERSION değişince kayıtlar eskir ve silinir; sadece PARSER_VERSION değiştiyse
+# (ayrıştırıcı veya tariffs.json değişti) saklanan OCR metni yeniden ayrıştırılır ve tüketim güncel tarifeyle
+# yeniden çözülür (OCR tekrar çalışmaz).
+# Tablo en fazla max_entries kayıt tutar; fazlası en uzun süredir kullanılmayandan başlanarak silinir.
+
+
+def image_key(image_bytes, page=0):
+    """Baytların SHA-256'sı; çok sayfalı TIFF'in sonraki sayfalarında sayfa numarası da katılır."""
+    digest = hashlib.sha256(image_bytes)
+    if page:
+        digest.update(b'#%d' % page)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image_bytes):
+    """256 bit fark hash'i (dHash): 17x16'ya küçültülmüş gri görüntüde yatay komşu pikseller karşılaştırılır."""
+    np, cv2 = ocr.np, ocr.cv2
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    small = cv2.resize(img, (17, 16), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes().hex()
+
+
+def _distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def _stored_result(parsed):
+    return json.dumps({k: v for k, v in parsed.items() if k not in ('text', 'timings')}, ensure_ascii=False)
+
+
+def _entry_result(entry):
+    if entry.parser_version != ocr.PARSER_VERSION:
+        parsed = ocr.parse_bill_text(entry.text)
+        entry.result = _stored_result(parsed)
+        entry.parser_version = ocr.PARSER_VERSION
+        return parsed
+    return dict(json.loads(entry.result), text=entry.text)
+
+
+def lookup(key, phash=None, max_distance=0):
+    """Önbellekteki ayrıştırma sonucunu döndürür (yoksa None); tam eşleşme yoksa en yakın algısal hash denenir."""
+    entry = db.session.get(OcrCache, key)
+    if entry is not None and entry.ocr_version != ocr.OCR_VERSION:
+        entry = None
+    if entry is None and phash:
+        candidates = db.session.query(OcrCache.key, OcrCache.phash)\
+            .filter(OcrCache.ocr_version == ocr.OCR_VERSION)\
+            .filter(OcrCache.phash.isnot(None))\
+            .all()
+        best = min(((_distance(phash, p), k) for k, p in candidates), default=None)
+        if best is not None and best[0] <= max_distance:
+            entry = db.session.get(OcrCache, best[1])
+    if entry is None:
+        return None
+
+    parsed = _entry_result(entry)
+    entry.hits += 1
+    entry.last_used = datetime.datetime.utcnow()
+    db.session.commit()
+    return parsed
+
+
+def store(key, phash, parsed, max_entries):
+    entry = db.session.get(OcrCache, key)
+    if entry is None:
+        entry = OcrCache(key=key)
+        db.session.add(entry)
+    entry.phash = phash
+    entry.ocr_version = ocr.OCR_VERSION
+    entry.parser_version = ocr.PARSER_VERSION
+    entry.text = parsed['text']
+    entry.result = _stored_result(parsed)
+    entry.last_used = datetime.datetime.utcnow()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Aynı görüntü başka bir istekte aynı anda kaydedildi
+        db.session.rollback()
+        return
+    evict(max_entries)
+
+
+def evict(max_entries):
+    """Eski sürüm kayıtlarını, sonra sınırı aşan en uzun süredir kullanılmayan kayıtları siler."""
+    OcrCache.query.filter(OcrCache.ocr_version != ocr.OCR_VERSION).delete(synchronize_session=False)
+    excess = OcrCache.query.count() - max_entries
+    if excess > 0:
+        stale = [k for (k,) in db.session.query(OcrCache.key).order_by(OcrCache.last_used).limit(excess)]
+        OcrCache.query.filter(OcrCache.key.in_(stale)).delete(synchronize_session=False)
+    db.session.commit()
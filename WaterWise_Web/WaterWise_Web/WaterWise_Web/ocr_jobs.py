@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+import ocr
+
+# Fatura analizi için sınırlı işçi süreç havuzu.
+# /api/analyze_bill işi kuyruğa atar ve hemen bir iş kimliği döner; istemci sonucu sorgulayarak alır.
+#   - Geri basınç: bitmemiş iş sayısı OCR_QUEUE_SIZE'a ulaşınca yeni iş reddedilir (QueueFull -> 503)
+#   - Zaman aşımı: Tesseract alt süreci OCR_JOB_TIMEOUT saniyede öldürülür; süreyi aşan iş 'timeout' olur
+#   - İptal: istemci DELETE ile iptal edebilir; OCR_ABANDON_AFTER saniye sorgulanmayan iş terk edilmiş sayılır
+# İşçiler 'spawn' ile başlatılır: Flask süreci thread ve veritabanı bağlantıları taşıdığı için fork güvenli değil.
+# İş kayıtları süreç içidir; birden fazla web worker'ı varsa sorgu aynı sürece gelmelidir.
+
+
+class QueueFull(Exception):
+    """Bekleyen iş sayısı sınırda."""
+
+
+def _init_worker():
+    # Her işçi tek bir Tesseract çalıştırır; OpenMP thread'leri işçi sayısıyla çarpılmasın
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    ocr.load_libraries()
+
+
+def _ping():
+    return True
+
+
+class OcrJob:
+    def __init__(self, job_id, user_id, future, timeout):
+        self.id = job_id
+        self.user_id = user_id
+        self.future = future
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + timeout
+        self.last_seen = self.submitted
+        self.finished_at = None
+        self.error = None # 'timeout' | 'cancelled'
+        self.meta = {} # Çağıranın işe eklediği bilgiler (ör. önbellek anahtarı)
+
+    @property
+    def status(self):
+        """queued | running | done | failed | timeout | cancelled"""
+        if self.error:
+            return self.error
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            return 'failed' if self.future.exception() else 'done'
+        return 'running' if self.future.running() else 'queued'
+
+
+class OcrJobQueue:
+    def __init__(self, workers=2, max_pending=8, timeout=60, result_ttl=300, abandon_after=30):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.abandon_after = abandon_after
+        self.counts = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'timeout': 0, 'cancelled': 0}
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker)
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # Bir işçi beklenmedik şekilde öldüyse havuz kullanılamaz; yenisiyle bir kez daha dene
+            self._executor = None
+            return self._submit(fn, *args)
+
+    def _finish(self, job, now, error=None):
+        if error:
+            job.error = error
+            job.future.cancel() # Çalışan iş iptal edilemez; sonucu geldiğinde yok sayılır
+        job.finished_at = now
+        self.counts[job.status] += 1
+
+    def _reap(self):
+        """Biten işleri işaretler, süresi dolan / terk edilen işleri iptal eder, eski sonuçları siler."""
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            if job.finished_at is not None:
+                if now - job.finished_at > self.result_ttl:
+                    del self._jobs[job.id]
+            elif job.future.done():
+                self._finish(job, now)
+            elif now > job.deadline:
+                self._finish(job, now, 'timeout')
+            elif now - job.last_seen > self.abandon_after:
+                self._finish(job, now, 'cancelled')
+
+    def _busy(self):
+        # İptal edilmiş ama hâlâ çalışan işler de bir işçiyi meşgul eder
+        return sum(1 for job in self._jobs.values() if not job.future.done())
+
+    def submit(self, image_bytes, user_id, page=0):
+        """page: çok sayfalı TIFF'te okunacak sayfa; sayfa işçide çözülür"""
+        with self._lock:
+            self._reap()
+            if self._busy() >= self.max_pending:
+                self.counts['rejected'] += 1
+                raise QueueFull()
+            future = self._submit(ocr.analyze_image, image_bytes, self.timeout, None, page)
+            job = OcrJob(uuid.uuid4().hex, user_id, future, self.timeout)
+            self._jobs[job.id] = job
+            self.counts['submitted'] += 1
+            return job
+
+    def get(self, job_id, user_id):
+        """İşi döndürür ve 'hâlâ bekleniyor' olarak işaretler; başka kullanıcının işi için None."""
+        with self._lock:
+            self._reap()
+            job = self._jobs.get(job_id)
+            if job is None or job.user_id != user_id:
+                return None
+            job.last_seen = time.monotonic()
+            return job
+
+    def cancel(self, job_id, user_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.user_id != user_id:
+                return False
+            if job.finished_at is None:
+                self._finish(job, time.monotonic(), 'cancelled')
+            return True
+
+    def warm_up(self):
+        """İşçi süreçlerini önceden başlatır (başlatıcı kütüphaneleri yükler)."""
+        with self._lock:
+            futures = [self._submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.exception()
+
+    def stats(self):
+        with self._lock:
+            self._reap()
+            return dict(self.counts, workers=self.workers, max_pending=self.max_pending,
+                        busy=self._busy(), tracked=len(self._jobs))
+
+
+def get_queue():
+    app = current_app._get_current_object()
+    queue = app.extensions.get('ocr_jobs')
+    if queue is None:
+        queue = OcrJobQueue(app.config.get('OCR_WORKERS', 2),
+                            app.config.get('OCR_QUEUE_SIZE', 8),
+                            app.config.get('OCR_JOB_TIMEOUT', 60),
+                            app.config.get('OCR_RESULT_TTL', 300),
+                            app.config.get('OCR_ABANDON_AFTER', 30))
+        app.extensions['ocr_jobs'] = queue
+    return queue
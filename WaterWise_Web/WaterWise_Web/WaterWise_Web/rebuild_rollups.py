@@ -0,0 +1,11 @@
+from app import app
+from rollups import rebuild_rollups
+
+# Rollup tablosunu Consumption verilerinden sıfırdan yeniden oluşturur.
+# Elle yapılan veritabanı düzeltmelerinden veya toplu içe aktarmalardan sonra çalıştırın.
+
+if __name__ == "__main__":
+    with app.app_context():
+        print("Rollup tablosu yeniden oluşturuluyor...")
+        count = rebuild_rollups()
+        print(f"Tamamlandı: {count} rollup satırı yazıldı.")
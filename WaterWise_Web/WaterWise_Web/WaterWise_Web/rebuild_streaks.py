@@ -0,0 +1,16 @@
+from app import app
+from models import db, DailyRollup
+from streaks import rebuild_streak
+
+# Tüm kullanıcıların tasarruf serisi durumunu rollup tablosundan yeniden oluşturur.
+# Mevcut veriler için bir kez, ya da rebuild_rollups.py sonrasında çalıştırın.
+
+if __name__ == "__main__":
+    with app.app_context():
+        user_ids = [row[0] for row in db.session.query(DailyRollup.user_id).distinct()]
+        print(f"{len(user_ids)} kullanıcı için seri durumu yeniden oluşturuluyor...")
+        for uid in user_ids:
+            state = rebuild_streak(uid)
+            print(f"  user_id={uid}: son aktif gün {state.anchor_day}, seri {state.length}")
+        db.session.commit()
+        print("Tamamlandı.")
@@ -0,0 +1,229 @@
+import datetime
+import time
+from flask import current_app
+from models import db, Consumption, DailyRollup
+from rollups import BILL_CATEGORY, parse_day, on_user_write
+
+# Rapor periyotları tarih aralığıyla sınırlı GROUP BY sorgularıyla hesaplanır;
+# veritabanından sadece kova toplamları (tuple) döner, Consumption nesneleri değil.
+# Kaynak olarak rollup tablosu (varsayılan) veya ham Consumption tablosu kullanılabilir:
+#   app.config['REPORT_SOURCE'] = 'rollup' | 'consumption'
+
+
+def _add_months(day, months):
+    """pandas.DateOffset(months=...) ile aynı: ay sonu taşmalarında ayın son gününe kırpar."""
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    last_day = (next_month - datetime.timedelta(days=1)).day
+    return datetime.date(year, month, min(day.day, last_day))
+
+
+# SQLite tarih fonksiyonlarıyla kova etiketleri:
+# 'weekday 1' günü bir sonraki Pazartesiye taşır (zaten Pazartesi ise yerinde kalır) = W-MON
+# 'start of month' ayın ilk günü = MS
+BUCKET_MODIFIERS = {
+    'weekly': 'weekday 1',
+    'monthly': 'start of month',
+}
+
+
+class _Source:
+    """GROUP BY sorgularının çalıştığı tablo: gün ifadesi ve fatura-hariç filtresi."""
+
+    def __init__(self, model, day, not_bill):
+        self.model = model
+        self.day = day
+        self.not_bill = not_bill
+        self.category = model.category
+        self.liters = model.liters
+        self.user_id = model.user_id
+
+
+def _rollup_source():
+    return _Source(DailyRollup, DailyRollup.day, DailyRollup.is_bill.is_(False))
+
+
+def _consumption_source():
+    # Eski kayıtlarda activity_type NULL olabilir; SQL'de NULL != 'bill' elenirdi, bu yüzden açıkça kontrol ediyoruz
+    not_bill = db.and_(
+        db.or_(Consumption.activity_type.is_(None), Consumption.activity_type != 'bill'),
+        Consumption.category != BILL_CATEGORY
+    )
+    return _Source(Consumption, Consumption.day, not_bill)
+
+
+SOURCES = {
+    'rollup': _rollup_source,
+    'consumption': _consumption_source,
+}
+
+
+def get_source(name=None):
+    name = name or current_app.config.get('REPORT_SOURCE', 'rollup')
+    return SOURCES[name]()
+
+
+def _as_date(value):
+    return value if isinstance(value, datetime.date) else parse_day(value)
+
+
+def report_window(period, today):
+    """
+    Periyoda göre grafik eksenini ve veri filtresinin sınırlarını döndürür.
+    Üst sınır, son kovanın kapsadığı son gündür (ör. aylıkta bu ayın sonu).
+
+    Returns:
+        tuple: (buckets, lower_bound, upper_bound, label_format, target_multiplier)
+    """
+    if period == 'monthly':
+        # Son 12 Ay: date_range(start, end, freq='MS')
+        start = _add_months(today, -11)
+        first = start if start.day == 1 else _add_months(start.replace(day=1), 1)
+        buckets = []
+        while first <= today:
+            buckets.append(first)
+            first = _add_months(first, 1)
+        return buckets, start, _add_months(today.replace(day=1), 1) - datetime.timedelta(days=1), '%Y-%m', 30
+
+    if period == 'weekly':
+        # Son 12 Hafta: date_range(start, end, freq='W-MON')
+        start = today - datetime.timedelta(weeks=11)
+        first = start + datetime.timedelta(days=(7 - start.weekday()) % 7)
+        buckets = []
+        while first <= today:
+            buckets.append(first)
+            first += datetime.timedelta(days=7)
+        return buckets, start, buckets[-1], 'Hafta %U', 7
+
+    # daily: Son 30 Gün (+1 günlük filtre payı)
+    start = today - datetime.timedelta(days=29)
+    buckets = [start + datetime.timedelta(days=i) for i in range(30)]
+    return buckets, start - datetime.timedelta(days=1), today, '%Y-%m-%d', 1
+
+
+def bill_history(uid, limit=5):
+    """Tüm zamanlardan son faturalar (silme butonu için kayıt id'si gerekir)."""
+    bills = Consumption.query.filter_by(user_id=uid)\
+        .filter(db.or_(Consumption.activity_type == 'bill', Consumption.category == BILL_CATEGORY))\
+        .order_by(Consumption.day.desc())\
+        .limit(limit).all()
+    return [{
+        'id': b.id,
+        'date': b.date[:10],
+        'liters': b.liters,
+        'amount_m3': round(b.liters / 1000, 2)
+    } for b in bills]
+
+
+def bucket_sums(source, uid, period, lower_bound, upper_bound):
+    """Periyot kovalarına göre fatura hariç toplamlar: [(kova_tarihi, litre), ...]"""
+    modifier = BUCKET_MODIFIERS.get(period)
+    bucket = db.func.date(source.day, modifier) if modifier else source.day
+
+    rows = db.session.query(bucket, db.func.sum(source.liters))\
+        .filter(source.user_id == uid)\
+        .filter(source.not_bill)\
+        .filter(source.day >= lower_bound)\
+        .filter(source.day <= upper_bound)\
+        .group_by(bucket)\
+        .all()
+    return [(_as_date(b), liters) for b, liters in rows]
+
+
+def category_sums(source, uid, lower_bound):
+    """Alt sınırdan itibaren kategori bazında fatura hariç toplamlar: [(kategori, litre), ...]"""
+    return db.session.query(source.category, db.func.sum(source.liters))\
+        .filter(source.user_id == uid)\
+        .filter(source.not_bill)\
+        .filter(source.day >= lower_bound)\
+        .group_by(source.category)\
+        .order_by(source.category)\
+        .all()
+
+
+def build_report(uid, period, target, today=None, source=None):
+    """/api/report_data yanıtını GROUP BY sorgularıyla üretir."""
+    today = today or datetime.date.today()
+    source = source or get_source()
+
+    if source.model.query.filter_by(user_id=uid).first() is None:
+        return {"daily_trend": {}, "category_pie": {}}
+
+    buckets, lower_bound, upper_bound, label_format, multiplier = report_window(period, today)
+
+    # Penceredeki kovaları sıfırla doldur (reindex fill_value=0)
+    trend = {b: 0.0 for b in buckets}
+    for key, liters in bucket_sums(source, uid, period, lower_bound, upper_bound):
+        if key in trend:
+            trend[key] += liters
+
+    categories = category_sums(source, uid, lower_bound)
+
+    return {
+        "daily_trend": {
+            "labels": [b.strftime(label_format) for b in buckets],
+            "data": [trend[b] for b in buckets],
+            "target": target * multiplier
+        },
+        "category_pie": {
+            "labels": [c for c, _ in categories],
+            "data": [liters for _, liters in categories]
+        },
+        "bill_history": bill_history(uid)
+    }
+
+
+# Kullanıcı başına özet önbelleği: {uid: (bugün, oluşturulma zamanı, totals)}
+# Veri değiştiren her commit ilgili kullanıcının kaydını siler; TTL diğer worker'lardaki
+# yazmaların en geç ne kadar sürede görüneceğini sınırlar.
+SUMMARY_CACHE_TTL = 60 # saniye
+_summary_cache = {}
+
+
+@on_user_write
+def invalidate_summary(uid):
+    _summary_cache.pop(uid, None)
+
+
+def summary_totals(uid, today=None):
+    """
+    /api/summary karşılaştırma pencerelerinin ve bugünün toplamlarını (fatura hariç) döndürür.
+    Tüm pencereler ve en çok harcanan kategori tek bir koşullu toplama (SUM(CASE ...))
+    sorgusuyla, kategori bazında gruplanarak hesaplanır.
+    """
+    today = today or datetime.date.today()
+    cached = _summary_cache.get(uid)
+    if cached and cached[0] == today and time.monotonic() - cached[1] < SUMMARY_CACHE_TTL:
+        return cached[2]
+
+    seven_days_ago = today - datetime.timedelta(days=7)
+    fourteen_days_ago = today - datetime.timedelta(days=14)
+    this_month_start = today.replace(day=1)
+    last_month_start = (this_month_start - datetime.timedelta(days=1)).replace(day=1)
+
+    def window(*conditions):
+        return db.func.sum(db.case((db.and_(*conditions), DailyRollup.liters), else_=0))
+
+    day = DailyRollup.day
+    rows = db.session.query(
+        DailyRollup.category,
+        db.func.sum(DailyRollup.liters),
+        window(day == today),
+        window(day > seven_days_ago),
+        window(day <= seven_days_ago, day > fourteen_days_ago),
+        window(day >= this_month_start),
+        window(day >= last_month_start, day < this_month_start),
+    ).filter(DailyRollup.user_id == uid)\
+        .filter(DailyRollup.is_bill.is_(False))\
+        .group_by(DailyRollup.category)\
+        .all()
+
+    keys = ('today', 'recent_week', 'previous_week', 'this_month', 'last_month')
+    totals = {key: sum(row[i + 2] for row in rows) for i, key in enumerate(keys)}
+    top = max(rows, key=lambda row: row[1], default=None)
+    totals['top_category'] = (top[0], top[1]) if top else None
+
+    _summary_cache[uid] = (today, time.monotonic(), totals)
+    return totals
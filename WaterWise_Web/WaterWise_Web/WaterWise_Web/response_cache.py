@@ -0,0 +1,158 @@
+import datetime
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import current_app, request, make_response
+from flask_login import current_user
+from rollups import on_user_write
+
+# Okuma API'leri için sürüm tabanlı yanıt önbelleği.
+# Her kapsamın (kullanıcı verisi, topluluk akışı, global ayarlar) artan bir sürümü vardır;
+# yazma yolları commit sonrası ilgili sürümü artırır. Önbellek anahtarı sürümleri içerdiği için
+# yazmadan sonra eski yanıtlar kendiliğinden geçersiz olur, LRU ile zamanla dışarı atılır.
+#
+# Sürümler süreç içidir: başka bir worker'daki yazma bu süreçte en geç TTL sonunda görünür.
+# Ayarlar: app.config['RESPONSE_CACHE_SIZE'] (kayıt sayısı), app.config['RESPONSE_CACHE_TTL'] (saniye)
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def data_version(scope):
+    return _versions.get(scope, 0)
+
+
+def bump_version(*scopes):
+    """Kapsam(lar)ın sürümünü artırır; commit'ten SONRA çağrılmalıdır."""
+    with _versions_lock:
+        for scope in scopes:
+            _versions[scope] = _versions.get(scope, 0) + 1
+
+
+def user_scope(uid):
+    return ('user', uid)
+
+
+COMMUNITY_SCOPE = ('community',)
+SETTINGS_SCOPE = ('settings',)
+
+# Tüketim verisi değişen her kullanıcının sürümü otomatik artar (bkz. rollups.on_user_write)
+on_user_write(lambda uid: bump_version(user_scope(uid)))
+
+
+class ResponseCache:
+    """Serileştirilmiş yanıt gövdeleri için thread-safe, boyut ve TTL sınırlı LRU."""
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+# Süreç yeniden başladığında sürümler sıfırlanır; ETag'lere karışmasın diye süreç kimliği eklenir
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def get_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('response_cache')
+    if cache is None:
+        cache = ResponseCache(app.config.get('RESPONSE_CACHE_SIZE', 512),
+                              app.config.get('RESPONSE_CACHE_TTL', 300))
+        app.extensions['response_cache'] = cache
+    return cache
+
+
+def _etag(body):
+    """Gövdeden türetilen güçlü ETag (tırnaksız)."""
+    return _BOOT_ID + '-' + hashlib.sha1(body).hexdigest()[:20]
+
+
+def _respond(body, mimetype, etag, cache_state):
+    cache = get_cache()
+    if request.if_none_match.contains(etag):
+        cache.not_modified += 1
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.mimetype = mimetype
+    response.set_etag(etag)
+    response.headers['X-Cache'] = cache_state
+    # Tarayıcı her seferinde doğrulasın (304), ama gövdeyi tekrar indirmesin
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_response(*scopes):
+    """
+    GET view'ını kullanıcıya ve verilen kapsamların sürümlerine göre önbelleğe alır.
+    scopes: sabit kapsamlar; ayrıca her zaman geçerli kullanıcının veri kapsamı eklenir.
+    Sadece 200 yanıtlar önbelleğe alınır; If-None-Match eşleşirse 304 döner.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            uid = current_user.id if current_user.is_authenticated else None
+            all_scopes = (user_scope(uid),) + scopes
+            # Günlük pencereler gece yarısı kayar; tarih anahtara dahil
+            key = (request.full_path, uid, datetime.date.today(),
+                   tuple(data_version(s) for s in all_scopes))
+
+            cache = get_cache()
+            entry = cache.get(key)
+            if entry is not None:
+                return _respond(*entry, 'HIT')
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            body = response.get_data()
+            entry = (body, response.mimetype, _etag(body))
+            cache.put(key, entry)
+            return _respond(*entry, 'MISS')
+        return wrapper
+    return decorator
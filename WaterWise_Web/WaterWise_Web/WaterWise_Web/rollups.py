@@ -0,0 +1,157 @@
+import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Consumption, DailyRollup
+
+# Grafiklerden hariç tutulan fatura kayıtlarının kategori etiketi (bkz. utils.get_activity_label)
+BILL_CATEGORY = 'Fatura Bildirimi'
+
+# Rollup satırının benzersiz anahtarı (kullanıcı, gün, kategori, fatura); upsert'lerin çakışma hedefi
+_KEY_INDEX = next(index for index in DailyRollup.__table__.indexes if index.name == 'ux_daily_rollup_key')
+
+# Rollup'ı değişen kullanıcılar commit sonrası bu fonksiyonlara bildirilir (önbellek temizliği vb.)
+_write_listeners = []
+# Değişen günler commit'ten hemen önce, aynı transaction içinde bildirilir (seri durumu vb.)
+_day_listeners = []
+
+
+def on_user_write(listener):
+    """listener(user_id) her başarılı commit sonrası, verisi değişen her kullanıcı için çağrılır."""
+    _write_listeners.append(listener)
+    return listener
+
+
+def on_days_changed(listener):
+    """
+    listener(user_id, days) commit'ten önce aynı transaction içinde çağrılır.
+    days değişen günlerin kümesidir; None içeriyorsa kullanıcının tüm günleri değişmiş sayılır.
+    """
+    _day_listeners.append(listener)
+    return listener
+
+
+def _touch(user_id, day=None):
+    db.session.info.setdefault('touched_users', set()).add(user_id)
+    db.session.info.setdefault('touched_days', {}).setdefault(user_id, set()).add(day)
+
+
+@db.event.listens_for(db.session, 'before_commit')
+def _notify_days(session):
+    for user_id, days in session.info.pop('touched_days', {}).items():
+        for listener in _day_listeners:
+            listener(user_id, days)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def _notify_writes(session):
+    for user_id in session.info.pop('touched_users', ()):
+        for listener in _write_listeners:
+            listener(user_id)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _discard_writes(session):
+    session.info.pop('touched_users', None)
+    session.info.pop('touched_days', None)
+
+
+def is_bill_record(activity_type, category):
+    """Kayıt fatura bildirimi mi? (Eski verilerde activity_type boş olabilir)"""
+    return activity_type == 'bill' or category == BILL_CATEGORY
+
+
+def parse_day(date_str):
+    """Consumption.date alanındaki ISO metni (YYYY-MM-DD...) date nesnesine çevirir."""
+    return datetime.date.fromisoformat(str(date_str)[:10])
+
+
+def _upsert(rows):
+    """
+    rows: [{user_id, day, category, is_bill, liters, entries}]. Anahtarın satırı yoksa eklenir, varsa litre ve kayıt
+    sayısı üzerine eklenir (INSERT ... ON CONFLICT DO UPDATE). Satırlar sırayla uygulanır; okuma-sonra-yazma
+    olmadığı için eşzamanlı ilk kayıtlar aynı satırda birleşir.
+    """
+    db.session.flush() # ORM'de bekleyen rollup satırları (refresh_day) önce yazılır
+    table = DailyRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEY_INDEX.expressions),
+        set_={'liters': table.c.liters + stmt.excluded.liters, 'entries': table.c.entries + stmt.excluded.entries}
+    )
+    db.session.execute(stmt, rows)
+
+
+def apply_consumption(record, sign=1):
+    """
+    Tek bir Consumption kaydını rollup tablosuna ekler (sign=1) veya çıkarır (sign=-1).
+    Commit ETMEZ; çağıran endpoint kendi transaction'ını commit eder.
+    """
+    day = record.day or parse_day(record.date)
+    is_bill = is_bill_record(record.activity_type, record.category)
+    _touch(record.user_id, day)
+
+    if sign > 0:
+        _upsert([dict(user_id=record.user_id, day=day, category=record.category, is_bill=is_bill,
+                      liters=record.liters, entries=1)])
+        return
+
+    row = DailyRollup.query.filter_by(user_id=record.user_id, day=day, category=record.category, is_bill=is_bill)
+    row.update({DailyRollup.liters: DailyRollup.liters - record.liters, DailyRollup.entries: DailyRollup.entries - 1},
+               synchronize_session=False)
+    row.filter(DailyRollup.entries <= 0).delete(synchronize_session=False)
+
+
+def apply_consumption_rows(rows):
+    """
+    apply_consumption'ın toplu hali: eklenen Consumption satırlarını (user_id, day, category, activity_type, liters
+    anahtarlı sözlükler) tek executemany upsert ile rollup tablosuna ekler. Satırlar sırayla uygulandığı için sonuç
+    kayıtları tek tek apply_consumption'dan geçirmekle aynıdır. Commit ETMEZ.
+    """
+    if not rows:
+        return
+    for row in rows:
+        _touch(row['user_id'], row['day'])
+    _upsert([dict(user_id=row['user_id'], day=row['day'], category=row['category'],
+                  is_bill=is_bill_record(row['activity_type'], row['category']), liters=row['liters'], entries=1)
+             for row in rows])
+
+
+def _aggregate_rows(query):
+    """Consumption üzerinde (user, gün, kategori, fatura) gruplamasını rollup nesnelerine çevirir."""
+    bill_expr = db.case(
+        (db.or_(Consumption.activity_type == 'bill', Consumption.category == BILL_CATEGORY), True),
+        else_=False
+    )
+    grouped = query.with_entities(
+        Consumption.user_id, Consumption.day, Consumption.category, bill_expr,
+        db.func.sum(Consumption.liters), db.func.count(Consumption.id)
+    ).group_by(Consumption.user_id, Consumption.day, Consumption.category, bill_expr)
+
+    for user_id, day, category, is_bill, liters, entries in grouped:
+        yield DailyRollup(user_id=user_id, day=day, category=category,
+                          is_bill=bool(is_bill), liters=liters or 0.0, entries=entries)
+
+
+def refresh_day(user_id, day):
+    """Bir kullanıcının tek bir gününü Consumption tablosundan yeniden hesaplar (commit etmez)."""
+    _touch(user_id, day)
+    DailyRollup.query.filter_by(user_id=user_id, day=day).delete()
+    day_query = Consumption.query.filter_by(user_id=user_id, day=day)
+    db.session.add_all(list(_aggregate_rows(day_query)))
+
+
+def rebuild_rollups():
+    """Tüm rollup tablosunu sıfırdan yeniden oluşturur ve commit eder."""
+    DailyRollup.query.delete()
+    rows = list(_aggregate_rows(Consumption.query))
+    db.session.add_all(rows)
+    for user_id in {row.user_id for row in rows}:
+        _touch(user_id)
+    db.session.commit()
+    return len(rows)
+
+
+def ensure_rollups():
+    """Rollup tablosu yeni oluşturulduysa (boşsa) mevcut verilerden doldurur."""
+    if DailyRollup.query.first() is None and Consumption.query.first() is not None:
+        count = rebuild_rollups()
+        print(f"Rollup tablosu dolduruldu: {count} satır")
@@ -18,11 +18,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let trendChart, pieChart;
 
     // === Günlük Durum ===
-    async function updateStatus() {
+    function renderStatus(data) {
         try {
-            const response = await fetch('/api/today_status');
-            const data = await response.json();
-
             statusLabel.textContent = `Bugün: ${data.today_total.toFixed(1)} L / Hedef: ${data.daily_target.toFixed(1)} L`;
 
             const percentage = (data.today_total / data.daily_target) * 100;
@@ -42,11 +39,8 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // === Tasarruf Serisi ===
-    async function updateStreak() {
+    function renderStreak(data) {
         try {
-            const response = await fetch('/api/streak');
-            const data = await response.json();
-
             if (data.streak > 0) {
                 streakLabel.textContent = `🔥 ${data.streak} Gündür Tasarruf Serisindesin!`;
                 streakLabel.style.display = 'block';
@@ -59,10 +53,8 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // === Haftalık Özet ===
-    async function updateSummary() {
+    function renderSummary(data) {
         try {
-            const response = await fetch('/api/summary');
-            const data = await response.json();
             // innerHTML kullanarak backend'den gelen <span> renklerini aktif ediyoruz
             summaryWeekLabel.innerHTML = data.week_comparison_text || "Veri bulunamadı.";
             summaryCategoryLabel.innerHTML = data.top_category_text || "";
@@ -74,12 +66,30 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let currentPeriod = 'daily';
 
+    // === Hava Durumu ===
+    function renderWeather(d) {
+        const div = document.getElementById('weather-container');
+        if (!div) return;
+        if (d.temp != "-") {
+            div.innerHTML = `<div style="font-size:1.5rem; font-weight:bold;">${d.temp}°C</div><div>${d.city}</div><div style="font-size:0.9rem; margin-top:5px; opacity:0.9;">${d.advice}</div>`;
+        } else {
+            div.innerHTML = "Bilgi alınamadı";
+        }
+    }
+
     // === Grafikler ===
+    // Sadece periyot değişiminde ayrı çağrılır; sayfa açılışında veri /api/dashboard'dan gelir
     async function updateCharts() {
         try {
             const response = await fetch(`/api/report_data?period=${currentPeriod}`);
-            const data = await response.json();
+            renderCharts(await response.json());
+        } catch (error) {
+            console.error('Grafikler güncellenirken hata:', error);
+        }
+    }
 
+    function renderCharts(data) {
+        try {
             // --- Günlük/Haftalık/Aylık Tüketim Grafiği ---
             let chartLabel = 'Günlük Tüketim (L)';
             if (currentPeriod === 'weekly') chartLabel = 'Haftalık Toplam (L)';
@@ -162,6 +172,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // === Toplu Pano Güncellemesi ===
+    // Durum, seri, özet, grafikler ve hava durumu tek istekte gelir
+    async function refreshDashboard() {
+        try {
+            const response = await fetch(`/api/dashboard?period=${currentPeriod}`);
+            const data = await response.json();
+
+            renderStatus(data.today_status);
+            renderStreak(data.streak);
+            renderSummary(data.summary);
+            renderCharts(data.report);
+            renderWeather(data.weather);
+        } catch (error) {
+            console.error('Pano güncellenirken hata:', error);
+            statusLabel.textContent = 'Durum yüklenemedi.';
+        }
+    }
+    window.refreshDashboard = refreshDashboard;
+
     // Global fonksiyon olarak dışarı açıyoruz (HTML'den erişilebilsin diye)
     window.changePeriod = function (period) {
         currentPeriod = period;
@@ -254,10 +283,7 @@ document.addEventListener('DOMContentLoaded', () => {
             if (result.success) {
                 litersEntry.value = '';
                 alert(`✅ ${result.message}`); // Kullanıcıya hesaplanan litreyi göster
-                updateStatus();
-                updateCharts();
-                updateStreak();
-                updateSummary();
+                refreshDashboard();
             } else {
                 alert("Veri eklenirken hata: " + (result.message || "Bilinmeyen hata."));
             }
@@ -290,10 +316,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             if (result.success) {
                 alert("Hedef güncellendi!");
-                updateStatus();
-                updateCharts();
-                updateStreak();
-                updateSummary();
+                refreshDashboard();
             } else {
                 alert("Hedef güncellenirken hata: " + (result.message || "Bilinmeyen hata."));
             }
@@ -327,10 +350,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                     if (result.success) {
                         Swal.fire('Sıfırlandı!', result.message, 'success');
-                        updateStatus();
-                        updateCharts();
-                        updateStreak();
-                        updateSummary();
+                        refreshDashboard();
                     } else {
                         Swal.fire('Hata', result.message, 'error');
                     }
@@ -343,10 +363,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // === Sayfa ilk açıldığında verileri yükle ===
-    updateStatus();
-    updateCharts();
-    updateStreak();
-    updateSummary();
+    refreshDashboard();
 
     // === Silme Fonksiyonu (Scope içine taşındı) ===
     window.deleteConsumption = async function (id) {
@@ -369,9 +386,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (result.success) {
                     Swal.fire('Silindi!', result.message, 'success');
                     // Tabloyu güncelle
-                    updateCharts();
-                    updateStatus();
-                    updateSummary();
+                    refreshDashboard();
                 } else {
                     Swal.fire('Hata', result.message, 'error');
                 }
@@ -430,9 +445,117 @@ if (document.getElementById('weather-info')) {
     } catch (e) { console.warn('Hatırlatma hatası:', e); }
 })();
 
+// === Tarife Eğrisi (fiyat <-> tüketim tarayıcıda) ===
+// /api/tariff_curve bir kez indirilir (tarayıcı önbelleği + ETag); hesaplayıcı her değişiklikte sunucuya gitmez.
+// Hesaplar sunucudaki TariffSchedule.bill / solve_usage ile aynı işlem sırasını izler (bkz. tariffs.py).
+let tarifeEgrisiIstegi = null;
+
+function tarifeEgrisiGetir() {
+    if (!tarifeEgrisiIstegi) {
+        tarifeEgrisiIstegi = fetch('/api/tariff_curve')
+            .then(response => {
+                if (!response.ok) throw new Error('Tarife alınamadı');
+                return response.json();
+            })
+            .catch(e => {
+                tarifeEgrisiIstegi = null; // Sonraki denemede tekrar istensin
+                throw e;
+            });
+    }
+    return tarifeEgrisiIstegi;
+}
+
+// Python round(x, 2) ile aynı: toFixed ikili değerin tam karşılığını yuvarlar, tam .5 eşitliğinde (ör. 1.125)
+// yukarı gider; Python ise çifte yuvarlar
+function yuvarla2(x) {
+    const tam = x.toFixed(100);
+    if (/\.\d\d50*$/.test(tam)) {
+        const kesik = tam.slice(0, tam.indexOf('.') + 3);
+        if (Number(kesik.slice(-1)) % 2 === 0) return Number(kesik);
+    }
+    return Number(x.toFixed(2));
+}
+
+function indirimOrani(egri, tip) {
+    return Object.prototype.hasOwnProperty.call(egri.discounts, tip) ? egri.discounts[tip] : 0;
+}
+
+// Tüketimden fatura (calculate_iski_bill ile aynı alanlar)
+function tarifeFatura(egri, usage, tip) {
+    const h = egri.humane_water;
+    const indirim = Math.floor(Math.min(usage, h.upto) / h.block) * h.free;
+    let kademe = 0;
+    while (kademe + 1 < egri.tier_starts.length && egri.tier_starts[kademe + 1] < usage) kademe++;
+
+    let su, atikSu;
+    if (kademe === 0) {
+        const odenecek = Math.max(0, usage - indirim);
+        su = odenecek * egri.water_rates[0];
+        atikSu = odenecek * egri.waste_rates[0];
+    } else {
+        const odenecek = usage - egri.tier_starts[kademe];
+        su = egri.water_at_start[kademe] + odenecek * egri.water_rates[kademe];
+        atikSu = egri.waste_at_start[kademe] + odenecek * egri.waste_rates[kademe];
+    }
+    const oran = indirimOrani(egri, tip);
+    if (oran) {
+        su *= (1 - oran);
+        atikSu *= (1 - oran);
+    }
+
+    const faturalanan = Math.max(0, usage - indirim);
+    const ctv = faturalanan * egri.ctv_rate;
+    const araToplam = su + atikSu;
+    const kdv = araToplam * egri.kdv_rate;
+    return {
+        usage_m3: usage, deduction_m3: indirim, billed_m3: faturalanan,
+        water_cost: yuvarla2(su), waste_cost: yuvarla2(atikSu), ctv: yuvarla2(ctv), kdv: yuvarla2(kdv),
+        total: yuvarla2(araToplam + ctv + kdv), currency: 'TL'
+    };
+}
+
+// Tutardan tüketim (solve_usage_from_price ile aynı aday seçimi: tutara en yakın, sonra tam m3, sonra en küçük)
+function tarifeTuketim(egri, price, tip) {
+    if (!(price > 0)) return 0;
+    const parcalar = egri.segments[tip] || egri.segments[egri.default_user_type];
+    const tol = egri.price_tolerance;
+    let enIyi = null;
+    for (const [tuketimBas, tuketimSonu, tutarBas, m3Fiyat] of parcalar) {
+        const sonu = tuketimSonu === null ? Infinity : tuketimSonu;
+        const tutarSonu = tuketimSonu === null ? Infinity : tutarBas + (sonu - tuketimBas) * m3Fiyat;
+        if (tutarSonu <= price - tol) continue;
+        if (tutarBas > price + tol) break;
+        const tuketim = yuvarla2(Math.min(Math.max(tuketimBas + (price - tutarBas) / m3Fiyat, tuketimBas), sonu));
+        let hata = tuketim < sonu ? Math.abs(tutarBas + (tuketim - tuketimBas) * m3Fiyat - price) : Infinity;
+        if (hata <= tol + 1e-9) hata = 0;
+        const aday = [hata, Number.isInteger(tuketim) ? 0 : 1, tuketim];
+        if (!enIyi || aday[0] < enIyi[0] || (aday[0] === enIyi[0] && (aday[1] < enIyi[1] ||
+            (aday[1] === enIyi[1] && aday[2] < enIyi[2])))) {
+            enIyi = aday;
+        }
+    }
+    return enIyi[2];
+}
+
 // === Fatura Tutarından Tüketim Bul (Ters Hesap) ===
+function tersHesapGoster(egri, price, type) {
+    const usage = tarifeTuketim(egri, price, type);
+    const fatura = tarifeFatura(egri, usage, type);
+    const liters = usage * 1000;
+
+    document.getElementById('rev-usage').textContent = usage + " m³";
+    document.getElementById('rev-liters').textContent = Math.round(liters).toLocaleString() + " Litre";
+    document.getElementById('rev-breakdown').textContent =
+        `Su ${fatura.water_cost.toFixed(2)} TL · Atık su ${fatura.waste_cost.toFixed(2)} TL · ` +
+        `ÇTV + KDV ${(fatura.ctv + fatura.kdv).toFixed(2)} TL (${egri.name})`;
+    document.getElementById('rev-result').style.display = 'block';
+
+    // Global değişkene ata (ekleme işlemi için)
+    window.calculatedLiters = liters;
+}
+
 window.calculateUsageFromPrice = async function () {
-    const price = document.getElementById('calc-price').value;
+    const price = parseFloat(document.getElementById('calc-price').value);
     const type = document.getElementById('calc-type-rev').value;
 
     if (!price || price <= 0) {
@@ -441,27 +564,27 @@ window.calculateUsageFromPrice = async function () {
     }
 
     try {
-        const response = await fetch('/api/estimate_usage_from_price', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ price: price, user_type: type })
-        });
-
-        const res = await response.json();
-        if (res.success) {
-            document.getElementById('rev-usage').textContent = res.usage_m3 + " m³";
-            document.getElementById('rev-liters').textContent = Math.round(res.liters).toLocaleString() + " Litre";
-            document.getElementById('rev-result').style.display = 'block';
-
-            // Global değişkene ata (ekleme işlemi için)
-            window.calculatedLiters = res.liters;
-        }
+        tersHesapGoster(await tarifeEgrisiGetir(), price, type);
     } catch (e) {
         console.error(e);
         Swal.fire('Hata', "Hesaplama hatası.", 'error');
     }
 };
 
+// Tutar veya abone tipi değiştikçe sonuç anında güncellenir (sunucuya istek gitmez)
+if (document.getElementById('calc-price')) {
+    const anlikHesap = () => {
+        const price = parseFloat(document.getElementById('calc-price').value);
+        if (!(price > 0)) return;
+        tarifeEgrisiGetir()
+            .then(egri => tersHesapGoster(egri, price, document.getElementById('calc-type-rev').value))
+            .catch(e => console.warn('Tarife hatası:', e));
+    };
+    document.getElementById('calc-price').addEventListener('input', anlikHesap);
+    document.getElementById('calc-type-rev').addEventListener('change', anlikHesap);
+    tarifeEgrisiGetir().catch(() => {}); // Önceden indir; ilk hesap beklemesin
+}
+
 window.addCalculatedUsage = async function () {
     if (!window.calculatedLiters) return;
 
@@ -481,9 +604,9 @@ window.addCalculatedUsage = async function () {
 
         if (result.success) {
             Swal.fire('Başarılı', `Toplam ${Math.round(window.calculatedLiters)} Litre tüketim eklendi!`, 'success');
-            // Dashboard güncelle
+            // Dashboard güncelle (sayfayı yenilemeden)
             document.getElementById('status-label').textContent = "Güncelleniyor..."; // Hızlı görsel geri bildirim
-            setTimeout(() => location.reload(), 1500); // En temiz güncelleme reload olabilir veya fonksiyonları çağırırız
+            if (window.refreshDashboard) window.refreshDashboard();
         } else {
             Swal.fire('Hata', result.message, 'error');
         }
@@ -0,0 +1,141 @@
+import datetime
+from models import db, DailyRollup, StreakState, Settings
+from rollups import on_days_changed
+
+# "Hedef altında kalınan gün" serisi.
+# Bir gün, fatura dışı en az bir kaydı varsa aktiftir; aktif gün toplamı hedefi aşmıyorsa seriye sayılır.
+# Seri bugünden (bugün henüz kayıt yoksa dünden) geriye doğru kesintisiz sayılır.
+#
+# StreakState kullanıcının en son aktif gününü (anchor_day) ve o güne biten serinin uzunluğunu tutar.
+# Bir gün değiştiğinde sadece etkilenen kuyruk yeniden okunur; tüm geçmiş taranmaz.
+
+# Geriye doğru yürürken rollup'tan tek seferde okunan gün sayısı
+WALK_PAGE_DAYS = 60
+
+
+def _target(uid):
+    return float(Settings.get_value('daily_target', 150, user_id=uid))
+
+
+def _daily_totals(uid, start, end):
+    """[start, end] aralığındaki aktif günlerin fatura hariç toplamları: {gün: litre}"""
+    rows = db.session.query(DailyRollup.day, db.func.sum(DailyRollup.liters))\
+        .filter(DailyRollup.user_id == uid)\
+        .filter(DailyRollup.is_bill.is_(False))\
+        .filter(DailyRollup.day >= start)\
+        .filter(DailyRollup.day <= end)\
+        .group_by(DailyRollup.day)\
+        .all()
+    return dict(rows)
+
+
+def _latest_active_day(uid):
+    return db.session.query(db.func.max(DailyRollup.day))\
+        .filter(DailyRollup.user_id == uid)\
+        .filter(DailyRollup.is_bill.is_(False))\
+        .scalar()
+
+
+def _walk_back(uid, start, target):
+    """start gününden geriye, hedef altındaki kesintisiz aktif günleri sayfa sayfa sayar."""
+    length = 0
+    cursor = start
+    while True:
+        page_start = cursor - datetime.timedelta(days=WALK_PAGE_DAYS - 1)
+        totals = _daily_totals(uid, page_start, cursor)
+        day = cursor
+        while day >= page_start:
+            total = totals.get(day)
+            if total is None or total > target:
+                return length
+            length += 1
+            day -= datetime.timedelta(days=1)
+        cursor = page_start - datetime.timedelta(days=1)
+
+
+def _recompute_tail(state, uid, target):
+    anchor = _latest_active_day(uid)
+    state.anchor_day = anchor
+    state.length = _walk_back(uid, anchor, target) if anchor else 0
+
+
+def _apply_day(state, uid, day, target):
+    """Tek bir günün değişimini duruma yansıtır."""
+    anchor = state.anchor_day
+    if anchor is None:
+        _recompute_tail(state, uid, target)
+        return
+
+    if day > anchor:
+        total = _daily_totals(uid, day, day).get(day)
+        if total is None:
+            return  # Yeni günde aktif kayıt yok (ör. sadece fatura eklendi)
+        qualifies = total <= target
+        if day == anchor + datetime.timedelta(days=1) and state.length > 0:
+            state.length = state.length + 1 if qualifies else 0
+        else:
+            state.length = 1 if qualifies else 0
+        state.anchor_day = day
+        return
+
+    # Serinin [anchor - length + 1, anchor] aralığını ve onu bölen günü (anchor - length) etkilemeyen değişiklikler
+    if day < anchor - datetime.timedelta(days=state.length):
+        return
+
+    _recompute_tail(state, uid, target)
+
+
+def _get_state(uid):
+    return StreakState.query.filter_by(user_id=uid).first()
+
+
+def rebuild_streak(uid):
+    """Kullanıcının seri durumunu sıfırdan hesaplar (commit etmez)."""
+    target = _target(uid)
+    state = _get_state(uid)
+    if state is None:
+        state = StreakState(user_id=uid, target=target)
+        db.session.add(state)
+    state.target = target
+    _recompute_tail(state, uid, target)
+    return state
+
+
+@on_days_changed
+def update_streak(uid, days):
+    """Rollup'ı değişen günler için seriyi aynı transaction içinde günceller."""
+    state = _get_state(uid)
+    target = _target(uid)
+    if state is None or state.target != target or None in days:
+        rebuild_streak(uid)
+        return
+    for day in sorted(days):
+        _apply_day(state, uid, day, target)
+
+
+def current_streak(uid, today=None):
+    """Bugün itibarıyla seri uzunluğu. Durum yoksa veya hedef değiştiyse yeniden oluşturulur."""
+    today = today or datetime.date.today()
+    state = _get_state(uid)
+    if state is None or state.target != _target(uid):
+        state = rebuild_streak(uid)
+        db.session.commit()
+
+    if state.anchor_day is None:
+        return 0
+    if state.anchor_day > today:
+        # İleri tarihli kayıt var: durum bugüne göre değil, doğrudan bugünden yürü
+        return streak_as_of(uid, today)
+    if state.anchor_day >= today - datetime.timedelta(days=1):
+        return state.length
+    return 0
+
+
+def streak_as_of(uid, today, target=None):
+    """Durumu kullanmadan, bugünden (bugün kayıt yoksa dünden) geriye yürüyerek seriyi hesaplar."""
+    target = _target(uid) if target is None else target
+    today_total = _daily_totals(uid, today, today).get(today)
+    if today_total is not None and today_total > target:
+        return 0
+    start = today if today_total is not None else today - datetime.timedelta(days=1)
+    return _walk_back(uid, start, target)
@@ -0,0 +1,100 @@
+import numpy as np
+import tariffs
+
+# calculate_iski_bill'in NumPy dizileri üzerinde toplu hali: binlerce hanenin aylık faturası veya
+# tüketim-maliyet eğrisi tek çağrıda, Python döngüsü olmadan hesaplanır.
+# Derlenmiş tarifenin (bkz. tariffs.py) kademe başlangıçları ve birikmiş maliyetleri üzerinde searchsorted ile
+# kademe bulunur; insani su indirimi ve vergiler skaler TariffSchedule._costs ile aynı işlem sırasıyla yapılır.
+# Kayan nokta sonuçları ve 2 haneye yuvarlama birebir aynıdır (bkz. check_tariff.py). np.round 100 ile çarpıp
+# yuvarladığı için tam .5 sınırına düşen değerlerde Python round'dan ayrılabilir; bu az sayıdaki değer tek tek yuvarlanır.
+
+ROUNDED_FIELDS = ('water_cost', 'waste_cost', 'ctv', 'kdv', 'total')
+FIELDS = ('usage_m3', 'deduction_m3', 'billed_m3') + ROUNDED_FIELDS
+
+
+def _round2(values):
+    """Python round(x, 2) ile aynı sonucu veren dizi yuvarlama."""
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    for index in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded[index] = round(float(values[index]), 2)
+    return rounded
+
+
+def _discount_rates(schedule, user_types):
+    if user_types.ndim == 0:
+        return schedule.discounts.get(str(user_types), 0.0)
+    rates = np.zeros(user_types.shape)
+    for user_type, rate in schedule.discounts.items():
+        rates[user_types == user_type] = rate
+    return rates
+
+
+def _price(schedule, usage, discount_rate):
+    starts = np.array(schedule.tier_starts)
+    # 1. İnsani Su Hakkı İndirimi
+    deduction_m3 = np.floor(np.minimum(usage, schedule.deduction_limit) / schedule.deduction_block) \
+        * schedule.deduction_per_block
+
+    # Kademe: ilk kademede indirim düşülür, sonrakilerde kademe başındaki birikmiş maliyete eklenir
+    tier = np.maximum(np.searchsorted(starts, usage, side='left') - 1, 0)
+    payable = np.where(tier == 0, np.maximum(0, usage - deduction_m3), usage - starts[tier])
+    cost_water = np.array(schedule.water_at_start)[tier] + payable * np.array(schedule.water_rates)[tier]
+    cost_waste = np.array(schedule.waste_at_start)[tier] + payable * np.array(schedule.waste_rates)[tier]
+
+    # İndirim Grubu
+    cost_water = np.where(np.greater(discount_rate, 0), cost_water * (1 - discount_rate), cost_water)
+    cost_waste = np.where(np.greater(discount_rate, 0), cost_waste * (1 - discount_rate), cost_waste)
+
+    # Vergiler
+    billed_volume = np.maximum(0, usage - deduction_m3)
+    ctv_total = billed_volume * schedule.ctv_rate
+    subtotal = cost_water + cost_waste
+    kdv_total = subtotal * schedule.kdv_rate
+    total_bill = subtotal + ctv_total + kdv_total
+    return usage, deduction_m3, billed_volume, cost_water, cost_waste, ctv_total, kdv_total, total_bill
+
+
+def _schedule_groups(utility, dates):
+    """[(tarife, seçici), ...]; her faturaya fatura tarihinde yürürlükteki tarife."""
+    schedules = tariffs.SCHEDULES[utility]
+    days = np.array([str(d)[:10] for d in dates], dtype='datetime64[D]')
+    effective = np.array([s.effective_from for s in schedules], dtype='datetime64[D]')
+    index = np.maximum(np.searchsorted(effective, days, side='right') - 1, 0)
+    return [(schedules[i], index == i) for i in np.unique(index)]
+
+
+def calculate_iski_bills(usages_m3, user_types='residential', manual_rates=None, dates=None):
+    """
+    ISKI tarifesine göre toplu fatura hesabı.
+
+    Args:
+        usages_m3: tüketimler (m3), tek boyutlu dizi veya liste
+        user_types: tek kullanıcı tipi veya tüketimlerle aynı uzunlukta tip dizisi
+        manual_rates: calculate_iski_bill ile aynı; tüm faturalara uygulanır
+        dates: fatura tarihi (tek tarih veya tüketimlerle aynı uzunlukta dizi); her fatura o tarihte
+               yürürlükteki tarifeyle fiyatlanır. Varsayılan bugün.
+
+    Returns:
+        dict: calculate_iski_bill ile aynı anahtarlar ('currency' hariç), her biri float64 dizisi
+    """
+    usage = np.asarray(usages_m3, dtype=np.float64)
+    types = np.asarray(user_types)
+
+    if dates is None or np.ndim(dates) == 0:
+        schedule = tariffs.get_schedule(tariffs.DEFAULT_UTILITY, dates)
+        if manual_rates:
+            schedule = schedule.with_rates(manual_rates)
+        result = dict(zip(FIELDS, _price(schedule, usage, _discount_rates(schedule, types))))
+    else:
+        result = {field: np.empty(usage.shape) for field in FIELDS}
+        for schedule, selector in _schedule_groups(tariffs.DEFAULT_UTILITY, dates):
+            if manual_rates:
+                schedule = schedule.with_rates(manual_rates)
+            group_types = types if types.ndim == 0 else types[selector]
+            for field, values in zip(FIELDS, _price(schedule, usage[selector], _discount_rates(schedule, group_types))):
+                result[field][selector] = values
+
+    for field in ROUNDED_FIELDS:
+        result[field] = _round2(result[field])
+    return result
@@ -0,0 +1,306 @@
+import bisect
+import copy
+import datetime
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+from types import MappingProxyType
+
+# Su tarifeleri veri olarak tariffs.json'da tutulur: kurum (ör. 'iski') -> yürürlük tarihli tarife listesi.
+# Her tarife kademe sınırlarını ("upto": kademenin üst sınırı m3, son kademe null) ve m3 başına su / atık su
+# fiyatlarını, insani su indirimini (ilk "upto" m3'te her "block" m3 için "free" m3 bedava), indirim gruplarını
+# (kullanıcı tipi -> oran), ÇTV (m3 başına TL) ve KDV oranını içerir. Yeni yıl tarifesi yeni bir kayıt olarak
+# eklenir; eski tarihli faturalar kendi dönemlerinin tarifesiyle fiyatlanmaya devam eder.
+#
+# Dosya modül yüklenirken bir kez okunur ve her tarife değişmez bir TariffSchedule'a derlenir:
+# kademe başlangıçlarındaki birikmiş su / atık su maliyeti (kırılma noktaları) ve tutardan tüketim çözümü için
+# parça tabloları önceden hesaplanır; fatura hesabı bisect + tek çarpmadır.
+
+TARIFF_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tariffs.json')
+DEFAULT_UTILITY = 'iski'
+DEFAULT_USER_TYPE = 'residential' # İndirim grubunda olmayan her tip bu şekilde fiyatlanır
+PRICE_TOLERANCE = 0.005 # Tutarlar kuruşa yuvarlı; parça sınırlarında yarım kuruş pay
+MANUAL_RATE_KEY = re.compile(r'^(water|waste)_tier(\d+)$')
+
+
+def _as_date(value):
+    if value is None:
+        return datetime.date.today()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+class TariffSchedule:
+    """Derlenmiş (değişmez) tarife: kademe tabloları, birikmiş maliyetler ve ters çözüm parçaları."""
+
+    def __init__(self, utility, spec):
+        self.utility = utility
+        self.spec = MappingProxyType(copy.deepcopy(spec))
+        self.name = spec['name']
+        self.effective_from = _as_date(spec['effective_from'])
+
+        tiers = spec['tiers']
+        if tiers[-1]['upto'] is not None or any(t['upto'] is None for t in tiers[:-1]):
+            raise ValueError(f"{self.name}: sadece son kademe sınırsız (upto: null) olmalı")
+        self.tier_starts = (0.0,) + tuple(float(t['upto']) for t in tiers[:-1])
+        self.water_rates = tuple(float(t['water']) for t in tiers)
+        self.waste_rates = tuple(float(t['waste']) for t in tiers)
+
+        # İnsani su indirimi sadece ilk kademeden düşülür
+        humane = spec['humane_water']
+        self.deduction_limit = float(humane['upto'])
+        self.deduction_block = float(humane['block'])
+        self.deduction_per_block = float(humane['free'])
+        if len(tiers) > 1 and self.deduction_limit > self.tier_starts[1]:
+            raise ValueError(f"{self.name}: insani su indirimi ilk kademeyi aşamaz")
+        if self.deduction_per_block >= self.deduction_block:
+            raise ValueError(f"{self.name}: indirim bloğu bedava miktardan büyük olmalı")
+        self.max_deduction = self.deduction(self.deduction_limit)
+
+        self.discounts = MappingProxyType({k: float(v) for k, v in spec.get('discount_groups', {}).items()})
+        self.ctv_rate = float(spec['ctv_rate'])
+        self.kdv_rate = float(spec['kdv_rate'])
+
+        # Kademe başlangıçlarında birikmiş maliyet (indirim düşülmüş ilk kademe dahil)
+        water_at_start, waste_at_start = [0.0], [0.0]
+        for index in range(1, len(tiers)):
+            width = self.tier_starts[index] - self.tier_starts[index - 1]
+            if index == 1:
+                width -= self.max_deduction
+            water_at_start.append(water_at_start[-1] + width * self.water_rates[index - 1])
+            waste_at_start.append(waste_at_start[-1] + width * self.waste_rates[index - 1])
+        self.water_at_start = tuple(water_at_start)
+        self.waste_at_start = tuple(waste_at_start)
+
+        self._inverse = {}
+        for rate in {0.0, *self.discounts.values()}:
+            segments = self._inverse_segments(rate)
+            self._inverse[rate] = (segments, [segment[1] for segment in segments])
+
+    def __repr__(self):
+        return f"<TariffSchedule {self.utility} {self.name} ({self.effective_from})>"
+
+    def with_rates(self, manual_rates):
+        """Fiyatları değiştirilmiş yeni tarife: {'water_tier1': ..., 'waste_tier2': ..., 'ctv_rate': ..., 'kdv_rate': ...}"""
+        spec = copy.deepcopy(dict(self.spec))
+        for key, value in manual_rates.items():
+            match = MANUAL_RATE_KEY.match(key)
+            if match and 1 <= int(match.group(2)) <= len(spec['tiers']):
+                spec['tiers'][int(match.group(2)) - 1][match.group(1)] = float(value)
+            elif key in ('ctv_rate', 'kdv_rate'):
+                spec[key] = float(value)
+            else:
+                raise ValueError(f"Bilinmeyen tarife alanı: {key}")
+        spec['name'] = f"{self.name} (manuel)"
+        return TariffSchedule(self.utility, spec)
+
+    def deduction(self, usage):
+        """İnsani su hakkı indirimi (m3)"""
+        return math.floor(min(usage, self.deduction_limit) / self.deduction_block) * self.deduction_per_block
+
+    def tier_index(self, usage):
+        return max(bisect.bisect_left(self.tier_starts, usage) - 1, 0)
+
+    def _costs(self, usage, discount_rate):
+        """(su, atık su, ÇTV, KDV, toplam, indirim m3, faturalanan m3) - yuvarlanmamış"""
+        deduction_m3 = self.deduction(usage)
+        tier = self.tier_index(usage)
+        if tier == 0:
+            payable = max(0, usage - deduction_m3)
+            cost_water = payable * self.water_rates[0]
+            cost_waste = payable * self.waste_rates[0]
+        else:
+            payable = usage - self.tier_starts[tier]
+            cost_water = self.water_at_start[tier] + payable * self.water_rates[tier]
+            cost_waste = self.waste_at_start[tier] + payable * self.waste_rates[tier]
+
+        if discount_rate:
+            cost_water *= (1 - discount_rate)
+            cost_waste *= (1 - discount_rate)
+
+        billed_volume = max(0, usage - deduction_m3)
+        ctv_total = billed_volume * self.ctv_rate
+        subtotal = cost_water + cost_waste
+        kdv_total = subtotal * self.kdv_rate
+        total_bill = subtotal + ctv_total + kdv_total
+        return cost_water, cost_waste, ctv_total, kdv_total, total_bill, deduction_m3, billed_volume
+
+    def bill(self, usage_m3, user_type='residential'):
+        usage = float(usage_m3)
+        cost_water, cost_waste, ctv_total, kdv_total, total_bill, deduction_m3, billed_volume = \
+            self._costs(usage, self.discounts.get(user_type, 0.0))
+        return {
+            'usage_m3': usage,
+            'deduction_m3': deduction_m3,
+            'billed_m3': billed_volume,
+            'water_cost': round(cost_water, 2),
+            'waste_cost': round(cost_waste, 2),
+            'ctv': round(ctv_total, 2),
+            'kdv': round(kdv_total, 2),
+            'total': round(total_bill, 2),
+            'currency': 'TL'
+        }
+
+    # === Tutardan tüketim (ters tarife) ===
+    # Tutar tüketimin parçalı doğrusal fonksiyonudur; parçalar kademe başlangıçlarında ve insani su indirimi
+    # bloklarında (tutar 'free' m3 kadar geri düşer) kırılır. Parça tabloları indirim oranı başına bir kez hesaplanır;
+    # ters çözüm parçayı bisect ile bulup tek bölme yapar.
+    #
+    # Komşu parçalar tutarda çakışır: 224.72 TL hem 4.5 m3'e hem 5 m3'e denk gelir (5 m3'te bir blok daha düşülür).
+    # Adaylardan önce 0.01 m3'e yuvarlanınca tutara en yakın (tercihen aynı tutarı) veren, sonra tam m3 olan
+    # (sayaçlar tam m3 okunur), sonra en küçüğü seçilir.
+
+    def _inverse_segments(self, discount_rate):
+        """[(tutar başlangıcı, tutar sonu, tüketim başlangıcı, tüketim sonu, m3 başına TL), ...] tutar sonuna göre artan."""
+        breaks = {self.deduction_limit, *self.tier_starts}
+        blocks = 1
+        while blocks * self.deduction_block < self.deduction_limit:
+            breaks.add(blocks * self.deduction_block)
+            blocks += 1
+        breaks = sorted(breaks) + [math.inf]
+
+        tax = 1 + self.kdv_rate
+        segments = []
+        for usage_start, usage_end in zip(breaks, breaks[1:]):
+            tier = bisect.bisect_right(self.tier_starts, usage_start) - 1
+            per_m3 = (self.water_rates[tier] + self.waste_rates[tier]) * (1 - discount_rate) * tax + self.ctv_rate
+            price_start = self._costs(usage_start, discount_rate)[4]
+            segments.append((price_start, price_start + (usage_end - usage_start) * per_m3, usage_start, usage_end, per_m3))
+        return segments
+
+    def solve_usage(self, target_price_tl, user_type='residential'):
+        """Verilen fatura tutarına (TL) denk gelen kullanım (m3), 0.01 m3'e yuvarlı."""
+        target = float(target_price_tl)
+        if target <= 0:
+            return 0.0
+        table, ends = self._inverse[self.discounts.get(user_type, 0.0)]
+
+        candidates = []
+        index = bisect.bisect_right(ends, target - PRICE_TOLERANCE)
+        while index < len(table) and table[index][0] <= target + PRICE_TOLERANCE:
+            price_start, _, usage_start, usage_end, per_m3 = table[index]
+            usage = round(min(max(usage_start + (target - price_start) / per_m3, usage_start), usage_end), 2)
+            # Parça sonuna yuvarlanan tüketim bir sonraki parçaya aittir (indirim sıçraması); sadece son çare
+            error = abs(price_start + (usage - usage_start) * per_m3 - target) if usage < usage_end else math.inf
+            if error <= PRICE_TOLERANCE + 1e-9:
+                error = 0.0
+            candidates.append((error, not usage.is_integer(), usage))
+            index += 1
+        return min(candidates)[2]
+
+    def curve(self):
+        """
+        İstemcide fiyat <-> tüketim hesabı için kompakt tarife temsili (JSON'a çevrilebilir).
+        Kademe tabloları fatura hesabını sunucuyla aynı işlem sırasıyla yapmaya, segments ise kullanıcı tipi başına
+        ters çözüme yeter: [tüketim başlangıcı, tüketim sonu (son parçada None), tutar başlangıcı, m3 başına TL].
+        """
+        user_types = {DEFAULT_USER_TYPE: 0.0, **self.discounts}
+        return {
+            'utility': self.utility,
+            'name': self.name,
+            'effective_from': self.effective_from.isoformat(),
+            'tier_starts': list(self.tier_starts),
+            'water_rates': list(self.water_rates),
+            'waste_rates': list(self.waste_rates),
+            'water_at_start': list(self.water_at_start),
+            'waste_at_start': list(self.waste_at_start),
+            'humane_water': {'upto': self.deduction_limit, 'block': self.deduction_block, 'free': self.deduction_per_block},
+            'discounts': dict(self.discounts),
+            'ctv_rate': self.ctv_rate,
+            'kdv_rate': self.kdv_rate,
+            'default_user_type': DEFAULT_USER_TYPE,
+            'price_tolerance': PRICE_TOLERANCE,
+            'segments': {
+                user_type: [[usage_start, None if math.isinf(usage_end) else usage_end, price_start, per_m3]
+                            for price_start, _, usage_start, usage_end, per_m3 in self._inverse[rate][0]]
+                for user_type, rate in user_types.items()
+            },
+        }
+
+
+def load_schedules(path=TARIFF_FILE):
+    """tariffs.json -> {kurum: [TariffSchedule, ...] yürürlük tarihine göre artan}"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    schedules = {}
+    for utility, specs in data.items():
+        compiled = sorted((TariffSchedule(utility, spec) for spec in specs), key=lambda s: s.effective_from)
+        schedules[utility] = compiled
+    return schedules
+
+
+def schedules_version(path=TARIFF_FILE):
+    """tariffs.json içeriğinin kısa özeti; tarife değişince tutardan çözülmüş tüketimlerin eskidiğini gösterir."""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:8]
+
+
+SCHEDULES = load_schedules()
+SCHEDULES_VERSION = schedules_version()
+_EFFECTIVE_DATES = {utility: [s.effective_from for s in compiled] for utility, compiled in SCHEDULES.items()}
+
+
+def get_schedule(utility=DEFAULT_UTILITY, on=None):
+    """
+    Verilen tarihte (varsayılan bugün; date, datetime veya 'YYYY-MM-DD...' metni) yürürlükteki tarife.
+    Tarih ilk tarifeden önceyse bilinen en eski tarife kullanılır.
+    """
+    index = bisect.bisect_right(_EFFECTIVE_DATES[utility], _as_date(on)) - 1
+    return SCHEDULES[utility][max(index, 0)]
+
+
+def next_effective_date(schedule):
+    """Tarifeden sonra yürürlüğe girecek tarifenin tarihi (yoksa None)."""
+    later = [s.effective_from for s in SCHEDULES[schedule.utility] if s.effective_from > schedule.effective_from]
+    return min(later, default=None)
+
+
+# === API hesap önbelleği ===
+# /api/calculate_cost ve /api/estimate_usage_from_price aynı girdilerle tekrar tekrar çağrılır (hesaplayıcılar,
+# entegrasyonlar). Sonuçlar (tarife, tüketim / tutar, kullanıcı tipi, manuel fiyatlar) anahtarıyla sınırlı LRU'da
+# tutulur; manuel fiyatlı tarifeler de her istekte yeniden derlenmez. Tarifeler değişmez olduğu için geçersiz kılma gerekmez.
+QUOTE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=256)
+def _manual_schedule(schedule, rates):
+    return schedule.with_rates(dict(rates))
+
+
+@functools.lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def _cached_bill(schedule, usage, user_type, rates):
+    if rates:
+        schedule = _manual_schedule(schedule, rates)
+    return schedule.bill(usage, user_type)
+
+
+@functools.lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def _cached_usage(schedule, price, user_type):
+    return schedule.solve_usage(price, user_type)
+
+
+def quote_bill(usage_m3, user_type=DEFAULT_USER_TYPE, manual_rates=None, on=None, utility=DEFAULT_UTILITY):
+    """Önbellekli TariffSchedule.bill; dönen sözlük çağırana aittir."""
+    rates = tuple(sorted((key, float(value)) for key, value in manual_rates.items())) if manual_rates else None
+    return dict(_cached_bill(get_schedule(utility, on), float(usage_m3), str(user_type), rates))
+
+
+def quote_usage(price_tl, user_type=DEFAULT_USER_TYPE, on=None, utility=DEFAULT_UTILITY):
+    """Önbellekli TariffSchedule.solve_usage"""
+    return _cached_usage(get_schedule(utility, on), float(price_tl), str(user_type))
+
+
+def quote_cache_stats():
+    bills, usages = _cached_bill.cache_info(), _cached_usage.cache_info()
+    return {
+        'entries': bills.currsize + usages.currsize,
+        'max_entries': bills.maxsize + usages.maxsize,
+        'hits': bills.hits + usages.hits,
+        'misses': bills.misses + usages.misses,
+    }
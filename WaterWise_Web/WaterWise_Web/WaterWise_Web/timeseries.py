@@ -0,0 +1,95 @@
+import datetime
+import numpy as np
+from rollups import BILL_CATEGORY
+from reports import report_window
+
+# pandas kullanmadan tüketim zaman serisi kovalama (günlük / W-MON haftalık / MS aylık).
+# Tarihler 1970-01-01'den itibaren gün numarası (int64) olarak tutulur; kovalama tamsayı aritmetiği,
+# toplama np.bincount ile yapılır. Etiketler, kova sınırları ve sıfır doldurma eski pandas
+# resample/reindex yoluyla aynıdır; pandas toplamları Kahan telafili topladığı için litre değerleri
+# son bitlerde farklı olabilir (SQL motorlarıyla aynı tolerans, bkz. check_report_parity.py).
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+def day_number(day):
+    """datetime.date -> gün numarası"""
+    return (day - _EPOCH).days
+
+
+def to_day_numbers(values):
+    """'YYYY-MM-DD[...]' metinleri veya date nesneleri -> int64 gün numarası dizisi (saat kısmı atılır)."""
+    try:
+        return np.asarray(values, dtype='datetime64[D]').astype(np.int64)
+    except ValueError:
+        # Saatli kayıtlar (ör. '2025-01-01T10:00:00') gün birimine doğrudan çevrilemez
+        values = [v[:10] if isinstance(v, str) else v for v in values]
+        return np.asarray(values, dtype='datetime64[D]').astype(np.int64)
+
+
+def factorize(values):
+    """Az sayıda farklı değer içeren kolon -> (int64 kodlar, farklı değerler [ilk görülme sırasıyla])"""
+    codes = {}
+    array = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int64, count=len(values))
+    return array, list(codes)
+
+
+def bucket_keys(days, period):
+    """Her günün ait olduğu kovanın gün numarası."""
+    days = np.asarray(days, dtype=np.int64)
+    if period == 'weekly':
+        # W-MON: bir sonraki Pazartesi (zaten Pazartesi ise kendisi); 1970-01-01 Perşembe (weekday 3)
+        return days + (-(days + 3)) % 7
+    if period == 'monthly':
+        # MS: ayın ilk günü
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    return days
+
+
+def bucket_sums(days, liters, buckets, period):
+    """
+    Kovalara göre toplamlar, verilen kova listesine hizalı ve sıfırla doldurulmuş (reindex fill_value=0).
+    Kova listesi dışına düşen günler atılır.
+    """
+    bucket_days = np.asarray([day_number(b) for b in buckets], dtype=np.int64)
+    keys = bucket_keys(days, period)
+    idx = np.searchsorted(bucket_days, keys)
+    inside = idx < len(bucket_days)
+    inside[inside] = bucket_days[idx[inside]] == keys[inside]
+    return np.bincount(idx[inside], weights=np.asarray(liters, dtype=np.float64)[inside],
+                       minlength=len(bucket_days))
+
+
+def category_sums(codes, labels, liters):
+    """Kategori bazında toplamlar; sadece kaydı olan kategoriler, etiketler sıralı (groupby ile aynı)."""
+    totals = np.bincount(codes, weights=liters, minlength=len(labels))
+    counts = np.bincount(codes, minlength=len(labels))
+    present = sorted((label, i) for i, label in enumerate(labels) if counts[i])
+    return [label for label, _ in present], totals[[i for _, i in present]]
+
+
+def build_report(dates, categories, liters, activity_types, period, target, today):
+    """
+    Kolon listelerinden /api/report_data grafik verisini üretir (fatura geçmişi hariç).
+    Returns: {"daily_trend": {...}, "category_pie": {...}}
+    """
+    buckets, lower_bound, _, label_format, multiplier = report_window(period, today)
+
+    days = to_day_numbers(dates)
+    liters = np.asarray(liters, dtype=np.float64)
+    codes, labels = factorize(categories)
+    bill_code = labels.index(BILL_CATEGORY) if BILL_CATEGORY in labels else -1
+    mask = (days >= day_number(lower_bound)) & (codes != bill_code)\
+        & (np.asarray(activity_types, dtype=object) != 'bill')
+    days, liters, codes = days[mask], liters[mask], codes[mask]
+
+    trend = bucket_sums(days, liters, buckets, period)
+    pie_labels, totals = category_sums(codes, labels, liters)
+    return {
+        "daily_trend": {
+            "labels": [b.strftime(label_format) for b in buckets],
+            "data": trend.tolist(),
+            "target": target * multiplier
+        },
+        "category_pie": {"labels": pie_labels, "data": totals.tolist()},
+    }
@@ -0,0 +1,85 @@
+import os
+from tempfile import SpooledTemporaryFile
+from flask import Request, current_app
+import ocr
+
+# Fatura görüntüsü yüklemelerinin sınırlandırılması.
+#   - İstek boyutu: MAX_CONTENT_LENGTH (UPLOAD_MAX_MB) aşılırsa Flask gövdeyi okumadan 413 döner
+#   - Biriktirme: UPLOAD_SPOOL_KB'den büyük dosya parçaları bellekte değil geçici dosyada tutulur
+#   - Dosya başına: UPLOAD_FILE_MAX_MB; biçim ve boyut başlıktan okunur, görüntü çözülmeden önce reddedilir
+#   - Piksel sınırı: OCR_MAX_PIXELS (sıkıştırma bombası / aşırı büyük fotoğraf); TIFF'te her sayfa ayrı kontrol edilir
+# Kabul edilen görüntü ocr.decode_gray'de düşük çözünürlükte çözülür; böylece istek başına bellek
+# en fazla dosya sınırı + sınırlı çalışma görüntüsü kadardır.
+
+HEADER_BYTES = 256 * 1024 # JPEG'de EXIF / ICC blokları SOF işaretçisinden önce gelir
+SUPPORTED_FORMATS = ('jpeg', 'png', 'tiff')
+
+
+class UploadRejected(Exception):
+    """Yüklenen dosya kabul edilmedi; message kullanıcıya gösterilir, status HTTP kodudur."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class SpoolingRequest(Request):
+    """Dosya parçalarını UPLOAD_SPOOL_KB'ye kadar bellekte, üstünü geçici dosyada tutar (Werkzeug varsayılanı 500 KB)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_KB'] * 1024, mode='rb+')
+
+
+def _stream_size(stream):
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def _check_pixels(width, height, max_pixels):
+    if not width or not height:
+        raise UploadRejected('Görüntü boyutu okunamadı.', 415)
+    if width * height > max_pixels:
+        raise UploadRejected(f'Görüntü çok büyük ({width}x{height}). '
+                             f'En fazla {max_pixels / 1e6:.0f} megapiksel yüklenebilir.', 413)
+
+
+def read_image(upload, max_pages=1):
+    """
+    Yüklenen dosyayı doğrulayıp baytlarını döndürür; geçersizse UploadRejected.
+    Biçim ve boyut dosyanın başından okunur; dosyanın tamamı ancak bu kontroller geçilince belleğe alınır.
+    max_pages: çok sayfalı TIFF'te kabul edilen en fazla sayfa (tek fatura yüklemesinde 1)
+    """
+    config = current_app.config
+    stream = upload.stream
+    stream.seek(0)
+    if _stream_size(stream) > config['UPLOAD_FILE_MAX_MB'] * 1024 * 1024:
+        raise UploadRejected(f"Dosya çok büyük. En fazla {config['UPLOAD_FILE_MAX_MB']} MB yüklenebilir.", 413)
+
+    head = stream.read(HEADER_BYTES)
+    kind = ocr.image_format(head)
+    if kind not in SUPPORTED_FORMATS:
+        raise UploadRejected('Desteklenmeyen dosya biçimi. Lütfen JPEG, PNG veya TIFF yükleyin.', 415)
+
+    if kind == 'tiff':
+        # TIFF sayfa dizini dosyanın sonunda olabilir; dosya zaten boyut sınırı içinde
+        data = head + stream.read()
+        pages = ocr.tiff_pages(data)
+        if not pages:
+            raise UploadRejected('Görüntü boyutu okunamadı.', 415)
+        if len(pages) > max_pages:
+            raise UploadRejected(f'Çok fazla sayfa ({len(pages)}). En fazla {max_pages} sayfa yüklenebilir.', 413)
+        for width, height in pages:
+            _check_pixels(width, height, config['OCR_MAX_PIXELS'])
+        return data
+
+    size = ocr.image_size(head)
+    if size is None and len(head) == HEADER_BYTES:
+        # Başlık beklenenden uzun (ör. büyük gömülü önizleme); boyut tüm dosyadan okunur
+        head += stream.read()
+        size = ocr.image_size(head)
+    _check_pixels(*(size or (0, 0)), config['OCR_MAX_PIXELS'])
+    return head + stream.read()